@@ -1 +1,2 @@
-from .import models
\ No newline at end of file
+from .import models
+from . import controllers
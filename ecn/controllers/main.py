@@ -0,0 +1,28 @@
+# controllers/main.py
+import tempfile
+from werkzeug.wsgi import wrap_file
+from odoo import http
+from odoo.http import request, content_disposition
+
+
+class EcnExportController(http.Controller):
+
+    @http.route('/ecn/export_xlsx/<int:export_id>', type='http', auth='user')
+    def export_xlsx(self, export_id, **kw):
+        """ Stream the ECN/ECR workbook from a temporary file, nothing is stored in the database """
+        export = request.env['asd.ecn.export'].browse(export_id).exists()
+        if not export:
+            return request.not_found()
+        output = tempfile.TemporaryFile()
+        export.ecn_ids._write_xlsx_bulk(output, export.mode)
+        size = output.tell()
+        output.seek(0)
+        # the temporary file is closed, and removed, by the server once sent
+        return request.make_response(
+            wrap_file(request.httprequest.environ, output),
+            headers=[
+                ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                ('Content-Length', size),
+                ('Content-Disposition', content_disposition('ECN⁄ECR Export.xlsx'))
+            ]
+        )
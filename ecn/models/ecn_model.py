@@ -4,14 +4,20 @@ from datetime import datetime
 import json
 import base64
 import io
+import re
+import hashlib
+from copy import copy
 from io import BytesIO
 import logging
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import MergedCell
 from odoo.modules.module import get_module_resource
 from openpyxl.drawing.image import Image
 from openpyxl.styles import Alignment, PatternFill
 from openpyxl.styles import Font, Border, Side
 from PIL import Image as PILImage
+from odoo import tools
 from odoo.tools import html2plaintext
 
 _logger = logging.getLogger(__name__)
@@ -183,7 +189,24 @@ class EngineeringChangeNote(models.Model):
         wb = Workbook()
         ws = wb.active
         ws.title = 'ECN\u2044ECR Report'
+        self._write_xlsx_sheet(ws, self._get_xlsx_logo())
 
+        wb.save(output)
+        output.seek(0)
+
+        attachment = self.env["ir.attachment"].create({
+            "name": "ECN\u2044ECR Report.xlsx",
+            "type": "binary",
+            "datas": base64.b64encode(output.getvalue()),
+            "res_model": self._name,
+            "res_id": self.id,
+            "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        })
+
+        return {"type": "ir.actions.act_url", "url": f"/web/content/{attachment.id}?download=true", "target": "self"}
+
+    def _write_xlsx_sheet(self, ws, logo_png=False):
+        """Write the ECN/ECR layout in the worksheet"""
         border = Border(top=Side(style='thin'), left=Side(style='thin'), right=Side(style='thin'),
                         bottom=Side(style='thin'))
         align_center = Alignment(vertical='center', horizontal='center', wrapText=True)
@@ -191,15 +214,8 @@ class EngineeringChangeNote(models.Model):
         font_header = Font(name='Arial', size=12, bold=True)
         font_all = Font(name='Times New Roman', size=11, bold=False)
         # Company Logo
-        if self.env.user.company_id.logo:
-            max_width, max_height = 150, 60
-            image_data = base64.b64decode(self.env.user.company_id.logo)
-            image = PILImage.open(io.BytesIO(image_data))
-            image.thumbnail((max_width, max_height), PILImage.LANCZOS)
-            img_bytes = io.BytesIO()
-            image.save(img_bytes, format='PNG')
-            logo_image = Image(img_bytes)
-            ws.add_image(logo_image, 'A1')
+        if logo_png:
+            ws.add_image(Image(io.BytesIO(logo_png)), 'A1')
             ws['A1'].alignment = align_center
 
         # Data
@@ -301,7 +317,7 @@ class EngineeringChangeNote(models.Model):
             ws.column_dimensions[col].width = width
 
         for rec in self:
-            ws['F2'] = rec.change_received_from
+            ws['F2'] = dict(rec._fields['change_received_from'].selection).get(rec.change_received_from, '')
             ws['C3'] = rec.ecn_number
             ws['G3'] = rec.ecn_date
             ws['C4'] = rec.project.name
@@ -317,7 +333,7 @@ class EngineeringChangeNote(models.Model):
             ws['G8'] = rec.end_date
             ws['C9'] = rec.target_completion_date
             ws['G9'] = rec.completion_status
-            ws['C12'] = rec.change_received_from
+            ws['C12'] = dict(rec._fields['change_received_from'].selection).get(rec.change_received_from, '')
             ws['H12'] = rec.change_person.name
             ws['C13'] = html2plaintext(rec.description or '')
             ws['C13'].alignment = align_left
@@ -699,19 +715,128 @@ class EngineeringChangeNote(models.Model):
 
                 current_row += 1
 
+    def _get_xlsx_logo(self, company=None):
+        """Resized company logo as PNG, cached per company and logo checksum"""
+        company = company or self.env.user.company_id
+        if not company.logo:
+            return False
+        checksum = False
+        for logo_data in self.env['ir.attachment'].sudo().search_read([('res_model', '=', 'res.partner'),
+                                                                        ('res_field', '=', 'image_1920'),
+                                                                        ('res_id', '=', company.partner_id.id)],
+                                                                       ['checksum'], limit=1):
+            checksum = logo_data['checksum']
+        if not checksum:
+            checksum = hashlib.sha1(company.logo).hexdigest()
+        return self._get_xlsx_logo_png(company.id, checksum)
+
+    @tools.ormcache('company_id', 'checksum')
+    def _get_xlsx_logo_png(self, company_id, checksum):
+        max_width, max_height = 150, 60
+        image_data = base64.b64decode(self.env['res.company'].browse(company_id).logo)
+        image = PILImage.open(io.BytesIO(image_data))
+        image.thumbnail((max_width, max_height), PILImage.LANCZOS)
+        img_bytes = io.BytesIO()
+        image.save(img_bytes, format='PNG')
+        return img_bytes.getvalue()
+
+    def _get_xlsx_summary_header(self):
+        return ['ECN/ECR No', 'ECN/ECR Date', 'Status', 'Final Status', 'Part No', 'Part Name', 'Part Number',
+                'Customer Name', 'Proposer Name', 'Department', 'Co-Ordinator',
+                'Target Completion Date', 'Actual Completion Date', 'Completion Status', 'Change Recieved From',
+                'CFT Members', 'CFT Approved', 'Change Required', 'Completion Notes']
+
+    def _get_xlsx_summary_row(self):
+        state_labels = dict(self._fields['state'].selection)
+        final_status_labels = dict(self._fields['final_status'].selection)
+        change_labels = dict(self._fields['change_received_from'].selection)
+        return [self.ecn_number or '',
+                self.ecn_date or '',
+                state_labels.get(self.state, ''),
+                final_status_labels.get(self.final_status, ''),
+                self.part_id.name or '',
+                self.part_name or '',
+                self.part_number or '',
+                self.partner_id.name or '',
+                self.emp_id.name or '',
+                self.department.name or '',
+                self.co_ord.name or '',
+                self.target_completion_date or '',
+                self.end_date or '',
+                self.completion_status or '',
+                change_labels.get(self.change_received_from, ''),
+                len(self.team_approval_ids),
+                len(self.team_approval_ids.filtered(lambda approval: approval.approval_status == 'approved')),
+                len(self.change_required_ids),
+                self.completion_notes or '']
+
+    def action_export_xlsx_summary(self):
+        return self._export_xlsx_bulk('summary')
+
+    def action_export_xlsx_sheets(self):
+        return self._export_xlsx_bulk('sheets')
+
+    def _export_xlsx_bulk(self, mode='summary'):
+        """Download many ECN/ECR in one workbook, the file is streamed by the /ecn/export_xlsx controller"""
+        export = self.env['asd.ecn.export'].create({'ecn_ids': [(6, 0, self.ids)], 'mode': mode})
+        return {"type": "ir.actions.act_url", "url": f"/ecn/export_xlsx/{export.id}", "target": "self"}
+
+    def _stream_xlsx_sheet(self, ws, logo_png=False):
+        """Write the ECN/ECR layout in a scratch worksheet and copy it row by row in the write-only worksheet"""
+        scratch = Workbook()
+        layout = scratch.active
+        self._write_xlsx_sheet(layout, logo_png)
+        for col, dimension in layout.column_dimensions.items():
+            ws.column_dimensions[col].width = dimension.width
+        for row_idx, dimension in layout.row_dimensions.items():
+            if dimension.height:
+                ws.row_dimensions[row_idx].height = dimension.height
+        for merged_range in layout.merged_cells.ranges:
+            ws.merged_cells.add(merged_range.coord)
+        for image in layout._images:
+            ws.add_image(image)
+        for row in layout.iter_rows():
+            cells = []
+            for cell in row:
+                out = WriteOnlyCell(ws, value=None if isinstance(cell, MergedCell) else cell.value)
+                if cell.has_style:
+                    out.font = copy(cell.font)
+                    out.border = copy(cell.border)
+                    out.fill = copy(cell.fill)
+                    out.alignment = copy(cell.alignment)
+                    out.number_format = cell.number_format
+                cells.append(out)
+            ws.append(cells)
+        scratch.close()
+
+    def _write_xlsx_bulk(self, output, mode='summary'):
+        """Write many ECN/ECR in output, a summary sheet or one sheet each, all in write-only mode"""
+        wb = Workbook(write_only=True)
+        if mode == 'summary':
+            ws = wb.create_sheet('ECN\u2044ECR Summary')
+            header = []
+            for label in self._get_xlsx_summary_header():
+                cell = WriteOnlyCell(ws, value=label)
+                cell.font = Font(name='Arial', size=12, bold=True)
+                header.append(cell)
+            ws.append(header)
+            for batch_start in range(0, len(self), 500):
+                batch = self[batch_start:batch_start + 500]
+                for rec in batch:
+                    ws.append(rec._get_xlsx_summary_row())
+                batch.invalidate_recordset()
+        else:
+            logo_png = self._get_xlsx_logo()
+            sheet_names = set()
+            for rec in self:
+                sheet_name = re.sub(r'[\[\]:*?/\\]', '-', rec.ecn_number or str(rec.id))[:31]
+                while sheet_name in sheet_names:
+                    sheet_name = '%s-%s' % (sheet_name[:25], rec.id)
+                sheet_names.add(sheet_name)
+                rec._stream_xlsx_sheet(wb.create_sheet(sheet_name), logo_png)
+                rec.invalidate_recordset()
         wb.save(output)
-        output.seek(0)
-
-        attachment = self.env["ir.attachment"].create({
-            "name": "ECN\u2044ECR Report.xlsx",
-            "type": "binary",
-            "datas": base64.b64encode(output.getvalue()),
-            "res_model": self._name,
-            "res_id": self.id,
-            "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        })
 
-        return {"type": "ir.actions.act_url", "url": f"/web/content/{attachment.id}?download=true", "target": "self"}
     @api.depends('target_completion_date', 'end_date')
     def _compute_completion_status(self):
         for record in self:
@@ -1305,6 +1430,17 @@ class ECNApprovalHistory(models.Model):
         }
 
 
+class ECNExport(models.TransientModel):
+    _name = 'asd.ecn.export'
+    _description = 'ECN/ECR XLSX Export'
+
+    ecn_ids = fields.Many2many('asd.ecn', string='ECN/ECR')
+    mode = fields.Selection([
+        ('summary', 'Summary'),
+        ('sheets', 'One Sheet Each')
+    ], required=True, default='summary')
+
+
 class ECNCompletionWizard(models.TransientModel):
     _name = 'ecn.completion.wizard'
     _description = 'ECN/ECR Completion Wizard'
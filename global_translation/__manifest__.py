@@ -1,6 +1,6 @@
 {
     'name': 'Translation Mixin',
-    'version': '16.0.1.0.0',
+    'version': '16.0.1.2.0',
     'category': 'Tools',
     'summary': 'Universal translation mixin for automatic field translation',
     'description': """
@@ -15,7 +15,10 @@
     'external_dependencies': {
         'python': ['googletrans==4.0.0rc1'],
     },
-    'data': [],
+    'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
+    ],
     'demo': [],
     'installable': True,
     'auto_install': False,
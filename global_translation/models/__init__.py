@@ -1 +1,3 @@
+from . import translation_memory
+from . import translation_queue
 from . import translation
\ No newline at end of file
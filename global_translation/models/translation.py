@@ -1,16 +1,9 @@
 from odoo import models, fields, api
 import logging
-from functools import lru_cache
 from datetime import datetime
 
 _logger = logging.getLogger(__name__)
 
-try:
-    from googletrans import Translator
-except ImportError:
-    Translator = None
-    _logger.warning("googletrans not installed. Install via pip if needed.")
-
 class TranslationMixin(models.AbstractModel):
     _name = 'translation.mixin'
     _description = 'Generic Translation Mixin for Odoo Field Values'
@@ -35,39 +28,54 @@ class TranslationMixin(models.AbstractModel):
     def _get_language_code(self, user_lang=None):
         return self.language_id.code if self.language_id else (user_lang or self.env.user.lang or 'en_US')
 
-    @lru_cache(maxsize=5000)
-    def _translate_text_cached(self, text, lang_code):
-        if not text or not Translator:
-            return text
-        try:
-            translator = Translator()
-            start_time = datetime.now()
-            translated = translator.translate(text, dest=lang_code.split('_')[0]).text
-            duration = (datetime.now() - start_time).total_seconds()
-            _logger.debug(f"Translated '{text}' to '{lang_code}' in {duration} seconds")
-            return translated
-        except Exception as e:
-            _logger.warning(f"Translation failed for '{text}' to '{lang_code}': {e}")
-            return text
-
-    def _translate_text(self, texts, lang_code):
-        if not texts or not Translator:
-            return texts if isinstance(texts, list) else texts
+    def _translate_text(self, texts, lang_code, untranslated=None):
+        """
+        Translate a text or a list of texts from the translation memory only, it never blocks
+        on the translator. The missing texts are queued for the background worker and returned as they are.
+        :untranslated list filled with the texts missing from the memory or waiting for their translation
+        """
+        if not texts:
+            return texts
+        text_list = texts if isinstance(texts, list) else [texts]
         start_time = datetime.now()
         try:
-            result = [
-                self._translate_text_cached(text, lang_code) if not self._is_already_translated(text) else text
-                for text in texts
-            ] if isinstance(texts, list) else (
-                self._translate_text_cached(texts, lang_code) if not self._is_already_translated(texts) else texts
-            )
+            to_translate = [
+                text for text in text_list
+                if text and isinstance(text, str) and not self._is_already_translated(text)
+            ]
+            memory = self.env['translation.memory'].sudo()
+            translations = memory._lookup(to_translate, lang_code)
+            missing = [text for text in to_translate if text not in translations]
+            if missing:
+                memory._enqueue(missing, lang_code)
+            if untranslated is not None:
+                untranslated.extend(text for text in to_translate if not translations.get(text))
+            result = [translations.get(text) or text if isinstance(text, str) else text for text in text_list]
             duration = (datetime.now() - start_time).total_seconds()
-            _logger.debug(f"Batch translation took {duration} seconds for {len(texts) if isinstance(texts, list) else 1} texts to {lang_code}")
-            return result
+            _logger.debug(f"Batch translation took {duration} seconds for {len(text_list)} texts to {lang_code}, {len(missing)} queued")
+            return result if isinstance(texts, list) else result[0]
         except Exception as e:
-            _logger.warning(f"Batch translation failed for {len(texts) if isinstance(texts, list) else 1} texts to {lang_code}: {e}")
+            _logger.warning(f"Batch translation failed for {len(text_list)} texts to {lang_code}: {e}")
             return texts
 
+    def _get_stored_translations(self, field_texts, lang_code, jobs):
+        """
+        Values to store for {field: base text} in the format 'Original (Translated)'.
+        The fields not in the translation memory yet are added to jobs for the background worker.
+        """
+        self.ensure_one()
+        translations = self.env['translation.memory'].sudo()._lookup(list(field_texts.values()), lang_code)
+        updates = {}
+        for field, text in field_texts.items():
+            if not text or not isinstance(text, str):
+                continue
+            translated = translations.get(text)
+            if not translated:
+                jobs.append((self._name, self.id, field, lang_code))
+            elif translated and translated != text:
+                updates[field] = f"{text} ({translated})"
+        return updates
+
     def _is_already_translated(self, text):
         """Check if text already contains a translation (e.g., 'original (translated)')."""
         return isinstance(text, str) and '(' in text and ')' in text and text.endswith(')')
@@ -87,6 +95,7 @@ class TranslationMixin(models.AbstractModel):
         lang_record = self.env['res.lang'].search([('code', '=', user_lang)], limit=1)
 
         records = super().create(vals_list)
+        jobs = []
         for record, vals in zip(records, vals_list):
             if not record.language_id or record.language_id.code != user_lang:
                 record.language_id = lang_record
@@ -97,26 +106,20 @@ class TranslationMixin(models.AbstractModel):
 
             translatable_fields = record._get_translatable_fields()
             # Only process fields present in vals
-            texts = [
-                vals[field]
+            texts = {
+                field: vals[field]
                 for field in translatable_fields
-                if field in vals and vals[field] and not self._is_already_translated(vals[field])
-            ]
+                if field in vals and vals[field] and isinstance(vals[field], str)
+                and not self._is_already_translated(vals[field])
+            }
             if not texts:
                 continue
 
-            translated_texts = record._translate_text(texts, lang_code)
-            updates = {
-                field: f"{vals[field]} ({translated})"
-                for field, translated in zip(
-                    [f for f in translatable_fields if f in vals],
-                    translated_texts
-                )
-                if translated and translated != vals[field]
-            }
+            updates = record._get_stored_translations(texts, lang_code, jobs)
             if updates:
                 record.with_context(skip_translation=True).write(updates)
 
+        self.env['translation.queue'].sudo()._enqueue(jobs)
         duration = (datetime.now() - start_time).total_seconds()
         return records
 
@@ -128,6 +131,7 @@ class TranslationMixin(models.AbstractModel):
         all_langs = self.env['res.lang'].search([('active', '=', True)])
         result = super().write(vals)
 
+        jobs = []
         for rec in self:
             translatable_fields = rec._get_translatable_fields()
             cleaned_vals = {}
@@ -144,21 +148,17 @@ class TranslationMixin(models.AbstractModel):
             rec.with_context(skip_translation=True, lang='en_US').write(cleaned_vals)
 
             # Read back English text (to make sure translations use actual stored base)
-            base_texts = [getattr(rec.with_context(lang='en_US'), field) for field in cleaned_vals]
+            base_texts = {field: getattr(rec.with_context(lang='en_US'), field) for field in cleaned_vals}
 
             for lang in all_langs:
                 if lang.code == 'en_US':
                     continue
 
-                translated_texts = rec._translate_text(base_texts, lang.code)
-                updates = {
-                    field: f"{base} ({translated})"
-                    for field, base, translated in zip(cleaned_vals, base_texts, translated_texts)
-                    if translated and translated != base
-                }
+                updates = rec._get_stored_translations(base_texts, lang.code, jobs)
                 if updates:
                     rec.with_context(skip_translation=True, lang=lang.code).write(updates)
 
+        self.env['translation.queue'].sudo()._enqueue(jobs)
         return result
 
     def read(self, fields=None, load='_classic_read'):
@@ -181,10 +181,22 @@ class TranslationMixin(models.AbstractModel):
                     text_indices.append((record, field))
 
         if all_texts:
-            translated_texts = self._translate_text(all_texts, lang_code)
+            untranslated = []
+            translated_texts = self._translate_text(all_texts, lang_code, untranslated)
+            untranslated = set(untranslated)
+            jobs = []
+            waiting_jobs = []
             for (record, field), translated in zip(text_indices, translated_texts):
                 if translated and translated != record[field]:
+                    # the records stored before the translation was available are updated in the background
+                    jobs.append((self._name, record['id'], field, lang_code))
                     record[field] = f"{record[field]} ({translated})"
+                elif record[field] in untranslated:
+                    # the texts not translated yet are queued by _translate_text,
+                    # the worker queues the record update when it stores their translation
+                    waiting_jobs.append((self._name, record['id'], field, lang_code, record[field]))
+            self.env['translation.queue'].sudo()._enqueue(jobs)
+            self.env['translation.queue'].sudo()._enqueue_waiting(waiting_jobs)
 
         duration = (datetime.now() - start_time).total_seconds()
         _logger.info(f"Read operation took {duration} seconds for {len(records)} records with {len(all_texts)} translations")
@@ -217,17 +229,27 @@ class TranslationMixin(models.AbstractModel):
 
         rec_name_field = self._get_rec_name_field()
 
+        names = []
         for rec in self:
             # Get the original value in English (base language)
             name_en = rec.with_context(lang='en_US')[rec_name_field]
 
             # Get the value in the active UI language
             name_lang = rec.with_context(lang=lang_code)[rec_name_field]
+            names.append((rec, name_en, name_lang))
+
+        # Translate all the names at once
+        to_translate = [
+            name_lang or name_en for rec, name_en, name_lang in names
+            if lang_code != 'en_US' and not rec._is_already_translated(name_lang)
+        ]
+        translations = dict(zip(to_translate, self._translate_text(to_translate, lang_code))) if to_translate else {}
 
+        for rec, name_en, name_lang in names:
             # If the user's language is not English and the value isn't already in "Original (Translated)" format,
-            # try to translate and combine the values
+            # combine the original and the translated values
             if lang_code != 'en_US' and not rec._is_already_translated(name_lang):
-                translated_text = rec._translate_text_cached(name_lang or name_en, lang_code)
+                translated_text = translations.get(name_lang or name_en, name_lang or name_en)
                 # Combine original and translated text in the format "Original (Translated)"
                 display_text = f"{name_en} ({translated_text})" if translated_text else name_en
             else:
@@ -0,0 +1,225 @@
+from odoo import models, fields, api
+import hashlib
+import logging
+from datetime import datetime
+from psycopg2.extras import execute_values
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from googletrans import Translator
+except ImportError:
+    Translator = None
+    _logger.warning("googletrans not installed. Install via pip if needed.")
+
+STORE_BATCH_SIZE = 1000
+MAX_ATTEMPTS = 3
+PENDING_TEXTS_KEY = 'translation.memory.pending'
+
+
+class TranslationMemory(models.Model):
+    _name = 'translation.memory'
+    _description = 'Machine Translation Memory'
+
+    source_hash = fields.Char(string='Source Hash', required=True, readonly=True)
+    lang = fields.Char(string='Target Language', required=True, readonly=True)
+    source_text = fields.Text(string='Source Text', readonly=True)
+    translated_text = fields.Text(string='Translated Text', readonly=True,
+                                  help="Empty while the text waits for the background translation.")
+    attempts = fields.Integer(string='Attempts', readonly=True, default=0)
+
+    _sql_constraints = [
+        ('source_lang_uniq', 'unique(source_hash, lang)', 'A text can be translated only once per language.'),
+    ]
+
+    def init(self):
+        # the worker scan of the texts waiting for a translation
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS translation_memory_pending_index
+            ON translation_memory (id)
+            WHERE translated_text IS NULL AND attempts < %s
+        """ % MAX_ATTEMPTS)
+
+    @api.model
+    def _hash_text(self, text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_target_lang(self, lang_code):
+        """Language sent to the translator, 'it_IT' and 'it_CH' share the same translations."""
+        return (lang_code or '').split('_')[0]
+
+    @api.model
+    def _lookup(self, texts, lang_code):
+        """
+        Look up the translations of many texts with one query.
+        Returns {text: translated text} for the texts in the memory,
+        the translated text is None while the text waits for the translation.
+        """
+        hashes = {}
+        for text in texts:
+            if text and isinstance(text, str):
+                hashes.setdefault(self._hash_text(text), text)
+        if not hashes:
+            return {}
+        self.env.cr.execute("""
+            SELECT source_hash, translated_text
+            FROM translation_memory
+            WHERE lang = %s AND source_hash IN %s
+        """, (self._get_target_lang(lang_code), tuple(hashes)))
+        return {hashes[source_hash]: translated for source_hash, translated in self.env.cr.fetchall()}
+
+    @api.model
+    def _insert(self, translations, lang_code, on_conflict):
+        lang = self._get_target_lang(lang_code)
+        rows = [(self._hash_text(text), lang, text, translated, self.env.uid, self.env.uid)
+                for text, translated in translations.items() if text and isinstance(text, str)]
+        count = 0
+        for index in range(0, len(rows), STORE_BATCH_SIZE):
+            inserted = execute_values(self.env.cr._obj, """
+                INSERT INTO translation_memory (source_hash, lang, source_text, translated_text,
+                                                create_uid, write_uid, create_date, write_date)
+                VALUES %s
+                ON CONFLICT (source_hash, lang) """ + on_conflict + """
+                RETURNING id
+            """, rows[index:index + STORE_BATCH_SIZE],
+                template="(%s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')",
+                fetch=True)
+            count += len(inserted)
+        return count
+
+    @api.model
+    def _store(self, translations, lang_code):
+        """
+        Store {text: translated text} in batches, the texts waiting for a translation are filled.
+        A translation stored meanwhile by another worker is kept.
+        """
+        translations = {text: translated for text, translated in translations.items() if translated}
+        count = self._insert(translations, lang_code, """
+            DO UPDATE SET translated_text = EXCLUDED.translated_text,
+                          write_uid = EXCLUDED.write_uid,
+                          write_date = EXCLUDED.write_date
+            WHERE translation_memory.translated_text IS NULL""")
+        if count:
+            _logger.debug(f"Stored {count} translations to '{lang_code}'")
+        return count
+
+    @api.model
+    def _get_postcommit_queue(self, key, model_name, method_name):
+        """
+        Set of the rows to queue once the transaction commits. The rows are inserted
+        with a new cursor, so a read never waits on the worker or on the other reads.
+        """
+        cr = self.env.cr
+        pending = cr.postcommit.data.get(key)
+        if pending is None:
+            pending = cr.postcommit.data[key] = set()
+            registry = self.env.registry
+            uid = self.env.uid
+
+            def _flush():
+                try:
+                    with registry.cursor() as new_cr:
+                        env = api.Environment(new_cr, uid, {})
+                        getattr(env[model_name].sudo(), method_name)(pending)
+                except Exception as e:
+                    _logger.warning(f"Unable to queue {len(pending)} translations: {e}")
+            cr.postcommit.add(_flush)
+        return pending
+
+    @api.model
+    def _enqueue(self, texts, lang_code):
+        """
+        Queue the texts for the background translation, never blocks on the translator.
+        """
+        lang = self._get_target_lang(lang_code)
+        rows = [(text, lang) for text in texts if text and isinstance(text, str)]
+        if rows:
+            self._get_postcommit_queue(PENDING_TEXTS_KEY, self._name, '_insert_pending').update(rows)
+
+    @api.model
+    def _insert_pending(self, rows):
+        texts_by_lang = {}
+        for text, lang in rows:
+            texts_by_lang.setdefault(lang, {})[text] = None
+        count = 0
+        for lang, texts in texts_by_lang.items():
+            count += self._insert(texts, lang, "DO NOTHING")
+        if count:
+            self._trigger_worker()
+
+    @api.model
+    def _trigger_worker(self):
+        cron = self.env.ref('global_translation.ir_cron_translation_worker', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _call_translator(self, texts, lang_code):
+        """Call the external translator, only the successful translations are returned."""
+        out = {}
+        if not texts or not Translator:
+            return out
+        translator = Translator()
+        dest = self._get_target_lang(lang_code)
+        start_time = datetime.now()
+        for text in texts:
+            try:
+                out[text] = translator.translate(text, dest=dest).text
+            except Exception as e:
+                _logger.warning(f"Translation failed for '{text}' to '{lang_code}': {e}")
+        duration = (datetime.now() - start_time).total_seconds()
+        _logger.debug(f"Translated {len(out)}/{len(texts)} texts to '{lang_code}' in {duration} seconds")
+        return out
+
+    @api.model
+    def _translate_pending(self, batch_size=200):
+        """
+        Translate a batch of the queued texts, the cron runs in one worker at a time.
+        No row is locked while the translator is called and every language is committed
+        on its own, so the reads never wait for the translator.
+        Returns the number of texts of the batch.
+        """
+        if not Translator:
+            _logger.warning("googletrans not installed, the queued texts are not translated.")
+            return 0
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, lang, source_text
+            FROM translation_memory
+            WHERE translated_text IS NULL AND attempts < %s
+            ORDER BY id
+            LIMIT %s
+        """, (MAX_ATTEMPTS, batch_size))
+        rows = cr.fetchall()
+        cr.commit()
+        rows_by_lang = {}
+        for memory_id, lang, source_text in rows:
+            rows_by_lang.setdefault(lang, []).append((memory_id, source_text))
+        for lang, lang_rows in rows_by_lang.items():
+            translations = self._call_translator([source_text for _memory_id, source_text in lang_rows], lang)
+            self._store(translations, lang)
+            memory_ids = tuple(memory_id for memory_id, _source_text in lang_rows)
+            # the failed texts are retried by the next runs up to MAX_ATTEMPTS
+            cr.execute("""
+                UPDATE translation_memory SET attempts = attempts + 1
+                WHERE id IN %s AND translated_text IS NULL
+            """, (memory_ids,))
+            self.env['translation.queue']._release_waiting_jobs(memory_ids)
+            cr.commit()
+        return len(rows)
+
+    @api.model
+    def run_translation_worker(self, batch_size=200, max_batches=50):
+        """
+        Fill the translation memory and the stored translated values,
+        every batch is committed on its own.
+        """
+        queue_obj = self.env['translation.queue']
+        # the jobs queued by reads while their text was being translated
+        queue_obj._release_waiting_jobs()
+        for _count in range(max_batches):
+            done = queue_obj._process_jobs(batch_size) + self._translate_pending(batch_size)
+            self.env.cr.commit()
+            if not done:
+                break
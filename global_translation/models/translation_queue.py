@@ -0,0 +1,180 @@
+from odoo import models, fields, api
+import logging
+from psycopg2.extras import execute_values
+from .translation_memory import MAX_ATTEMPTS
+
+_logger = logging.getLogger(__name__)
+
+STORE_BATCH_SIZE = 1000
+PENDING_JOBS_KEY = 'translation.queue.pending'
+WAITING_JOBS_KEY = 'translation.queue.waiting'
+
+
+class TranslationQueue(models.Model):
+    _name = 'translation.queue'
+    _description = 'Pending Stored Field Translation'
+    _order = 'id'
+
+    res_model = fields.Char(string='Model', required=True, readonly=True)
+    res_id = fields.Integer(string='Record ID', required=True, readonly=True)
+    field_name = fields.Char(string='Field', required=True, readonly=True)
+    lang = fields.Char(string='Language', required=True, readonly=True)
+    waiting = fields.Boolean(string='Waiting', readonly=True, default=False,
+                             help="The text is not translated yet, the job is released by the worker "
+                                  "when the translation memory is filled.")
+    source_hash = fields.Char(string='Source Hash', readonly=True)
+
+    _sql_constraints = [
+        ('record_field_lang_uniq', 'unique(res_model, res_id, field_name, lang)',
+         'A field is queued only once per language.'),
+    ]
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute("""
+            CREATE INDEX IF NOT EXISTS translation_queue_ready_index
+            ON translation_queue (id)
+            WHERE waiting IS NOT TRUE
+        """)
+        cr.execute("""
+            CREATE INDEX IF NOT EXISTS translation_queue_waiting_index
+            ON translation_queue (source_hash)
+            WHERE waiting
+        """)
+
+    @api.model
+    def _enqueue(self, jobs):
+        """
+        Queue the stored translations to update once the transaction commits.
+        :jobs list of (res_model, res_id, field_name, lang)
+        """
+        if jobs:
+            self.env['translation.memory']._get_postcommit_queue(PENDING_JOBS_KEY, self._name, '_insert_jobs').update(jobs)
+
+    @api.model
+    def _enqueue_waiting(self, jobs):
+        """
+        Queue the stored translations of texts not translated yet, the jobs wait for the worker
+        to fill the translation memory and are released by _release_waiting_jobs.
+        :jobs list of (res_model, res_id, field_name, lang, source text)
+        """
+        if jobs:
+            memory = self.env['translation.memory']
+            rows = [job[:4] + (memory._hash_text(job[4]),) for job in jobs]
+            memory._get_postcommit_queue(WAITING_JOBS_KEY, self._name, '_insert_waiting_jobs').update(rows)
+
+    @api.model
+    def _insert_jobs(self, jobs):
+        self._insert_rows(list(jobs), False, """
+            DO UPDATE SET waiting = false, source_hash = NULL
+            WHERE translation_queue.waiting""")
+        self.env['translation.memory']._trigger_worker()
+
+    @api.model
+    def _insert_waiting_jobs(self, jobs):
+        self._insert_rows([job[:4] for job in jobs], True, "DO NOTHING", [job[4] for job in jobs])
+
+    @api.model
+    def _insert_rows(self, jobs, waiting, on_conflict, source_hashes=None):
+        rows = [job + (waiting, source_hashes[index] if source_hashes else None, self.env.uid, self.env.uid)
+                for index, job in enumerate(jobs)]
+        for index in range(0, len(rows), STORE_BATCH_SIZE):
+            execute_values(self.env.cr._obj, """
+                INSERT INTO translation_queue (res_model, res_id, field_name, lang, waiting, source_hash,
+                                               create_uid, write_uid, create_date, write_date)
+                VALUES %s
+                ON CONFLICT (res_model, res_id, field_name, lang) """ + on_conflict,
+                rows[index:index + STORE_BATCH_SIZE],
+                template="(%s, %s, %s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')")
+
+    @api.model
+    def _release_waiting_jobs(self, memory_ids=None):
+        """
+        Queue the jobs of the records waiting on the given translation memory rows (None for all of them):
+        the translated texts release their jobs, the texts that failed MAX_ATTEMPTS times drop them.
+        Returns the number of released jobs.
+        """
+        if memory_ids is not None and not memory_ids:
+            return 0
+        cr = self.env.cr
+        memory_filter = "m.id IN %(memory_ids)s AND" if memory_ids is not None else ""
+        params = {'memory_ids': tuple(memory_ids or ()), 'max_attempts': MAX_ATTEMPTS}
+        cr.execute("""
+            UPDATE translation_queue q
+            SET waiting = false
+            FROM translation_memory m
+            WHERE """ + memory_filter + """ m.translated_text IS NOT NULL
+            AND q.waiting
+            AND q.source_hash = m.source_hash
+            AND split_part(q.lang, '_', 1) = m.lang
+        """, params)
+        released = cr.rowcount
+        cr.execute("""
+            DELETE FROM translation_queue q
+            USING translation_memory m
+            WHERE """ + memory_filter + """ m.translated_text IS NULL
+            AND m.attempts >= %(max_attempts)s
+            AND q.waiting
+            AND q.source_hash = m.source_hash
+            AND split_part(q.lang, '_', 1) = m.lang
+        """, params)
+        return released
+
+    @api.model
+    def _process_jobs(self, batch_size=200):
+        """
+        Write the translated values of a batch of queued fields in the format 'Original (Translated)'.
+        The texts missing from the translation memory are translated here, in the background,
+        and committed before the records are written.
+        Returns the number of processed jobs.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, res_model, res_id, field_name, lang
+            FROM translation_queue
+            WHERE waiting IS NOT TRUE
+            ORDER BY id
+            LIMIT %s
+        """, (batch_size,))
+        rows = cr.fetchall()
+        if not rows:
+            return 0
+        memory = self.env['translation.memory']
+        jobs = {}
+        for _job_id, res_model, res_id, field_name, lang in rows:
+            jobs.setdefault((res_model, lang), {}).setdefault(res_id, []).append(field_name)
+        for (res_model, lang), record_fields in jobs.items():
+            if res_model not in self.env:
+                continue
+            records = self.env[res_model].sudo().with_context(lang='en_US').browse(list(record_fields)).exists()
+            mixin = self.env['translation.mixin']
+            base_texts = {}
+            for record in records:
+                for field_name in record_fields[record.id]:
+                    if field_name in record._fields:
+                        base_texts[(record.id, field_name)] = mixin._extract_original_text(record[field_name])
+            texts = [text for text in base_texts.values() if text and isinstance(text, str)]
+            translations = memory._lookup(texts, lang)
+            missing = list(dict.fromkeys(text for text in texts if not translations.get(text)))
+            if missing:
+                cr.commit()
+                new_translations = memory._call_translator(missing, lang)
+                memory._store(new_translations, lang)
+                cr.commit()
+                translations.update(new_translations)
+            for record in records:
+                updates = {}
+                for field_name in record_fields[record.id]:
+                    base = base_texts.get((record.id, field_name))
+                    translated = translations.get(base)
+                    if translated and translated != base:
+                        updates[field_name] = f"{base} ({translated})"
+                if updates:
+                    try:
+                        with cr.savepoint():
+                            record.with_context(skip_translation=True, lang=lang).write(updates)
+                    except Exception as e:
+                        _logger.warning(f"Unable to store the translations of {record} to '{lang}': {e}")
+        cr.execute("DELETE FROM translation_queue WHERE id IN %s", (tuple(row[0] for row in rows),))
+        _logger.debug(f"Processed {len(rows)} queued translations")
+        return len(rows)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.global_translation.models import translation_memory
+#
+#
+# --test-tags=global_translation
+#
+#
+
+
+@tagged('-standard', 'global_translation')
+class TranslationMemoryStore(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.memory = self.env['translation.memory']
+
+    def test_bulk_lookup_and_batched_store(self):
+        translations = {'Gear %s' % index: 'Ingranaggio %s' % index for index in range(5)}
+        with patch.object(translation_memory, 'STORE_BATCH_SIZE', 2), \
+                patch.object(translation_memory, 'execute_values', wraps=translation_memory.execute_values) as execute_values:
+            assert self.memory._store(translations, 'it_IT') == 5
+        # 5 rows in batches of 2
+        assert execute_values.call_count == 3
+        # every language variant shares the same translations, all the texts are read with one query
+        with self.assertQueryCount(1):
+            found = self.memory._lookup(list(translations) + ['Missing', '', None], 'it_CH')
+        assert found == translations, found
+
+    def test_store_fills_only_pending_texts(self):
+        self.memory._store({'Gear': 'Ingranaggio'}, 'it_IT')
+        self.memory._insert({'Shaft': None}, 'it_IT', "DO NOTHING")
+        assert self.memory._lookup(['Gear', 'Shaft'], 'it_IT') == {'Gear': 'Ingranaggio', 'Shaft': None}
+        # the translation stored meanwhile by another worker is kept
+        assert self.memory._store({'Gear': 'Ruota dentata', 'Shaft': 'Albero', 'Pin': ''}, 'it_IT') == 1
+        assert self.memory._lookup(['Gear', 'Shaft', 'Pin'], 'it_IT') == {'Gear': 'Ingranaggio', 'Shaft': 'Albero'}
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.global_translation.models import translation_memory
+from odoo.addons.global_translation.models.translation_memory import PENDING_TEXTS_KEY
+#
+#
+# --test-tags=global_translation
+#
+#
+
+
+@tagged('-standard', 'global_translation')
+class TranslationWorker(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.memory = self.env['translation.memory']
+        self.queue = self.env['translation.queue']
+
+    def _patch_translator(self, translations=None):
+        """
+        Mock the external translator, with no translations any call fails the test
+        """
+        def call_translator(memory, texts, lang_code):
+            if translations is None:
+                raise AssertionError("The translator is called for %r" % texts)
+            return {text: translations[text] for text in texts if text in translations}
+        return patch.object(type(self.memory), '_call_translator', call_translator)
+
+    def test_translate_text_never_calls_translator(self):
+        self.memory._store({'Bolt': 'Bullone'}, 'it_IT')
+        untranslated = []
+        with self._patch_translator():
+            result = self.env['translation.mixin']._translate_text(['Bolt', 'Nut'], 'it_IT', untranslated)
+        assert result == ['Bullone', 'Nut'], result
+        assert untranslated == ['Nut'], untranslated
+        # the missing text is queued for the worker after the commit
+        assert self.env.cr.postcommit.data[PENDING_TEXTS_KEY] == {('Nut', 'it')}
+
+    def test_read_name_get_never_call_translator(self):
+        self.env['res.lang']._activate_lang('it_IT')
+        self.env.user.lang = 'it_IT'
+        model_names = [model_name for model_name in self.registry['translation.mixin']._inherit_children
+                       if model_name in self.env and not self.env[model_name]._abstract]
+        records_found = False
+        with self._patch_translator():
+            for model_name in model_names:
+                records = self.env[model_name].with_context(lang='it_IT').search([], limit=20)
+                if records:
+                    records_found = True
+                    records.read(records._get_translatable_fields())
+                    records.name_get()
+        if not records_found:
+            self.skipTest("No record of a model using translation.mixin")
+
+    def test_worker_fills_memory_and_stored_values(self):
+        partner = self.env['res.partner'].create({'name': 'Washer'})
+        self.memory._insert_pending({('Washer', 'it')})
+        # the job of a record read while its text was not translated yet
+        self.queue._insert_waiting_jobs({('res.partner', partner.id, 'name', 'it_IT', self.memory._hash_text('Washer'))})
+        assert self.queue._process_jobs() == 0
+        assert partner.name == 'Washer'
+        with self._patch_translator({'Washer': 'Rondella'}), \
+                patch.object(translation_memory, 'Translator', object), \
+                patch.object(self.env.cr, 'commit', lambda: None):
+            self.memory.run_translation_worker()
+        assert self.memory._lookup(['Washer'], 'it_IT') == {'Washer': 'Rondella'}
+        partner.invalidate_recordset(['name'])
+        assert partner.name == 'Washer (Rondella)', partner.name
+        assert not self.queue.search([('res_model', '=', 'res.partner'), ('res_id', '=', partner.id)])
+
+    def test_failed_translation_drops_waiting_jobs(self):
+        partner = self.env['res.partner'].create({'name': 'Spring'})
+        self.memory._insert_pending({('Spring', 'it')})
+        self.queue._insert_waiting_jobs({('res.partner', partner.id, 'name', 'it_IT', self.memory._hash_text('Spring'))})
+        with self._patch_translator({}), \
+                patch.object(translation_memory, 'Translator', object), \
+                patch.object(self.env.cr, 'commit', lambda: None):
+            # the worker goes on with the batches until the text has failed MAX_ATTEMPTS times
+            self.memory.run_translation_worker()
+        assert self.memory._lookup(['Spring'], 'it_IT') == {'Spring': None}
+        assert not self.queue.search([('res_model', '=', 'res.partner'), ('res_id', '=', partner.id)])
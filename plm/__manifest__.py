@@ -55,6 +55,8 @@
         "views/ir_cron.xml",
         "views/plm_cad_open.xml",
         "views/plm_cad_open_bck.xml",
+        "views/plm_bom_explode_cache.xml",
+        "views/plm_report_job.xml",
         "views/mail_activity_type.xml",
         "views/sequence.xml",
         "views/menu.xml",
@@ -20,4 +20,5 @@
 #
 ##############################################################################
 from . import main
+from . import bom_export
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
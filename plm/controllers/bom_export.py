@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+
+Stream the exploded BoM structure as CSV or XLSX.
+Rows come from mrp.bom.iter_export_rows so the memory does not depend on the structure size.
+'''
+import io
+import os
+import csv
+import logging
+import tempfile
+import xlsxwriter
+from odoo import api
+from odoo import _
+from odoo.http import Controller, route, request, Response, content_disposition
+from odoo.addons.plm.models.mrp_bom import BOM_EXPORT_COLUMNS
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BomExport(Controller):
+
+    @route('/plm/bom_export/<int:bom_id>', type='http', auth='user', methods=['GET'])
+    def bom_export(self, bom_id, file_format='csv', summarize='0', **kw):
+        bom_brws = request.env['mrp.bom'].browse(bom_id).exists()
+        if not bom_brws:
+            return request.not_found()
+        bom_brws.check_access_rights('read')
+        bom_brws.check_access_rule('read')
+        summarize = summarize not in ('0', 'False', 'false', '')
+        file_name = '%s.%s' % (bom_brws.display_name, file_format)
+        if file_format == 'xlsx':
+            body = self._xlsx_stream(bom_brws, summarize)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        elif file_format == 'csv':
+            body = self._csv_stream(bom_id, summarize)
+            content_type = 'text/csv;charset=utf-8'
+        else:
+            return Response(_('Unsupported format %r') % file_format, status=400)
+        return Response(body,
+                        headers=[('Content-Type', content_type),
+                                 ('Content-Disposition', content_disposition(file_name))],
+                        direct_passthrough=True)
+
+    def _csv_stream(self, bom_id, summarize):
+        """
+        The body is produced after the request cursor is closed so the rows are read with a dedicated one
+        """
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow([str(label) for _field, label in BOM_EXPORT_COLUMNS])
+                for row in env['mrp.bom'].browse(bom_id).iter_export_rows(summarize=summarize):
+                    writer.writerow([row[field] for field, _label in BOM_EXPORT_COLUMNS])
+                    if buffer.tell() >= CHUNK_SIZE:
+                        yield buffer.getvalue().encode('utf-8')
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue().encode('utf-8')
+        return generate()
+
+    def _xlsx_stream(self, bom_brws, summarize):
+        """
+        The workbook is written in constant memory mode to a temporary file that is streamed and removed
+        """
+        fd, file_path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+            worksheet = workbook.add_worksheet(_('Structure'))
+            header_format = workbook.add_format({'bold': True})
+            for col, (_field, label) in enumerate(BOM_EXPORT_COLUMNS):
+                worksheet.write(0, col, str(label), header_format)
+            for row_index, row in enumerate(bom_brws.iter_export_rows(summarize=summarize), 1):
+                for col, (field, _label) in enumerate(BOM_EXPORT_COLUMNS):
+                    worksheet.write(row_index, col, row[field])
+            workbook.close()
+        except Exception:
+            os.remove(file_path)
+            raise
+
+        def generate():
+            try:
+                with open(file_path, 'rb') as f:
+                    chunk = f.read(CHUNK_SIZE)
+                    while chunk:
+                        yield chunk
+                        chunk = f.read(CHUNK_SIZE)
+            finally:
+                os.remove(file_path)
+        return generate()
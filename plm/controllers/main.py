@@ -8,6 +8,7 @@ from odoo import _
 from odoo.http import Controller, route, request, Response
 import copy
 from odoo.tools.misc import DEFAULT_SERVER_DATETIME_FORMAT
+from odoo.addons.plm.report.book_collector import streamFile
 
 def webservice(f):
     @functools.wraps(f)
@@ -279,16 +280,40 @@ class UploadDocument(Controller):
         try:
             for ir_attachement_id in request.env['ir.attachment'].sudo().browse(id):
                 if ir_attachement_id.printout:
-                    print_out_data = request.env['report.plm.ir_attachment_pdf']._render_qweb_pdf(ir_attachement_id)
-                    print_out_data = print_out_data[0]
-                    if print_out_data: 
-                        headers = [('Content-Type', 'application/pdf'),
-                                   ('Content-Length', len(print_out_data)),
-                                   ('Content-Disposition', f'inline; filename="{ir_attachement_id.engineering_code}_{ir_attachement_id.engineering_revision}.pdf"')]
-                        return request.make_response(print_out_data, headers)
+                    book_path = request.env['report.plm.ir_attachment_pdf']._render_book_file(ir_attachement_id)
+                    if book_path: 
+                        return self._stream_book(book_path,
+                                                 f'inline; filename="{ir_attachement_id.engineering_code}_{ir_attachement_id.engineering_revision}.pdf"')
                     else:
                         return request.not_found(f"Pdf document {ir_attachement_id.engineering_code} not Available")
                 else:
                     return request.not_found(f"Pdf document {ir_attachement_id.engineering_code} not Available")
         except Exception as ex:
             return Response(f"{ex}", status=500)
+
+    @route('/plm/document_book/<string:ids>', type='http', auth='user', methods=['GET'], csrf=False)
+    @webservice
+    def get_document_book(self, ids):
+        ir_attachment_ids = request.env['ir.attachment'].browse([int(doc_id) for doc_id in ids.split(',')]).exists()
+        book_path = request.env['report.plm.ir_attachment_pdf']._render_book_file(ir_attachment_ids)
+        if not book_path:
+            return request.not_found(_("Pdf documents not Available"))
+        return self._stream_book(book_path, 'inline; filename="documents.pdf"')
+
+    @route('/plm/product_book/<string:report_name>/<string:ids>', type='http', auth='user', methods=['GET'], csrf=False)
+    @webservice
+    def get_product_book(self, report_name, ids, level='0', check_state='0'):
+        report_model = 'report.%s' % report_name
+        if report_model not in request.env or not hasattr(request.env[report_model], '_render_book_file'):
+            return request.not_found()
+        product_ids = request.env['product.product'].browse([int(product_id) for product_id in ids.split(',')]).exists()
+        book_path = request.env[report_model]._render_book_file(product_ids,
+                                                                int(level),
+                                                                check_state not in ('0', 'False', 'false', ''))
+        return self._stream_book(book_path, 'inline; filename="%s.pdf"' % report_name)
+
+    def _stream_book(self, book_path, content_disposition):
+        headers = [('Content-Type', 'application/pdf'),
+                   ('Content-Length', os.path.getsize(book_path)),
+                   ('Content-Disposition', content_disposition)]
+        return Response(streamFile(book_path), headers=headers, direct_passthrough=True)
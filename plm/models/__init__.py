@@ -26,6 +26,8 @@ Created on 25 Aug 2016
 """
 from . import base
 from . import plm_mixin
+from . import plm_code_resolver
+from . import plm_version_mixin
 from . import product_product_document_rel
 from . import plm_treatment
 from . import plm_finishing
@@ -54,3 +56,5 @@ from . import plm_client
 from . import res_groups
 from . import utils
 from . import additional_info
+from . import plm_bom_explode_cache
+from . import plm_report_job
@@ -17,6 +17,7 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+import re
 import random
 import string
 import os
@@ -42,13 +43,18 @@ from odoo.addons.plm.models.plm_mixin import CONFIRMED_STATUS
 from odoo.addons.plm.models.plm_mixin import RELEASED_STATUS
 from odoo.addons.plm.models.plm_mixin import PLM_NO_WRITE_STATE
 from odoo.addons.plm.models.plm_mixin import OBSOLATED_STATUS
+from odoo.addons.plm.report.book_collector import cleanStampCache
+from odoo.addons.plm.report.book_collector import getStampCacheDir
+from odoo.addons.plm.models.utils import init_plm_trigram_indexes
 #
-from collections import defaultdict
-import itertools
+from odoo.osv import expression
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# check-out and check-in do not change the saved document
+PLM_VERSION_IGNORED_FIELDS = {'engineering_writable'}
+
 
 def random_name():
     random.seed()
@@ -58,7 +64,7 @@ def random_name():
 class IrAttachment(models.Model):
     _name='ir.attachment'
     _description="Ir Attachment"
-    _inherit = ['ir.attachment', 'revision.plm.mixin']
+    _inherit = ['ir.attachment', 'revision.plm.mixin', 'plm.version.mixin']
 
     printout = fields.Binary(_('Printout Content'),
                              help=_("Print PDF content."))
@@ -134,6 +140,15 @@ class IrAttachment(models.Model):
                 'target': 'new',
                 }
 
+    @api.model
+    def run_clean_stamp_cache_scheduler(self, max_age_days=30):
+        """
+        Remove the stamped printouts not printed in the last max_age_days
+        """
+        logging.info('Start Stamp Cache Clean Scheduler')
+        removed = cleanStampCache(getStampCacheDir(self.env), max_age_days)
+        logging.info('End Stamp Cache Clean Scheduler, %s files removed' % removed)
+
     @property
     def actions(self):
         return {'reactivate': self.action_reactivate,
@@ -144,10 +159,8 @@ class IrAttachment(models.Model):
 
     def isLatestRevision(self):
         for docBrws in self:
-            lastdocIds = self._getlastrev(docBrws.id)
-            for lastDocId in lastdocIds:
-                if lastDocId == docBrws.id:
-                    return True
+            if docBrws.engineering_is_latest:
+                return True
         return False
 
     @api.model
@@ -179,11 +192,28 @@ class IrAttachment(models.Model):
             if attachment_id_toCheck:
                 super().with_context(plm_avoid_recursion=True).check(mode, values)
                 
+    def _get_checkout_info(self):
+        """
+        :return: (checkout id, user id, hostname) of the document, False if checked-in
+        """
+        self.ensure_one()
+        checkoutMap = self.env['plm.checkout']._get_checkout_map([self.id] + list(self._prefetch_ids))
+        return checkoutMap.get(self.id, False)
+
+    def _load_checkout_map(self):
+        """
+        Load at once the checkout state of the documents and of their latest revisions
+        """
+        latest_ids = self.get_latest_ids_by_code(self.mapped('engineering_code'))
+        self.env['plm.checkout']._get_checkout_map(self.ids + list(latest_ids.values()))
+        return self
+
     def get_checkout_user(self):
         lastDoc = self._getlastrev(self.ids)
         if lastDoc:
-            for docBrws in self.env['plm.checkout'].search([('documentid', '=', lastDoc[0])]):
-                return docBrws.userid
+            checkoutInfo = self.browse(lastDoc[0])._get_checkout_info()
+            if checkoutInfo:
+                return self.env['res.users'].browse(checkoutInfo[1])
         return False
 
     
@@ -203,23 +233,18 @@ class IrAttachment(models.Model):
     
     def _get_last_rev_no_browser(self):
         result = []
+        latest_ids = self.get_latest_ids_by_code(self.mapped('engineering_code'))
         for objDoc in self:
-            doc_ids = self.search([('engineering_code', '=', objDoc.engineering_code)], order='engineering_revision DESC')
-            for doc in doc_ids:
-                result.append(doc.id)
-                break
-            if not doc_ids:
+            latest_id = latest_ids.get(objDoc.engineering_code)
+            if latest_id:
+                result.append(latest_id)
+            else:
                 logging.warning('[_getlastrev] No documents are found for object with engineering_code: "%s"' % (objDoc.engineering_code))
         return list(set(result))
     
     def browseLastRev(self):
         self.ensure_one()
-        out = self.search([('engineering_code', '=', self.engineering_code)],
-                          order='engineering_revision DESC',
-                          limit=1)
-        for obj in out:
-            return obj
-        return out
+        return self.get_latest_version()
     
     def GetLastNamesFromID(self):
         """
@@ -536,6 +561,7 @@ class IrAttachment(models.Model):
         """
         out = []
         computed = []
+        self._load_checkout_map()
         for ir_attachment_id in self:
             active_attachment_id = ir_attachment_id.id 
             if active_attachment_id in computed:
@@ -579,7 +605,7 @@ class IrAttachment(models.Model):
         listfiles = []
         if len(listedFiles) > 0:
             _datefiles, listfiles = listedFiles
-        for objDoc in self.browse(targetIds):
+        for objDoc in self.browse(targetIds)._load_checkout_map():
             outId = objDoc.id
             isCheckedOutToMe, checkOutUser = objDoc.checkoutByMeWithUser()
             datas_fname = objDoc.name
@@ -725,6 +751,48 @@ class IrAttachment(models.Model):
             break
         return (newID, newRevIndex)
 
+    def _bulk_new_revision(self):
+        """
+            Same as NewRevision for many documents, the new revisions are created at once
+            and share the stored file of the previous revision
+            :return: {document id: new revision document}
+        """
+        out = {}
+        if not self:
+            return out
+        latestIds = self.env['plm.code.resolver'].resolve(self._name, [(docBrws.engineering_code, None) for docBrws in self])
+        toRevise = {docBrws.id: latestIds.get((docBrws.engineering_code, None), docBrws.id) for docBrws in self}
+        oldObjects = self.browse(list(dict.fromkeys(toRevise.values())))
+        newObjects = {}
+        ctx = self.env.context.copy()
+        ctx['check'] = False
+        oldObjects.with_context(ctx).write({'engineering_state': 'undermodify'})
+        docVals = []
+        docDefaults = []
+        for oldObject in oldObjects:
+            defaults = {}
+            defaults['engineering_code'] = oldObject.engineering_code
+            defaults['engineering_revision'] = int(oldObject.engineering_revision) + 1
+            defaults['engineering_writable'] = True
+            defaults['engineering_state'] = START_STATUS
+            docDefaults.append(defaults)
+            docVals.append(oldObject.with_context(active_test=False).copy_data(defaults)[0])
+        newDocBrwsList = self.create(docVals)
+        for oldObject, newDocBrws, defaults in zip(oldObjects, newDocBrwsList, docDefaults):
+            oldObject.with_context(from_copy_translation=True).copy_translations(newDocBrws, excluded=defaults)
+            newObjects[oldObject.id] = newDocBrws
+        newDocBrwsList.write({'engineering_revision_user': self.env.uid,
+                              'engineering_revision_date': datetime.now(),
+                              'engineering_release_user': False,
+                              'engineering_release_date': False,
+                              'engineering_workflow_user': False,
+                              'engineering_workflow_date': False})
+        for oldObject in oldObjects:
+            oldObject.message_post(body=_('Created : New Revision.'))
+        for docId, latestId in toRevise.items():
+            out[docId] = newObjects[latestId]
+        return out
+
     
     def Clone(self, defaults={}):
         """
@@ -860,9 +928,8 @@ class IrAttachment(models.Model):
         """
             Check if a document is checked-in
         """
-        checkoutType = self.env['plm.checkout']
         for document in self:
-            if checkoutType.search([('documentid', '=', document.id)]):
+            if document._get_checkout_info():
                 logging.warning(
                     _("The document %s - %s has not checked-in" % (str(document.engineering_code), str(document.engineering_revision))))
                 return False
@@ -1021,7 +1088,10 @@ class IrAttachment(models.Model):
         
     def write(self, vals):
         if not self.env.context.get('odooPLM'):
-            return super(IrAttachment, self).write(vals)
+            res = super(IrAttachment, self).write(vals)
+            if 'datas' in vals or 'raw' in vals:
+                self._bump_plm_version()
+            return res
         check = self.env.context.get('check', True)
         if check:
             if not self.is_plm_state_writable() and not (self.env.user._is_admin() or self.env.user._is_superuser()):
@@ -1032,8 +1102,13 @@ class IrAttachment(models.Model):
         vals = self.plm_sanitize(vals)
         res = super(IrAttachment, self).write(vals)
         self.check_unique()
+        if set(vals) - PLM_VERSION_IGNORED_FIELDS:
+            self._bump_plm_version()
         return res
 
+    def _get_plm_version_label(self):
+        return _("Document %s revision %s") % (self.engineering_code or self.name, self.engineering_revision)
+
     
     def read(self, fields=[], load='_classic_read'):
         try:
@@ -1213,8 +1288,7 @@ class IrAttachment(models.Model):
     @api.model
     def _is_checkout(self):
         for ir_attachment_id in self:
-            _docName, _docRev, chekOutUser, _hostName = self.env['ir.attachment'].getCheckedOut(ir_attachment_id.id, None)
-            if chekOutUser:
+            if ir_attachment_id._get_checkout_info():
                 ir_attachment_id.with_context(check=False).is_checkout = True
             else:
                 ir_attachment_id.with_context(check=False).is_checkout = False
@@ -1354,23 +1428,29 @@ class IrAttachment(models.Model):
     def CheckedIn(self, files, default=None):
         """
             Get checked status for requested files
+            all the file names are resolved with a single ilike query served by the trigram index
         """
         retValues = []
-
-        def getcheckedfiles(files):
-            res = []
-            for fileName in files:
-                plmDocList = self.search([('name', 'ilike', fileName)], order='engineering_revision DESC')
-                if len(plmDocList) > 0:
-                    ids = plmDocList.ids
-                    ids.sort()
-                    docBrws = self.browse(ids[len(ids) - 1])
-                    checkoutFlag = docBrws._is_checkedout_for_me()
-                    res.append([fileName, not checkoutFlag])
-            return res
-
-        if len(files) > 0:  # no files to process
-            retValues = getcheckedfiles(files)
+        files = [fileName for fileName in files if fileName]
+        if not files:  # no files to process
+            return retValues
+        patterns = {}
+        for fileName in set(files):
+            # same matching of the sql ilike, % and _ are wildcards
+            regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in fileName)
+            patterns[fileName] = re.compile(regex, re.IGNORECASE | re.DOTALL)
+        last_ids = {}
+        domain = expression.OR([[('name', 'ilike', fileName)] for fileName in patterns])
+        for doc_dict in self.search_read(domain, ['name']):
+            for fileName, pattern in patterns.items():
+                if pattern.search(doc_dict['name'] or '') and doc_dict['id'] > last_ids.get(fileName, 0):
+                    last_ids[fileName] = doc_dict['id']
+        docs = self.browse(list(last_ids.values()))
+        for fileName in files:
+            if fileName in last_ids:
+                docBrws = docs.browse(last_ids[fileName])
+                checkoutFlag = docBrws._is_checkedout_for_me()
+                retValues.append([fileName, not checkoutFlag])
         return retValues
 
     @api.model
@@ -1388,14 +1468,13 @@ class IrAttachment(models.Model):
             Get Last/Requested revision of given items (by engineering_code, revision, update time)
         """
         ids = []
+        resolver = self.env['plm.code.resolver']
+        resolved = resolver.resolve(self._name, [(docName, docRev) for docName, docRev, _docIdToOpen in vals])
 
         def getCompIds(docName, docRev):
-            if docRev is None or docRev is False:
-                docBrwsList = self.search([('engineering_code', '=', docName)], order='engineering_revision')
-                if len(docBrwsList) > 0:
-                    ids.append(docBrwsList.ids[-1])
-            else:
-                ids.extend(self.search([('engineering_code', '=', docName), ('engineering_revision', '=', docRev)]).ids)
+            res_id = resolved.get(resolver._normalize_key(docName, docRev))
+            if res_id:
+                ids.append(res_id)
 
         for docName, docRev, docIdToOpen in vals:
             docBrowse = self.browse(docIdToOpen)
@@ -1412,10 +1491,11 @@ class IrAttachment(models.Model):
 
     
     def isCheckedOutByMe(self):
-        checkoutBrwsList = self.env['plm.checkout'].search(
-            [('documentid', '=', self.id), ('userid', '=', self.env.uid)])
-        for checkoutBrws in checkoutBrwsList:
-            return checkoutBrws.id
+        for docBrws in self:
+            checkoutInfo = docBrws._get_checkout_info()
+            if checkoutInfo and checkoutInfo[1] == self.env.uid:
+                return checkoutInfo[0]
+            break
         return False
 
     def checkoutByMeWithUser(self):
@@ -1510,16 +1590,13 @@ class IrAttachment(models.Model):
         docArray = self.getRelatedAllLevelDocumentsTree(docBrws)
         if selection == 2:
             docArray = self._getlastrev(docArray)
-        checkoutObj = self.env['plm.checkout']
         msg=''
-        for x in docArray:
+        for x in self.browse(docArray):
             if x.has_error:
                 msg+=x.engineering_code + "\n"
         if msg:
             raise UserError(msg)
-        for docId in docArray:
-            checkOutBrwsList = checkoutObj.search([('documentid', '=', docId), ('userid', '=', self.env.uid)])
-            checkOutBrwsList.unlink()
+        self.browse(docArray)._bulk_check_in(docBrws)
         return self.browse(docArray).read(['name'])
 
     @api.model
@@ -1635,21 +1712,21 @@ class IrAttachment(models.Model):
 
     @api.model
     def getCheckedOut(self, oid, default=None):
-        checkoutType = self.env['plm.checkout']
-        checkoutBrwsList = checkoutType.search([('documentid', '=', oid)])
-        for checkOutBrws in checkoutBrwsList:
-            return (checkOutBrws.documentid.engineering_code,
-                    checkOutBrws.documentid.engineering_revision,
-                    self.getUserSign(checkOutBrws.userid.id),
-                    checkOutBrws.hostname)
+        docBrws = self.browse(oid).with_prefetch(self._prefetch_ids)
+        checkoutInfo = docBrws._get_checkout_info() if docBrws else False
+        if checkoutInfo:
+            _checkoutId, userId, hostname = checkoutInfo
+            return (docBrws.engineering_code,
+                    docBrws.engineering_revision,
+                    self.getUserSign(userId),
+                    hostname)
         return ('', False, '', '')
     
     def _getCheckOutUser(self):
         for ir_attachment_id in self:
-            checkoutType = self.env['plm.checkout']
-            checkoutBrwsList = checkoutType.search([('documentid', '=', ir_attachment_id.id)])
-            for checkOutBrws in checkoutBrwsList:
-                return checkOutBrws.userid
+            checkoutInfo = ir_attachment_id._get_checkout_info()
+            if checkoutInfo:
+                return self.env['res.users'].browse(checkoutInfo[1])
         return self.env['res.users']
     
     @api.model
@@ -1683,10 +1760,9 @@ class IrAttachment(models.Model):
     def canBeSavedClient(self, documentValues={}, returnCode=False):
         engineering_code = documentValues.get('engineering_code')
         docRev = documentValues.get('engineering_revision')
-        for docBrws in self.search([('engineering_code', '=', engineering_code),
-                                    ('engineering_revision', '=', docRev)
-                                    ]):
-            return docBrws.canBeSaved(False, returnCode=returnCode)
+        if engineering_code and docRev not in (None, False):
+            for docBrws in self.env['plm.code.resolver'].resolve_one(self._name, engineering_code, docRev):
+                return docBrws.canBeSaved(False, returnCode=returnCode)
         if returnCode:
             return True, _('Document %r with revision %r not present in Odoo.') % (engineering_code, docRev), 'NO_ERROR'
         return True, _('Document %r with revision %r not present in Odoo.') % (engineering_code, docRev)
@@ -1728,9 +1804,11 @@ class IrAttachment(models.Model):
 
     @api.model
     def getCheckOutObject(self):
-        checkoutIDs = self.env['plm.checkout'].search([('documentid', '=', self.id)])
-        for checkoutID in checkoutIDs:
-            return checkoutID
+        for docBrws in self:
+            checkoutInfo = docBrws._get_checkout_info()
+            if checkoutInfo:
+                return self.env['plm.checkout'].browse(checkoutInfo[0])
+            break
         return None
 
     @api.model
@@ -1759,10 +1837,12 @@ class IrAttachment(models.Model):
         productDocumentRelations = {}
         objStructure = json.loads(cPickleStructure)
 
+        resolver = self.env['plm.code.resolver']
         documentAttribute = objStructure.get('DOCUMENT_ATTRIBUTES', {})
         if documentAttribute:
-            for pp_id in self.search([('engineering_code', '=', documentAttribute.get('engineering_code', '')),
-                                        ('engineering_revision', '=', documentAttribute.get('engineering_revision', -1))]):
+            for pp_id in resolver.resolve_one(self._name,
+                                              documentAttribute.get('engineering_code', ''),
+                                              documentAttribute.get('engineering_revision', -1)):
                 pp_id.canBeSaved(raiseError=True)
 
         def populateStructure(parentItem=False, structure={}, parentCreateBOM=True):
@@ -1811,6 +1891,59 @@ class IrAttachment(models.Model):
 
         populateStructure(structure=objStructure)
 
+        def structureKey(attributes):
+            return (attributes.get('engineering_code'), attributes.get('engineering_revision'))
+
+        # Resolve all the documents and products of the structure at once
+        structureDocIds = resolver.resolve(self._name, [structureKey(attributes) for attributes in documentAttributes.values()
+                                                        if attributes.get('engineering_revision') is not None])
+        structureProductIds = resolver.resolve('product.product', [structureKey(attributes) for attributes in productAttributes.values()
+                                                                   if attributes.get('engineering_revision') is not None])
+
+        def getStructureRecord(model_obj, resolvedIds, attributes):
+            if attributes.get('engineering_revision') is None:
+                return model_obj
+            return model_obj.browse(resolvedIds.get(resolver._normalize_key(*structureKey(attributes)), []))
+
+        # Check the versions read by the client before saving anything
+        product_product = self.env['product.product']
+        expectedDocVersions = {}
+        for documentAttribute in documentAttributes.values():
+            expectedVersion = documentAttribute.pop('plm_version', None)
+            docBrws = getStructureRecord(self, structureDocIds, documentAttribute)
+            if docBrws and expectedVersion is not None:
+                expectedDocVersions[docBrws.id] = expectedVersion
+        expectedBomVersions = {}
+        for productAttribute in productAttributes.values():
+            expectedVersion = productAttribute.pop('bom_plm_version', None)
+            productBrws = getStructureRecord(product_product, structureProductIds, productAttribute)
+            if productBrws and expectedVersion is not None:
+                expectedBomVersions[productBrws.product_tmpl_id.id] = expectedVersion
+        toSaveBomProductIds = []
+        for parentId in productRelations:
+            productBrws = getStructureRecord(product_product, structureProductIds, productAttributes[parentId])
+            if productBrws:
+                toSaveBomProductIds.append(productBrws.id)
+        toSaveBoms = self.env['mrp.bom'].search([('product_tmpl_id', 'in', product_product.browse(toSaveBomProductIds).product_tmpl_id.ids)])
+        toSaveDocs = self.browse(list(structureDocIds.values())).filtered(lambda docBrws: docBrws.isCheckedOutByMe())
+        docVersions, versionErrors = toSaveDocs._lock_plm_versions()
+        for docBrws in toSaveDocs:
+            if docBrws.id in docVersions and docBrws.id in expectedDocVersions \
+                    and docVersions[docBrws.id] != int(expectedDocVersions[docBrws.id]):
+                versionErrors[docBrws.id] = docBrws._get_plm_version_error(docVersions[docBrws.id], expectedDocVersions[docBrws.id])
+        bomVersions, bomErrors = toSaveBoms._lock_plm_versions()
+        if not bomErrors:
+            # a product may have more BoMs, the client gets the sum of their versions
+            for tmplBrws in toSaveBoms.product_tmpl_id:
+                if tmplBrws.id in expectedBomVersions:
+                    tmplBoms = toSaveBoms.filtered(lambda bomBrws: bomBrws.product_tmpl_id == tmplBrws)
+                    bomVersion = sum(bomVersions.get(bomBrws.id, 0) for bomBrws in tmplBoms)
+                    if bomVersion != int(expectedBomVersions[tmplBrws.id]):
+                        bomErrors[tmplBoms[0].id] = tmplBoms[0]._get_plm_version_error(bomVersion, expectedBomVersions[tmplBrws.id])
+        versionErrors = list(versionErrors.values()) + list(bomErrors.values())
+        if versionErrors:
+            raise UserError("\n".join(versionErrors))
+
         # Save the document
         logging.info("Saving Document")
         alreadyEvaluated = []
@@ -1819,8 +1952,7 @@ class IrAttachment(models.Model):
                 documentAttribute['TO_UPDATE'] = False
                 skipCheckOut = documentAttribute.get('SKIP_CHECKOUT', False)
                 docBrws = False
-                for pp_id in self.search([('engineering_code', '=', documentAttribute.get('engineering_code')),
-                                            ('engineering_revision', '=', documentAttribute.get('engineering_revision'))]):
+                for pp_id in getStructureRecord(self, structureDocIds, documentAttribute):
                     if pp_id.id in alreadyEvaluated:
                         docBrws = pp_id  # To skip creation
                         documentAttribute[
@@ -1835,6 +1967,8 @@ class IrAttachment(models.Model):
                 if not docBrws:
                     docBrws = self.create(documentAttribute)
                     alreadyEvaluated.append(docBrws.id)
+                    if documentAttribute.get('engineering_revision') is not None:
+                        structureDocIds[resolver._normalize_key(*structureKey(documentAttribute))] = docBrws.id
                     if not skipCheckOut:
                         docBrws.checkout(hostName, hostPws)
                     documentAttribute['TO_UPDATE'] = True
@@ -1850,16 +1984,13 @@ class IrAttachment(models.Model):
         # Save product - document relation
         logging.info("Saving Product")
         productsEvaluated = []
-        product_product = self.env['product.product']
         for refId, productAttribute in list(productAttributes.items()):
             try:
                 linkedDocuments = set()
                 for refDocId in productDocumentRelations.get(refId, []):
                     linkedDocuments.add((4, documentAttributes[refDocId].get('id', 0)))
                 product_product_id = False
-                for pp_id in product_product.search(
-                        [('engineering_code', '=', productAttribute.get('engineering_code')),
-                         ('engineering_revision', '=', productAttribute.get('engineering_revision'))]):
+                for pp_id in getStructureRecord(product_product, structureProductIds, productAttribute):
                     if pp_id.id in productsEvaluated:
                         product_product_id = pp_id
                         break
@@ -1876,6 +2007,8 @@ class IrAttachment(models.Model):
                         continue
                     product_product_id = product_product.create(productAttribute)
                     productsEvaluated.append(product_product_id.id)
+                    if productAttribute.get('engineering_revision') is not None:
+                        structureProductIds[resolver._normalize_key(*structureKey(productAttribute))] = product_product_id.id
                 if linkedDocuments:
                     product_product_id.write({'linkeddocuments': list(linkedDocuments)})
                 productAttribute['id'] = product_product_id.id
@@ -1959,6 +2092,21 @@ class IrAttachment(models.Model):
             except Exception as ex:
                 logging.error(ex)
                 raise ex
+        # Give back the new versions, the client sends them with the next save
+        self.env['plm.version.mixin']._flush_plm_versions()
+        for documentAttribute in documentAttributes.values():
+            if documentAttribute.get('id'):
+                documentAttribute['plm_version'] = self.browse(documentAttribute['id']).plm_version or 0
+        savedProducts = product_product.browse([productAttribute['id'] for productAttribute in productAttributes.values()
+                                                if productAttribute.get('id')])
+        bomVersions = {}
+        for bomBrws in mrpBomTemplate.search([('product_tmpl_id', 'in', savedProducts.product_tmpl_id.ids)]):
+            bomVersions[bomBrws.product_tmpl_id.id] = bomVersions.get(bomBrws.product_tmpl_id.id, 0) + (bomBrws.plm_version or 0)
+        for productAttribute in productAttributes.values():
+            if productAttribute.get('id'):
+                tmplId = product_product.browse(productAttribute['id']).product_tmpl_id.id
+                if tmplId in bomVersions:
+                    productAttribute['bom_plm_version'] = bomVersions[tmplId]
         jsonify = json.dumps(objStructure)
         end = time.time()
         logging.info("Time Spend For save structure is: %s" % (str(end - start)))
@@ -1988,6 +2136,64 @@ class IrAttachment(models.Model):
                     break
         return plm_checkout_id, msg
 
+    def _get_checkout_users(self):
+        """
+        :return: {document id: (checkout id, user id)} of the checked-out documents
+        """
+        out = {}
+        checkoutMap = self.env['plm.checkout']._get_checkout_map(self.ids)
+        for doc_id in self.ids:
+            if checkoutMap.get(doc_id):
+                out[doc_id] = checkoutMap[doc_id][:2]
+        return out
+
+    def _bulk_check_out(self, hostName, hostPws, root_doc=False):
+        """
+        Check-out the documents at once, one message is posted on the root document
+        :return: (documents checked-out by me, {document id: error message})
+        """
+        errors = {}
+        checkoutUsers = self._get_checkout_users()
+        checkedOutIds = []
+        toCheckOutIds = []
+        for docBrws in self:
+            _checkoutId, userId = checkoutUsers.get(docBrws.id, (False, False))
+            if userId == self.env.uid:
+                checkedOutIds.append(docBrws.id)
+            elif userId:
+                errors[docBrws.id] = _("Unable to check-Out a document that is already checked IN by user %r" % self.getUserSign(userId))
+            elif docBrws.engineering_state not in [START_STATUS, False]:
+                errors[docBrws.id] = _("Unable to check-Out a document that is in state %r" % docBrws.engineering_state)
+            else:
+                toCheckOutIds.append(docBrws.id)
+        toCheckOut = self.browse(toCheckOutIds)
+        if toCheckOut:
+            self.env['plm.checkout'].with_context(plm_checkout_no_message=True).create([{'userid': self.env.uid,
+                                                                                         'hostname': hostName,
+                                                                                         'hostpws': hostPws,
+                                                                                         'documentid': docBrws.id} for docBrws in toCheckOut])
+            toCheckOut._setup_cad_open_multi(hostName, hostPws, operation_type='check-out')
+            (root_doc or toCheckOut[0]).message_post(body=_('Checked-Out %s documents: %s') % (len(toCheckOut),
+                                                                                                toCheckOut._get_codes_summary()))
+        return self.browse(checkedOutIds + toCheckOutIds), errors
+
+    def _bulk_check_in(self, root_doc=False):
+        """
+        Check-in at once the documents checked-out by me, one message is posted on the root document
+        :return: checked-in documents
+        """
+        checkoutIds = [checkoutId for checkoutId, userId in self._get_checkout_users().values() if userId == self.env.uid]
+        checkoutBrwsList = self.env['plm.checkout'].browse(checkoutIds)
+        checkedIn = checkoutBrwsList.mapped('documentid')
+        if checkoutBrwsList:
+            checkoutBrwsList.with_context(plm_checkout_no_message=True).unlink()
+            (root_doc or checkedIn[0]).message_post(body=_('Checked-In %s documents: %s') % (len(checkedIn),
+                                                                                              checkedIn._get_codes_summary()))
+        return checkedIn
+
+    def _get_codes_summary(self):
+        return ', '.join(["%s-%s" % (docBrws.engineering_code, docBrws.engineering_revision) for docBrws in self])
+
     @api.model
     def clientCanCheckOut(self, doc_attrs):
         for attachment_id in self.getDocumentBrws(doc_attrs):
@@ -2028,11 +2234,7 @@ class IrAttachment(models.Model):
         """
         check if the file need to be updated
         """
-        checkoutIds = self.env['plm.checkout'].search([('documentid', '=', self.id),
-                                                       ('userid', '=', self.env.uid)])
-        for _brw in checkoutIds:
-            return True
-        return False
+        return bool(self.isCheckedOutByMe())
 
     
     def getDocumentInfos(self):
@@ -2114,15 +2316,18 @@ class IrAttachment(models.Model):
         if not isinstance(docVals, list):
             docVals=[docVals]
         out = self.env[self._name]
+        resolver = self.env['plm.code.resolver']
+        keys = []
         for doc_dict in docVals:
             docName = doc_dict.get('engineering_code', '')
             docRev = doc_dict.get('engineering_revision', None)
-            if not docName or docRev is None:
+            if not docName or docRev is None or docRev is False:
                 continue
-            for ir_attachment_id in  self.search([('engineering_code', '=', docName),
-                                                  ('engineering_revision', '=', docRev)]):
-                out+=ir_attachment_id
-                break
+            keys.append(resolver._normalize_key(docName, docRev))
+        resolved = resolver.resolve(self._name, keys)
+        for key in keys:
+            if key in resolved:
+                out += self.browse(resolved[key])
         return out
 
     def checkStructureDocument(self, docAttrs):
@@ -2296,6 +2501,10 @@ class IrAttachment(models.Model):
             outDict[file_path] = outLocalDict
         return outDict
 
+    def init(self):
+        super(IrAttachment, self).init()
+        init_plm_trigram_indexes(self.env.cr, self._table)
+
     @api.model
     def _search(self, args, offset=0, limit=None, order=None, count=False, access_rights_uid=None):
         # add res_field=False in domain if not present; the arg[0] trick below
@@ -2303,52 +2512,124 @@ class IrAttachment(models.Model):
         if not any(arg[0] in ('id', 'res_field') for arg in args):
             args.insert(0, ('res_field', '=', False))
 
-        ids = super(models.Model, self)._search(args, offset=offset, limit=limit, order=order,
-                                                count=False, access_rights_uid=access_rights_uid)
-
         if self.env.user and (self.env.user._is_admin() or self.env.user._is_superuser()):
             # rules do not apply for the superuser
-            return len(ids) if count else ids
-
-        if not ids:
-            return 0 if count else []
-
-        # Work with a set, as list.remove() is prohibitive for large lists of documents
-        # (takes 20+ seconds on a db with 100k docs during search_count()!)
-        orig_ids = ids
-        ids = set(ids)
+            return super(models.Model, self)._search(args, offset=offset, limit=limit, order=order,
+                                                     count=count, access_rights_uid=access_rights_uid)
 
         # For attachments, the permissions of the document they are attached to
-        # apply, so we must remove attachments for which the user cannot access
-        # the linked document.
-        # Use pure SQL rather than read() as it is about 50% faster for large dbs (100k+ docs),
-        # and the permissions are checked in super() and below anyway.
-        model_attachments = defaultdict(lambda: defaultdict(set))   # {res_model: {res_id: set(ids)}}
-        self._cr.execute("""SELECT id, res_model, res_id, public FROM ir_attachment WHERE id IN %s""", [tuple(ids)])
-        for row in self._cr.dictfetchall():
-            if not row['res_model'] or row['public']:
+        # apply, so the attachments of documents the user cannot read are removed
+        # by the query itself, offset limit and count stay right.
+        acl_domain = self._get_acl_domain(args, access_rights_uid)
+        return super(models.Model, self)._search(expression.AND([args, acl_domain]), offset=offset, limit=limit, order=order,
+                                                 count=count, access_rights_uid=access_rights_uid)
+
+    @api.model
+    def _get_domain_res_models(self, args):
+        """
+        res_model values every attachment of the domain must have, None if the domain does not restrict them
+        """
+        domain = expression.normalize_domain(args)
+
+        def _required_leaves(index):
+            # leaves of the sub domain starting at index that all its records satisfy, and the index following it
+            token = domain[index]
+            if token in (expression.AND_OPERATOR, expression.OR_OPERATOR):
+                left, index = _required_leaves(index + 1)
+                right, index = _required_leaves(index)
+                return (left + right if token == expression.AND_OPERATOR else []), index
+            if token == expression.NOT_OPERATOR:
+                _leaves, index = _required_leaves(index + 1)
+                return [], index
+            return [token], index + 1
+
+        res_models = None
+        for leaf in _required_leaves(0)[0]:
+            if not expression.is_leaf(leaf) or leaf[0] != 'res_model':
                 continue
-            # model_attachments = {res_model: {res_id: set(ids)}}
-            model_attachments[row['res_model']][row['res_id']].add(row['id'])
+            _field, operator, value = leaf
+            if operator == '=' and isinstance(value, str):
+                values = {value}
+            elif operator == 'in' and isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+                values = set(value)
+            else:
+                continue
+            res_models = values if res_models is None else res_models & values
+        return res_models
 
-        # To avoid multiple queries for each attachment found, checks are
-        # performed in batch as much as possible.
-        for res_model, targets in model_attachments.items():
+    @api.model
+    def _get_attachment_res_models(self, args):
+        """
+        res_model the searched domain can return, taken from the domain when it sets them,
+        otherwise all the res_model of the table read with a skip scan of the res_model index
+        """
+        res_models = self._get_domain_res_models(args)
+        if res_models is not None:
+            return sorted(res_models)
+        self._cr.execute("""
+            WITH RECURSIVE res_models AS (
+                (SELECT res_model FROM ir_attachment WHERE res_model IS NOT NULL ORDER BY res_model LIMIT 1)
+                UNION ALL
+                SELECT (SELECT res_model FROM ir_attachment WHERE res_model > r.res_model ORDER BY res_model LIMIT 1)
+                FROM res_models r
+                WHERE r.res_model IS NOT NULL
+            )
+            SELECT res_model FROM res_models WHERE res_model IS NOT NULL
+        """)
+        return [row[0] for row in self._cr.fetchall()]
+
+    @api.model
+    def _get_acl_domain(self, args, access_rights_uid=None):
+        """
+        Domain keeping the attachments whose linked document can be read, as the standard search does.
+        The record rules of the linked model go in the query as a sub select,
+        models overriding _search are checked on the searched res_ids.
+        """
+        domains = [[('res_model', '=', False)],
+                   [('public', '=', True)]]
+        unknown_models = []
+        free_models = []
+        for res_model in self._get_attachment_res_models(args):
             if res_model not in self.env:
+                # the standard search keeps the attachments of the uninstalled models
+                unknown_models.append(res_model)
                 continue
-            if not self.env[res_model].check_access_rights('read', False):
-                # remove all corresponding attachment ids
-                ids.difference_update(itertools.chain(*targets.values()))
+            model_obj = self.env[res_model].with_context(active_test=False)
+            if model_obj._abstract or not model_obj.check_access_rights('read', False):
                 continue
-            # filter ids according to what access rules permit
-            target_ids = list(targets)
-            allowed = self.env[res_model].with_context(active_test=False).search([('id', 'in', target_ids)])
-            for res_id in set(target_ids).difference(allowed.ids):
-                ids.difference_update(targets[res_id])
-
-        # sort result according to the original sort ordering
-        result = [id for id in orig_ids if id in ids]
-        return len(result) if count else list(result)
+            if res_model == self._name:
+                # the rules of the attachments, without going through this method again
+                allowed = super(models.Model, model_obj)._search([])
+            elif type(model_obj)._search is not models.Model._search:
+                allowed = self._get_allowed_res_ids(res_model, args, access_rights_uid)
+            elif not self.env['ir.rule']._compute_domain(res_model, 'read'):
+                free_models.append(res_model)
+                continue
+            else:
+                allowed = model_obj._search([])
+            domains.append([('res_model', '=', res_model), ('res_id', 'in', allowed)])
+        if unknown_models:
+            domains.append([('res_model', 'in', unknown_models)])
+        if free_models:
+            # orphan attachments without res_id stay hidden as in the standard search
+            domains.append([('res_model', 'in', free_models), ('res_id', '>', 0)])
+        return expression.OR(domains)
+
+    @api.model
+    def _get_allowed_res_ids(self, res_model, args, access_rights_uid=None):
+        """
+        Readable res_ids of res_model among the searched attachments
+        """
+        query = super(models.Model, self)._search(args, access_rights_uid=access_rights_uid)
+        query_str, params = query.subselect()
+        self._cr.execute("""
+            SELECT DISTINCT res_id FROM ir_attachment
+            WHERE res_model = %%s AND res_id IS NOT NULL AND id IN (%s)
+        """ % query_str, [res_model] + list(params))
+        res_ids = [row[0] for row in self._cr.fetchall()]
+        if not res_ids:
+            return []
+        return self.env[res_model].with_context(active_test=False).search([('id', 'in', res_ids)]).ids
 
     
     def open_related_document_revisions(self):
@@ -2459,6 +2740,27 @@ class IrAttachment(models.Model):
                 return plm_cad_open_brws
         return plm_cad_open
 
+    def _setup_cad_open_multi(self, hostname='', pws_path='', operation_type=''):
+        """
+        Same as setupCadOpen for all the documents, the last backups are read at once
+        """
+        plm_cad_open = self.env['plm.cad.open'].sudo()
+        if not (hostname and pws_path and self):
+            return plm_cad_open
+        # the record rules of the backups apply as in getLastBackupDoc
+        query = self.env['plm.backupdoc']._search([('documentid', 'in', self.ids)])
+        query.order = '"plm_backupdoc"."documentid", "plm_backupdoc"."create_date" DESC, "plm_backupdoc"."id" DESC'
+        query_str, params = query.select('DISTINCT ON ("plm_backupdoc"."documentid") "plm_backupdoc"."documentid"',
+                                         '"plm_backupdoc"."id"')
+        self.env.cr.execute(query_str, params)
+        last_bck_ids = dict(self.env.cr.fetchall())
+        return plm_cad_open.create([{'plm_backup_doc_id': last_bck_ids.get(doc_id.id, False),
+                                     'userid': self.env.user.id,
+                                     'document_id': doc_id.id,
+                                     'pws_path': pws_path,
+                                     'hostname': hostname,
+                                     'operation_type': operation_type} for doc_id in self])
+
     @api.model
     def clientCanIUpload(self, clientArgs):
         ir_attachment_id, dbThread = clientArgs
@@ -2519,20 +2821,15 @@ class IrAttachment(models.Model):
         componentAtts, documentAttrs = clientArgs
         product_product_id = False
         plm_document_id = False
+        resolver = self.env['plm.code.resolver']
         engineering_code = componentAtts.get('engineering_code')
         engineering_revision = componentAtts.get('engineering_revision', 0)
-        if engineering_code:
-            for product_product in self.env['product.product'].search([('engineering_code', '=', engineering_code),
-                                                                      ('engineering_revision', '=', engineering_revision)]):
-                product_product_id = product_product
-                break
+        if engineering_code and engineering_revision is not None:
+            product_product_id = resolver.resolve_one('product.product', engineering_code, engineering_revision) or False
         document_name = documentAttrs.get('engineering_code')
         document_revision = documentAttrs.get('engineering_revision', 0)
-        if document_name:
-            for plm_document in self.env['ir.attachment'].search([('engineering_code', '=', document_name),
-                                                                 ('engineering_revision', '=', document_revision)]):
-                plm_document_id = plm_document
-                break
+        if document_name and document_revision is not None:
+            plm_document_id = resolver.resolve_one('ir.attachment', document_name, document_revision) or False
         return product_product_id, plm_document_id
 
 
@@ -2682,15 +2979,18 @@ class IrAttachment(models.Model):
             Evaluate documents to return
         """
         involved_docs_dict = json.loads(involved_docs_dict)
+        toCheckInIds = []
+        rootDoc = False
         for doc_vals in involved_docs_dict.get('to_check_in', []):
             docId = self.getDocId(doc_vals) 
             checked = doc_vals.get('checked', False)
             if not docId:
                 raise UserError(f'Cannot check-in document with id False. Vals {doc_vals}')
             if checked or kargs.get('force', False):
-                checkoutId = self.env['plm.checkout'].search([('documentid', '=', docId.id), ('userid', '=', self.env.user.id)])
-                if checkoutId:
-                    checkoutId.unlink()
+                toCheckInIds.append(docId.id)
+                if doc_vals.get('is_root'):
+                    rootDoc = docId
+        self.browse(toCheckInIds)._bulk_check_in(rootDoc)
         return True
 
     def getLastCadSave(self):
@@ -2716,6 +3016,7 @@ class IrAttachment(models.Model):
         tmp_dict['PLM_DT_DELTA'] = PLM_DT_DELTA
         tmp_dict['is_root'] = is_root
         tmp_dict['must_update_from_cad'] = docBrws.must_update_from_cad
+        tmp_dict['plm_version'] = docBrws.plm_version or 0
         tmp_dict['msg'] = ''
         return tmp_dict
         
@@ -2786,6 +3087,7 @@ class IrAttachment(models.Model):
         for doc_3d_id in doc_3d_ids:
             doc_2d_ids+= self.browse(list(set(self.getRelatedLyTree(doc_3d_id.id))))
         done = []
+        (doc_3d_ids + doc_2d_ids)._load_checkout_map()
         for s_doc_id in doc_3d_ids+doc_2d_ids:
             if s_doc_id.id in done:
                 continue
@@ -3059,35 +3361,40 @@ class IrAttachment(models.Model):
     def CheckOutRecursive(self, structure, pws_path='', hostname='', force=False):
         stop = False
         structure = json.loads(structure)
-        for doc_fields in structure:
-            doc_name = doc_fields.get('engineering_code', '')
-            doc_rev = doc_fields.get('engineering_revision', 0)
-            document_ids = self.search([
-                ('engineering_code', '=', doc_name),
-                ('engineering_revision', '=', doc_rev)
-                ])
-            for doc_id in document_ids:
-                checkout = doc_fields.get('checkout', False)
-                doc_fields['checkout'] = False
-                isCheckoutByMe, _checkoutUser = doc_id.checkoutByMeWithUser()
-                newer = doc_fields.get('newer', False)
-                if newer and force:
-                    checkout = True
-                if not checkout:
-                    stop = True
-                if checkout:
-                    if isCheckoutByMe:
-                        doc_fields['checkout'] = True
-                        continue
-                    if not stop:
-                        checkout_id, msg = doc_id.checkout(hostname, pws_path, showError=False)
-                        if not checkout_id or msg:
-                            doc_fields['err_msg'] += '\n%s' % (msg)
-                        else:
-                            doc_id.setupCadOpen(hostname, pws_path, operation_type='check-out')
-                            doc_fields['checkout'] = True
-                    else:
-                        doc_fields['err_msg'] += '\nCannot checkout document %s.' % (doc_fields['name'])
+        resolver = self.env['plm.code.resolver']
+        keys = [resolver._normalize_key(doc_fields.get('engineering_code', ''),
+                                        doc_fields.get('engineering_revision', 0)) for doc_fields in structure]
+        resolved = resolver.resolve(self._name, keys)
+        checkoutUsers = self.browse(list(set(resolved.values())))._get_checkout_users()
+        toCheckOut = {}
+        for doc_fields, key in zip(structure, keys):
+            doc_id = resolved.get(key)
+            if not doc_id:
+                continue
+            checkout = doc_fields.get('checkout', False)
+            doc_fields['checkout'] = False
+            isCheckoutByMe = checkoutUsers.get(doc_id, (False, False))[1] == self.env.uid
+            newer = doc_fields.get('newer', False)
+            if newer and force:
+                checkout = True
+            if not checkout:
+                stop = True
+            if checkout:
+                if isCheckoutByMe:
+                    doc_fields['checkout'] = True
+                    continue
+                if not stop:
+                    toCheckOut.setdefault(doc_id, []).append(doc_fields)
+                else:
+                    doc_fields['err_msg'] += '\nCannot checkout document %s.' % (doc_fields['name'])
+        rootDoc = self.browse(resolved[keys[0]]) if keys and keys[0] in resolved else False
+        _checkedOut, errors = self.browse(list(toCheckOut))._bulk_check_out(hostname, pws_path, rootDoc)
+        for doc_id, doc_fields_list in toCheckOut.items():
+            for doc_fields in doc_fields_list:
+                if doc_id in errors:
+                    doc_fields['err_msg'] += '\n%s' % (errors[doc_id])
+                else:
+                    doc_fields['checkout'] = True
         return json.dumps(structure)
 
     @api.model
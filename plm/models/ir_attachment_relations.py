@@ -23,6 +23,7 @@ from odoo import _
 from odoo import api
 from odoo import models
 from odoo import fields
+from odoo.addons.plm.models.utils import init_plm_indexes
 
 
 class PlmDocumentRelations(models.Model):
@@ -88,6 +89,10 @@ class PlmDocumentRelations(models.Model):
         ('parent_child_check', 'CHECK (parent_id <> child_id)', _('Parent child product must be different !'))
     ]
 
+    def init(self):
+        super(PlmDocumentRelations, self).init()
+        init_plm_indexes(self.env.cr, self._table)
+
     def copy(self, default=None):
         if not default:
             default = {}
@@ -28,15 +28,42 @@ import copy
 import sys
 import logging
 from odoo import _
+from odoo import _lt
 from odoo import api
 from odoo import models
 from odoo import fields
 from odoo.osv.expression import AND
+from odoo.tools import float_is_zero
+from odoo.addons.plm.models.utils import init_plm_indexes
+
+WEIGHT_PROPAGATION_KEY = 'plm.bom.weight.propagation'
+BOM_EXPORT_COLUMNS = [('level', _lt('Level')),
+                      ('itemnum', _lt('Item')),
+                      ('engineering_code', _lt('Engineering Code')),
+                      ('engineering_revision', _lt('Revision')),
+                      ('default_code', _lt('Internal Reference')),
+                      ('description', _lt('Description')),
+                      ('product_qty', _lt('Quantity')),
+                      ('total_qty', _lt('Total Quantity')),
+                      ('uom', _lt('Unit of Measure')),
+                      ('weight', _lt('Weight'))]
 
 
 class MrpBomExtension(models.Model):
     _name='mrp.bom'
-    _inherit = 'mrp.bom'
+    _inherit = ['mrp.bom', 'plm.version.mixin']
+
+    def init(self):
+        super(MrpBomExtension, self).init()
+        init_plm_indexes(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS plm_bom_weight_queue (
+                id SERIAL PRIMARY KEY,
+                bom_id INTEGER,
+                product_id INTEGER,
+                delta DOUBLE PRECISION NOT NULL DEFAULT 0
+            )
+        """)
 
     def _father_compute(self, name='', arg={}):
         """ Gets father bom.
@@ -49,23 +76,18 @@ class MrpBomExtension(models.Model):
         @param context: A standard dictionary for contextual values
         @return:  Dictionary of values
         """
-        bom_type = ''
+        # a single line search for the whole recordset, lines are then dispatched by (product, type)
         bom_line_obj_type = self.env['mrp.bom.line']
+        bom_children_lines = bom_line_obj_type.search([('product_id', 'in', self.product_id.ids)])
+        father_ids = {}
+        for bom_line_brws in bom_children_lines:
+            if bom_line_brws.bom_id.id:
+                key = (bom_line_brws.product_id.id, bom_line_brws.bom_id.type)
+                father_ids.setdefault(key, set()).add(bom_line_brws.bom_id.id)
+                father_ids.setdefault((bom_line_brws.product_id.id, ''), set()).add(bom_line_brws.bom_id.id)
         for bom_obj in self:
-            result = []
-            bom_type = bom_obj.type
-            if bom_type == '':
-                bom_children_lines = bom_line_obj_type.search([('product_id', '=', bom_obj.product_id.id)])
-            else:
-                bom_children_lines = bom_line_obj_type.search([
-                    ('product_id', '=', bom_obj.product_id.id),
-                    ('type', '=', bom_type)
-                ])
-            for bom_line_brws in bom_children_lines:
-                if bom_line_brws.bom_id.id:
-                    if not (bom_line_brws.bom_id.id in result):
-                        result.extend([bom_line_brws.bom_id.id])
-            bom_obj.father_complete_ids = self.env['mrp.bom'].browse(list(set(result)))
+            result = father_ids.get((bom_obj.product_id.id, bom_obj.type or ''), set())
+            bom_obj.father_complete_ids = self.env['mrp.bom'].browse(list(result))
     
     engineering_state = fields.Selection(related="product_id.engineering_state",
                                          string=_("Status"),
@@ -292,7 +314,7 @@ class MrpBomExtension(models.Model):
         """
         obj_id, _source_id, last_rev = values
         # get all ids of the children product in structured way like [[id,child_ids]]
-        rel_datas = [obj_id, self._explode_bom(self._get_bom(obj_id), False, last_rev)]
+        rel_datas = [obj_id, self._explode_bom_cached(self._get_bom(obj_id), False, last_rev)]
         prt_datas = self._get_pack_datas(rel_datas)
         return rel_datas, prt_datas, self._get_pack_rel_datas(rel_datas, prt_datas)
 
@@ -319,14 +341,28 @@ class MrpBomExtension(models.Model):
                 output.append([prod_id, inner_ids])
         return output
 
-    
+    @api.model
+    def _explode_bom_cached(self, bids, check=True, last_rev=False):
+        """
+            Same as _explode_bom but the result is taken from the explosion cache when available
+        """
+        explode_mode = 'explode_sum' if check else 'explode_all'
+        return self.env['plm.bom.explode.cache'].get_explosion(bids,
+                                                               explode_mode,
+                                                               last_rev,
+                                                               lambda: self._explode_bom(bids, check, last_rev))
+
+    def _mark_structure_changed(self):
+        self.env['plm.bom.explode.cache'].mark_structure_changed(self.product_tmpl_id.ids)
+
     def get_last_comp_id(self, comp_id):
         prod_prod_obj = self.env['product.product']
         comp_brws = prod_prod_obj.browse(comp_id)
         if comp_brws:
             prod_brws_list = prod_prod_obj.search(
-                [('engineering_code', '=', comp_brws.engineering_code)],
-                order='engineering_revision DESC'
+                [('engineering_code', '=', comp_brws.engineering_code),
+                 ('engineering_is_latest', '=', True)],
+                limit=1
             )
             for prod_brws in prod_brws_list:
                 return prod_brws
@@ -352,7 +388,7 @@ class MrpBomExtension(models.Model):
         comp_id, _source_id, latest_flag = values
         prod_tmpl_id = self.get_tmplt_id_from_product_id(comp_id)
         bom_id = self._get_bom(prod_tmpl_id)
-        explosed_bom_ids = self._explode_bom(bom_id, True, latest_flag)
+        explosed_bom_ids = self._explode_bom_cached(bom_id, True, latest_flag)
         rel_datas = [comp_id, explosed_bom_ids]
         prt_datas = self._get_pack_datas(rel_datas)
         return rel_datas, prt_datas, self._get_pack_rel_datas(rel_datas, prt_datas)
@@ -528,7 +564,7 @@ class MrpBomExtension(models.Model):
                 if (parentID, childID) not in alreadyCreated:
                     to_compute(childName, next_relation, kindBom)
                     alreadyCreated.append((parentID, childID))
-            self.rebase_product_weight(bom_id, self.browse(bom_id).rebase_bom_weight())
+            self.push_weight_change(bom_ids=[bom_id])
 
         def repair_qty(value):
             """
@@ -620,6 +656,7 @@ class MrpBomExtension(models.Model):
             return False
         bom_id = to_compute(parent_name, relations, kind_bom)
         clean_empty_boms()
+        self.flush_weight_propagation()
         return bom_id
 
     def _sum_bom_weight(self, bom_obj):
@@ -650,15 +687,352 @@ class MrpBomExtension(models.Model):
             super().write({'weight_net': weight})
         return weight
 
+    @api.model
+    def push_weight_change(self, bom_ids=(), product_deltas=None):
+        """
+            Queue a weight change to be propagated to the ancestors by the weight propagation scheduler,
+            the changes of the transaction are added to the queue table when it commits
+            so a save never writes the weight of the shared ancestor BoMs
+            :bom_ids boms with lines created / modified / removed
+            :product_deltas {product_id: weight delta} for weights changed directly on the product
+        """
+        cr = self.env.cr
+        queue = cr.precommit.data.get(WEIGHT_PROPAGATION_KEY)
+        if queue is None:
+            queue = cr.precommit.data[WEIGHT_PROPAGATION_KEY] = {'bom_ids': set(),
+                                                                 'product_deltas': {}}
+            cr.precommit.add(self._queue_weight_propagation)
+        queue['bom_ids'].update([bom_id for bom_id in bom_ids if bom_id])
+        for product_id, delta in (product_deltas or {}).items():
+            queue['product_deltas'][product_id] = queue['product_deltas'].get(product_id, 0.0) + delta
+
+    @api.model
+    def _queue_weight_propagation(self):
+        """
+            Insert the weight changes of the transaction in the queue table, inserts never wait on other saves
+        """
+        queue = self.env.cr.precommit.data.pop(WEIGHT_PROPAGATION_KEY, None)
+        if not queue or not (queue['bom_ids'] or queue['product_deltas']):
+            return
+        rows = [(bom_id, None, 0.0) for bom_id in sorted(queue['bom_ids'])]
+        rows += [(None, product_id, delta) for product_id, delta in sorted(queue['product_deltas'].items())]
+        self.env.cr.execute("INSERT INTO plm_bom_weight_queue (bom_id, product_id, delta) VALUES %s"
+                            % ", ".join(["(%s, %s, %s)"] * len(rows)),
+                            [value for row in rows for value in row])
+        cron = self.env.ref('plm.ir_cron_scheduler_weight_propagation', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def flush_weight_propagation(self):
+        """
+            Propagate all the queued weight changes
+            The whole queue is taken at once, a BoM summed again from its lines must see
+            the product deltas committed before it, or they would be added twice
+        """
+        self._queue_weight_propagation()
+        self.env.cr.execute("DELETE FROM plm_bom_weight_queue RETURNING bom_id, product_id, delta")
+        bom_ids = set()
+        product_deltas = {}
+        for bom_id, product_id, delta in self.env.cr.fetchall():
+            if bom_id:
+                bom_ids.add(bom_id)
+            if product_id:
+                product_deltas[product_id] = product_deltas.get(product_id, 0.0) + delta
+        if not (bom_ids or product_deltas):
+            return
+        self._propagate_weight(bom_ids, product_deltas)
+        self.env.flush_all()
+
+    @api.model
+    def run_weight_propagation_scheduler(self):
+        """
+            Write the derived BoM and product weights of the committed saves
+        """
+        logging.info('Start BoM weight propagation Scheduler')
+        self.flush_weight_propagation()
+        logging.info('End BoM weight propagation Scheduler')
+
+    @api.model
+    def _get_weight_owner_boms(self, product_ids):
+        """
+            The product weight is taken from its latest BoM (same as rebase_product_weight on the last saved BoM)
+            :return: {product_id: bom_id}
+        """
+        out = {}
+        if product_ids:
+            for group in self.read_group([('product_id', 'in', list(product_ids))],
+                                         ['bom_id:max(id)'],
+                                         ['product_id']):
+                out[group['product_id'][0]] = group['bom_id']
+        return out
+
+    @api.model
+    def _propagate_weight(self, dirty_bom_ids, product_deltas):
+        """
+            Push the weight changes only up the affected ancestor chain
+            :dirty_bom_ids boms whose lines are changed, their weight is summed again from the lines
+            :product_deltas {product_id: delta} of weights already written on the products
+            The ancestors reached through the where used relation get only the delta (line qty * child delta),
+            every BoM and product is written once at the end
+        """
+        bom_line_obj = self.env['mrp.bom.line']
+        product_obj = self.env['product.product']
+        dirty_bom_ids = set(self.browse(list(dirty_bom_ids)).exists().ids)
+        affected_boms = {}          # bom_id -> product_id
+        owner_bom = {}              # product_id -> bom_id that gives the weight to the product
+        bom_lines = {}              # bom_id -> [(product_id, qty)] lines using an affected product
+        #
+        def collect_boms(bom_ids):
+            new_products = set()
+            for bom_data in self.search_read([('id', 'in', list(bom_ids))], ['product_id']):
+                product_id = bom_data['product_id'] and bom_data['product_id'][0]
+                affected_boms[bom_data['id']] = product_id
+                if product_id:
+                    new_products.add(product_id)
+            owner_bom.update(self._get_weight_owner_boms(new_products - set(owner_bom)))
+            return new_products
+        #
+        frontier = collect_boms(dirty_bom_ids) | set(product_deltas)
+        visited_products = set()
+        while frontier:
+            visited_products |= frontier
+            parent_bom_ids = set()
+            for line_data in bom_line_obj.search_read([('product_id', 'in', list(frontier))],
+                                                      ['bom_id', 'product_id', 'product_qty']):
+                bom_id = line_data['bom_id'][0]
+                bom_lines.setdefault(bom_id, []).append((line_data['product_id'][0], line_data['product_qty']))
+                if bom_id not in affected_boms:
+                    parent_bom_ids.add(bom_id)
+            frontier = collect_boms(parent_bom_ids) - visited_products
+        #
+        # topological order, a BoM is computed when all its affected children are done
+        #
+        children_count = dict.fromkeys(affected_boms, 0)
+        parents_of = {}
+        for bom_id in affected_boms:
+            for product_id, _qty in bom_lines.get(bom_id, []):
+                child_bom_id = owner_bom.get(product_id)
+                if child_bom_id in affected_boms and child_bom_id != bom_id:
+                    children_count[bom_id] += 1
+                    parents_of.setdefault(child_bom_id, []).append(bom_id)
+        #
+        old_bom_weight = {bom_brws.id: bom_brws.weight_net for bom_brws in self.browse(list(affected_boms))}
+        product_weight = {product_brws.id: product_brws.weight
+                          for product_brws in product_obj.browse(list(visited_products | set(owner_bom)))}
+        product_delta = dict(product_deltas)
+        new_bom_weight = {}
+        new_product_weight = {}
+        ready = [bom_id for bom_id, count in children_count.items() if count == 0]
+        while ready:
+            bom_id = ready.pop()
+            if bom_id in dirty_bom_ids:
+                weight = 0.0
+                for bom_line in self.browse(bom_id).bom_line_ids:
+                    line_product_id = bom_line.product_id.id
+                    weight += bom_line.product_qty * product_weight.get(line_product_id, bom_line.product_id.weight)
+            else:
+                weight = old_bom_weight[bom_id]
+                for product_id, qty in bom_lines.get(bom_id, []):
+                    weight += qty * product_delta.get(product_id, 0.0)
+            new_bom_weight[bom_id] = weight
+            product_id = affected_boms[bom_id]
+            if product_id and owner_bom.get(product_id) == bom_id:
+                delta = weight - product_weight[product_id]
+                if not float_is_zero(delta, precision_digits=6):
+                    product_delta[product_id] = product_delta.get(product_id, 0.0) + delta
+                    product_weight[product_id] = weight
+                    new_product_weight[product_id] = weight
+            for parent_bom_id in parents_of.get(bom_id, []):
+                children_count[parent_bom_id] -= 1
+                if children_count[parent_bom_id] == 0:
+                    ready.append(parent_bom_id)
+        if len(new_bom_weight) < len(affected_boms):
+            logging.warning('[_propagate_weight] Recursive BoM found, weight not propagated to BoMs %r' % (
+                sorted(set(affected_boms) - set(new_bom_weight))))
+        #
+        for bom_id, weight in new_bom_weight.items():
+            if not float_is_zero(weight - old_bom_weight[bom_id], precision_digits=6):
+                super(MrpBomExtension, self.browse(bom_id)).write({'weight_net': weight})
+        for product_id, weight in new_product_weight.items():
+            product_obj.browse(product_id).with_context(plm_weight_propagation=True).write({'weight': weight})
+
+    @api.model
+    def rebuild_bom_weight(self, check_only=True):
+        """
+            Full rebuild of the BoM weights from the weights of the products without BoM, bottom up.
+            A product weighs as its latest BoM, the same rule of _propagate_weight, so use it to verify
+            the incremental propagation or to repair the weights written before it
+            :check_only True only report the differences, False also write the right values
+            :return: [(model, id, stored_weight, expected_weight)]
+        """
+        boms = {}
+        for bom_data in self.search_read([], ['product_id', 'weight_net']):
+            boms[bom_data['id']] = bom_data
+        lines = {}
+        for line_data in self.env['mrp.bom.line'].search_read([('bom_id', 'in', list(boms))],
+                                                              ['bom_id', 'product_id', 'product_qty']):
+            lines.setdefault(line_data['bom_id'][0], []).append((line_data['product_id'][0], line_data['product_qty']))
+        owner_bom = {}
+        for bom_id, bom_data in boms.items():
+            product_id = bom_data['product_id'] and bom_data['product_id'][0]
+            if product_id:
+                owner_bom[product_id] = max(bom_id, owner_bom.get(product_id, 0))
+        product_ids = set(owner_bom)
+        for bom_lines in lines.values():
+            product_ids.update([product_id for product_id, _qty in bom_lines])
+        product_weight = {product_data['id']: product_data['weight']
+                          for product_data in self.env['product.product'].search_read([('id', 'in', list(product_ids))],
+                                                                                       ['weight'])}
+        expected_bom = {}
+        expected_product = {}
+        in_progress = set()
+
+        def compute_bom(bom_id):
+            if bom_id in expected_bom:
+                return expected_bom[bom_id]
+            if bom_id in in_progress:
+                logging.warning('[rebuild_bom_weight] Recursive BoM found %r' % bom_id)
+                return boms[bom_id]['weight_net']
+            in_progress.add(bom_id)
+            weight = 0.0
+            for product_id, qty in lines.get(bom_id, []):
+                weight += qty * compute_product(product_id)
+            in_progress.discard(bom_id)
+            expected_bom[bom_id] = weight
+            return weight
+
+        def compute_product(product_id):
+            if product_id not in expected_product:
+                if product_id in owner_bom:
+                    expected_product[product_id] = compute_bom(owner_bom[product_id])
+                else:
+                    expected_product[product_id] = product_weight.get(product_id, 0.0)
+            return expected_product[product_id]
+
+        out = []
+        for bom_id in boms:
+            weight = compute_bom(bom_id)
+            if not float_is_zero(weight - boms[bom_id]['weight_net'], precision_digits=6):
+                out.append(('mrp.bom', bom_id, boms[bom_id]['weight_net'], weight))
+                if not check_only:
+                    super(MrpBomExtension, self.browse(bom_id)).write({'weight_net': weight})
+        for product_id in owner_bom:
+            weight = compute_product(product_id)
+            if not float_is_zero(weight - product_weight.get(product_id, 0.0), precision_digits=6):
+                out.append(('product.product', product_id, product_weight.get(product_id, 0.0), weight))
+                if not check_only:
+                    self.env['product.product'].browse(product_id).with_context(plm_weight_propagation=True).write({'weight': weight})
+        if out:
+            logging.warning('[rebuild_bom_weight] %s weights differ from the full rebuild' % len(out))
+        return out
+
+    def _get_export_child_boms(self, product_tmpl_ids, bom_type, child_boms):
+        """
+        fill child_boms {product_tmpl_id: bom_id} for the templates not yet evaluated
+        """
+        to_search = [tmpl_id for tmpl_id in set(product_tmpl_ids) if tmpl_id not in child_boms]
+        if to_search:
+            for bom_data in self.search_read([('product_tmpl_id', 'in', to_search),
+                                              ('type', '=', bom_type)],
+                                             ['product_tmpl_id'],
+                                             order='sequence, id'):
+                child_boms.setdefault(bom_data['product_tmpl_id'][0], bom_data['id'])
+            for tmpl_id in to_search:
+                child_boms.setdefault(tmpl_id, False)
+        return child_boms
+
+    def iter_export_rows(self, summarize=False, cache_rows=1000):
+        """
+        Generator over the exploded structure rows, the bom is walked depth first reading one bom at a time
+        :summarize sum the total quantity of each component, rows are produced at the end of the walk
+        :cache_rows rows after which the orm cache is dropped so the memory stays flat
+        """
+        self.ensure_one()
+        bom_line_obj = self.env['mrp.bom.line']
+        bom_type = self.type
+        child_boms = {}
+        summarized = {}
+        row_count = 0
+        stack = [(iter(bom_line_obj.search([('bom_id', '=', self.id)])), 1, 1.0, {self.id})]
+        while stack:
+            lines, level, parent_qty, ancestors = stack[-1]
+            bom_line_brws = next(lines, None)
+            if bom_line_brws is None:
+                stack.pop()
+                continue
+            product_brws = bom_line_brws.product_id
+            total_qty = bom_line_brws.product_qty * parent_qty
+            if summarize:
+                row = summarized.get(product_brws.id)
+                if row:
+                    row['total_qty'] += total_qty
+                else:
+                    summarized[product_brws.id] = {'level': '',
+                                                   'itemnum': '',
+                                                   'engineering_code': product_brws.engineering_code or '',
+                                                   'engineering_revision': product_brws.engineering_revision,
+                                                   'default_code': product_brws.default_code or '',
+                                                   'description': product_brws.name or '',
+                                                   'product_qty': '',
+                                                   'total_qty': total_qty,
+                                                   'uom': bom_line_brws.product_uom_id.name or '',
+                                                   'weight': product_brws.weight}
+            else:
+                yield {'level': level,
+                       'itemnum': bom_line_brws.itemnum,
+                       'engineering_code': product_brws.engineering_code or '',
+                       'engineering_revision': product_brws.engineering_revision,
+                       'default_code': product_brws.default_code or '',
+                       'description': product_brws.name or '',
+                       'product_qty': bom_line_brws.product_qty,
+                       'total_qty': total_qty,
+                       'uom': bom_line_brws.product_uom_id.name or '',
+                       'weight': product_brws.weight}
+            tmpl_id = product_brws.product_tmpl_id.id
+            if tmpl_id not in child_boms:
+                siblings = bom_line_obj.browse(bom_line_brws._prefetch_ids)
+                self._get_export_child_boms(siblings.mapped('product_id.product_tmpl_id').ids, bom_type, child_boms)
+            child_bom_id = child_boms.get(tmpl_id)
+            if child_bom_id and child_bom_id not in ancestors:
+                stack.append((iter(bom_line_obj.search([('bom_id', '=', child_bom_id)])),
+                              level + 1,
+                              total_qty,
+                              ancestors | {child_bom_id}))
+            row_count += 1
+            if row_count % cache_rows == 0:
+                self.env.invalidate_all()
+        for row in summarized.values():
+            yield row
+
+    def action_export_structure_csv(self):
+        return self._action_export_structure('csv')
+
+    def action_export_structure_xlsx(self):
+        return self._action_export_structure('xlsx')
+
+    def _action_export_structure(self, file_format):
+        self.ensure_one()
+        return {'type': 'ir.actions.act_url',
+                'url': '/plm/bom_export/%s?file_format=%s&summarize=%s' % (self.id,
+                                                                          file_format,
+                                                                          int(bool(self.env.context.get('summarize')))),
+                'target': 'self'}
+
     def read(self, fields=[], load='_classic_read'):
         fields = self.plm_sanitize(fields)
         return super(MrpBomExtension, self).read(fields=fields, load=load)
     
     def write(self, vals):
         vals = self.plm_sanitize(vals)
+        if 'product_tmpl_id' in vals:
+            # the old template loses the structure
+            self._mark_structure_changed()
         ret = super(MrpBomExtension, self).write(vals)
-        for bom_brws in self:
-            bom_brws.rebase_bom_weight()
+        self._bump_plm_version()
+        self._mark_structure_changed()
+        if 'product_id' in vals or 'bom_line_ids' in vals:
+            self.push_weight_change(bom_ids=self.ids)
         return ret
 
     @api.model_create_multi
@@ -667,9 +1041,17 @@ class MrpBomExtension(models.Model):
         for vals_dict in vals:
             to_create.append(self.plm_sanitize(vals_dict))
         ret = super().create(to_create)
-        ret.rebase_bom_weight()
+        ret._mark_structure_changed()
+        ret.push_weight_change(bom_ids=ret.ids)
         return ret
 
+    def unlink(self):
+        self._mark_structure_changed()
+        return super(MrpBomExtension, self).unlink()
+
+    def _get_plm_version_label(self):
+        return _("BoM of %s") % self.product_tmpl_id.display_name
+
     
     def copy(self, default={}):
         """
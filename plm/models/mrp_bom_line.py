@@ -30,6 +30,7 @@ from odoo import models
 from odoo import fields
 from odoo import api
 from odoo import _
+from odoo.addons.plm.models.utils import init_plm_indexes
 import logging
 
 
@@ -37,6 +38,9 @@ class MrpBomLineExtension(models.Model):
     _inherit = 'mrp.bom.line'
     _order = "itemnum"
 
+    def init(self):
+        super(MrpBomLineExtension, self).init()
+        init_plm_indexes(self.env.cr, self._table)
 
     def read(self, fields=[], load='_classic_read'):
         fields = self.plm_sanitize(fields)
@@ -48,33 +52,58 @@ class MrpBomLineExtension(models.Model):
         for vals_dict in vals:
             vals = self.plm_sanitize(vals_dict)
             to_create.append(vals)
-        return super().create(to_create)
+        ret = super().create(to_create)
+        ret.bom_id._bump_plm_version()
+        ret.bom_id._mark_structure_changed()
+        self.env['mrp.bom'].push_weight_change(bom_ids=ret.bom_id.ids)
+        return ret
 
     def write(self, vals):
         vals = self.plm_sanitize(vals)
+        changed_bom_ids = []
+        if {'product_qty', 'product_id', 'bom_id'}.intersection(vals):
+            changed_bom_ids = self.bom_id.ids
         ret = super(MrpBomLineExtension, self).write(vals)
-        for line in self:
-            line.bom_id.rebase_bom_weight()
+        (self.bom_id | self.env['mrp.bom'].browse(changed_bom_ids))._bump_plm_version()
+        (self.bom_id | self.env['mrp.bom'].browse(changed_bom_ids))._mark_structure_changed()
+        if changed_bom_ids:
+            self.env['mrp.bom'].push_weight_change(bom_ids=changed_bom_ids + self.bom_id.ids)
         return ret
 
+    def unlink(self):
+        self.bom_id._mark_structure_changed()
+        self.env['mrp.bom'].push_weight_change(bom_ids=self.bom_id.ids)
+        self.bom_id._bump_plm_version()
+        return super(MrpBomLineExtension, self).unlink()
+
+    def _get_boms_by_template_type(self):
+        """
+            Get all the active BOMs of the line products with a single query
+            :return: {(product_tmpl_id, bom_type): [bom_id, ...]}
+        """
+        out = {}
+        tmpl_ids = self.product_id.product_tmpl_id.ids
+        if tmpl_ids:
+            for bom_data in self.env['mrp.bom'].search_read([('product_tmpl_id', 'in', tmpl_ids),
+                                                             ('active', '=', True)],
+                                                            ['product_tmpl_id', 'type']):
+                key = (bom_data['product_tmpl_id'][0], bom_data['type'])
+                out.setdefault(key, []).append(bom_data['id'])
+        return out
+
     def _get_child_bom_lines(self):
         """
             If the BOM line refers to a BOM, return the ids of the child BOM lines
         """
-        bom_obj = self.env['mrp.bom']
+        boms_by_key = self._get_boms_by_template_type()
+        child_boms = self.env['mrp.bom'].browse([bom_ids[0] for bom_ids in boms_by_key.values()])
+        child_boms.mapped('bom_line_ids')
         for bom_line in self:
-            for bom_id in self.search(
-                    [('product_id', '=', bom_line.product_id.id),
-                     ('product_tmpl_id', '=', bom_line.product_id.product_tmpl_id.id),
-                     ('type', '=', bom_line.type)]
-            ):
-                child_bom = bom_obj.browse(bom_id)
-                for child_bom_line in child_bom.bom_line_ids:
-                    child_bom_line._get_child_bom_lines()
-                self.child_line_ids = [x.id for x in child_bom.bom_line_ids]
-                return
+            bom_ids = boms_by_key.get((bom_line.product_id.product_tmpl_id.id, bom_line.type), [])
+            if bom_ids:
+                bom_line.child_line_ids = child_boms.browse(bom_ids[0]).bom_line_ids
             else:
-                self.child_line_ids = False
+                bom_line.child_line_ids = False
 
     
     def get_related_boms(self):
@@ -92,35 +121,30 @@ class MrpBomLineExtension(models.Model):
 
     @api.depends('product_id')
     def _has_children_boms(self):
+        boms_by_key = self._get_boms_by_template_type()
         for bom_line in self:
             if not bom_line.product_id:
                 bom_line.hasChildBoms = False
             else:
-                num_boms = self.env['mrp.bom'].search_count([
-                    ('product_tmpl_id', '=', bom_line.product_id.product_tmpl_id.id),
-                    ('type', 'in', [bom_line.bom_id.type,'subcontract', 'phantom']),
-                    ('active', '=', True)
-                ])
-                if num_boms:
-                    bom_line.hasChildBoms = True
-                else:
-                    bom_line.hasChildBoms = False
+                tmpl_id = bom_line.product_id.product_tmpl_id.id
+                bom_line.hasChildBoms = any((tmpl_id, bom_type) in boms_by_key
+                                            for bom_type in [bom_line.bom_id.type, 'subcontract', 'phantom'])
 
     @api.depends('product_id')
     def _related_boms(self):
+        boms_by_key = self._get_boms_by_template_type()
         for bom_line in self:
             if not bom_line.product_id:
                 bom_line.related_bom_ids = [(5, False, False)]
             else:
-                bom_objs = self.env['mrp.bom'].search([
-                    ('product_tmpl_id', '=', bom_line.product_id.product_tmpl_id.id),
-                    ('type', 'in', [bom_line.type,'subcontract', 'phantom']),
-                    ('active', '=', True)
-                ])
-                if not bom_objs:
+                tmpl_id = bom_line.product_id.product_tmpl_id.id
+                bom_ids = []
+                for bom_type in {bom_line.type, 'subcontract', 'phantom'}:
+                    bom_ids.extend(boms_by_key.get((tmpl_id, bom_type), []))
+                if not bom_ids:
                     bom_line.related_bom_ids = [(5, False, False)]
                 else:
-                    bom_line.related_bom_ids = [(6, False, bom_objs.ids)]
+                    bom_line.related_bom_ids = [(6, False, bom_ids)]
 
     
     def openRelatedBoms(self):
@@ -172,6 +196,7 @@ class MrpBomLineExtension(models.Model):
 
     
     def _related_doc_ids(self):
+        self.product_id.mapped('linkeddocuments')
         for bom_line_brws in self:
             bom_line_brws.related_document_ids = bom_line_brws.product_id.linkeddocuments
 
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+
+Persistent cache of the BoM explosions.
+Every entry is keyed by (bom, bom type, latest flag, explode mode, security key)
+and stores the product templates of the exploded structure with their structure version.
+Each template has its own version, bumped by the first write that changes its BoM
+in a transaction, so an entry is valid while the versions of its own templates are unchanged.
+The bump locks the version row up to the commit, so the versions of a template
+are committed in order and a reader never caches a structure older than the version it reads.
+'''
+import json
+import hashlib
+import logging
+from odoo import models
+from odoo import fields
+from odoo import api
+from odoo import tools
+from odoo import _
+
+_logger = logging.getLogger(__name__)
+
+STRUCTURE_DIRTY_KEY = 'plm.bom.structure.dirty'
+CACHE_STATS_KEY = 'plm.bom.explode.cache.stats'
+SECURED_MODELS = ('mrp.bom', 'mrp.bom.line', 'product.product', 'product.template')
+
+VALID_ENTRY_FILTER = """
+    NOT EXISTS (SELECT 1
+                FROM unnest(c.dep_tmpl_ids, c.dep_versions) AS d(product_tmpl_id, version)
+                LEFT JOIN plm_bom_structure_version v ON v.product_tmpl_id = d.product_tmpl_id
+                WHERE coalesce(v.version, 0) != d.version)
+"""
+
+
+class PlmBomExplodeCache(models.Model):
+    _name = "plm.bom.explode.cache"
+    _description = "BoM Explosion Cache"
+    _order = 'id DESC'
+
+    bom_id = fields.Many2one('mrp.bom',
+                             string=_('BoM'),
+                             ondelete='cascade',
+                             readonly=True,
+                             index=True)
+    bom_type = fields.Char(_('BoM Type'),
+                           readonly=True)
+    latest_flag = fields.Boolean(_('Latest Revision'),
+                                 readonly=True)
+    explode_mode = fields.Char(_('Explode Mode'),
+                               readonly=True)
+    security_key = fields.Char(_('Security Key'),
+                               readonly=True,
+                               help="Groups and companies (and user, when the record rules depend on it) the explosion was computed for")
+    dep_fingerprint = fields.Char(_('Structure Fingerprint'),
+                                  readonly=True)
+    dep_count = fields.Integer(_('Templates'),
+                               readonly=True)
+    payload = fields.Text(_('Exploded Structure (JSON)'),
+                          readonly=True)
+    hit_count = fields.Integer(_('Hits'),
+                               readonly=True,
+                               default=0)
+    miss_count = fields.Integer(_('Misses'),
+                                readonly=True,
+                                default=0)
+    last_hit_date = fields.Datetime(_('Last Hit'),
+                                    readonly=True)
+
+    _sql_constraints = [
+        ('plm_bom_explode_cache_key_uniq',
+         'unique (bom_id, bom_type, latest_flag, explode_mode, security_key, dep_fingerprint)',
+         'The explosion is already cached!'),
+    ]
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute("""
+            CREATE TABLE IF NOT EXISTS plm_bom_structure_version (
+                product_tmpl_id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            );
+            ALTER TABLE plm_bom_explode_cache ADD COLUMN IF NOT EXISTS dep_tmpl_ids INTEGER[];
+            ALTER TABLE plm_bom_explode_cache ADD COLUMN IF NOT EXISTS dep_versions BIGINT[];
+        """)
+        # entries of the global structure version are never valid again
+        cr.execute("DROP SEQUENCE IF EXISTS plm_bom_structure_version_seq")
+        cr.execute("DELETE FROM plm_bom_explode_cache WHERE dep_tmpl_ids IS NULL")
+
+    @api.model
+    def _is_enabled(self):
+        value = self.env['ir.config_parameter'].sudo().get_param('PLM_BOM_EXPLODE_CACHE', 'True')
+        return value not in ('0', 'False', 'false')
+
+    @api.model
+    def get_structure_versions(self, product_tmpl_ids):
+        """
+        get the BoM structure versions of the templates visible from the current transaction
+        :return: {product_tmpl_id: version} templates never changed are missing
+        """
+        self.env.cr.execute("""
+            SELECT product_tmpl_id, version FROM plm_bom_structure_version
+            WHERE product_tmpl_id = ANY(%s)
+        """, (list(product_tmpl_ids),))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def mark_structure_changed(self, product_tmpl_ids):
+        """
+        Call this every time the BoM structure of the given templates is changed.
+        The version is bumped at the first change of each template in the transaction,
+        the version row stays locked up to the commit so the bumps of a template are serialised,
+        and the current transaction stops using the cache because it sees uncommitted changes
+        :product_tmpl_ids ids of the templates whose BoM, lines or revision flags are changed
+        """
+        cr = self.env.cr
+        marked = cr.precommit.data.setdefault(STRUCTURE_DIRTY_KEY, set())
+        to_mark = sorted(set(product_tmpl_ids or []) - marked)
+        if not to_mark:
+            return
+        marked.update(to_mark)
+        cr.execute("""
+            INSERT INTO plm_bom_structure_version (product_tmpl_id, version)
+            SELECT unnest(%s::int[]), 1
+            ON CONFLICT (product_tmpl_id) DO UPDATE SET version = plm_bom_structure_version.version + 1
+        """, (to_mark,))
+
+    @api.model
+    def _is_structure_dirty(self):
+        return bool(self.env.cr.precommit.data.get(STRUCTURE_DIRTY_KEY))
+
+    @api.model
+    @tools.ormcache('self.env.uid', 'self.env.su', 'tuple(self.env.companies.ids)', 'self.env.company.id')
+    def _get_security_key(self):
+        """
+        The explosions are computed under the record rules of the user, so they are shared
+        only between users with the same groups and companies.
+        The user is part of the key when a rule of the exploded models depends on it
+        """
+        if self.env.su:
+            return 'su'
+        rules = self.env['ir.rule'].sudo().search([('model_id.model', 'in', SECURED_MODELS)])
+        key_vals = [sorted(self.env.user.groups_id.ids), sorted(self.env.companies.ids), self.env.company.id]
+        if any('user' in (rule.domain_force or '').replace('user.company', '') for rule in rules):
+            key_vals.append(self.env.uid)
+        return hashlib.sha1(json.dumps(key_vals).encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_structure_dependencies(self, product_tmpl_id, latest_flag):
+        """
+        get the templates the explosion of the template depends on,
+        with the latest flag also all the revisions of the children codes
+        """
+        self.env['mrp.bom'].flush_model()
+        self.env['mrp.bom.line'].flush_model()
+        self.env.cr.execute("""
+            WITH RECURSIVE deps(product_tmpl_id) AS (
+                SELECT %(product_tmpl_id)s
+                UNION
+                SELECT x.product_tmpl_id
+                FROM deps d
+                JOIN mrp_bom b ON b.product_tmpl_id = d.product_tmpl_id
+                JOIN mrp_bom_line l ON l.bom_id = b.id
+                JOIN product_product pp ON pp.id = l.product_id
+                JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                CROSS JOIN LATERAL (
+                    SELECT pt.id AS product_tmpl_id
+                    UNION
+                    SELECT r.id FROM product_template r
+                    WHERE %(latest_flag)s
+                    AND r.engineering_code = pt.engineering_code
+                    AND r.engineering_is_latest
+                ) x
+            )
+            SELECT product_tmpl_id FROM deps ORDER BY product_tmpl_id
+        """, {'product_tmpl_id': product_tmpl_id, 'latest_flag': bool(latest_flag)})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def get_explosion(self, bom_brws_list, explode_mode, latest_flag, compute_fnc):
+        """
+        Return the explosion of the given boms from the cache computing it with compute_fnc if missing
+        :bom_brws_list mrp.bom browse list the explosion starts from
+        :explode_mode string that identify the kind of explosion (the payload shape)
+        :latest_flag explode the latest revision of each child
+        :compute_fnc callable with no arguments that return a json serializable structure
+        """
+        if not bom_brws_list or self._is_structure_dirty() or not self._is_enabled():
+            return compute_fnc()
+        bom_brws = bom_brws_list[0]
+        cr = self.env.cr
+        key = (bom_brws.id, bom_brws.type, bool(latest_flag), explode_mode, self._get_security_key())
+        cr.execute("""
+            SELECT c.id, c.payload FROM plm_bom_explode_cache c
+            WHERE c.bom_id = %s
+            AND c.bom_type = %s
+            AND c.latest_flag = %s
+            AND c.explode_mode = %s
+            AND c.security_key = %s
+            AND """ + VALID_ENTRY_FILTER + """
+            ORDER BY c.id DESC
+            LIMIT 1
+        """, key)
+        row = cr.fetchone()
+        if row:
+            self._register_stat(row[0], 'hit_count')
+            return json.loads(row[1])
+        out = compute_fnc()
+        dep_tmpl_ids = self._get_structure_dependencies(bom_brws.product_tmpl_id.id, latest_flag)
+        versions = self.get_structure_versions(dep_tmpl_ids)
+        dep_versions = [versions.get(product_tmpl_id, 0) for product_tmpl_id in dep_tmpl_ids]
+        fingerprint = hashlib.sha1(json.dumps([dep_tmpl_ids, dep_versions]).encode('utf-8')).hexdigest()
+        cr.execute("""
+            INSERT INTO plm_bom_explode_cache (bom_id, bom_type, latest_flag, explode_mode, security_key,
+                                               dep_fingerprint, dep_tmpl_ids, dep_versions, dep_count,
+                                               payload, hit_count, miss_count,
+                                               create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0, 1, %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        """, key + (fingerprint, dep_tmpl_ids, dep_versions, len(dep_tmpl_ids),
+                    json.dumps(out), self.env.uid, self.env.uid))
+        if not cr.fetchone():
+            # computed at the same time by another transaction, the miss is counted on its entry
+            cr.execute("""
+                SELECT id FROM plm_bom_explode_cache
+                WHERE bom_id = %s AND bom_type = %s AND latest_flag = %s AND explode_mode = %s
+                AND security_key = %s AND dep_fingerprint = %s
+            """, key + (fingerprint,))
+            for cache_id, in cr.fetchall():
+                self._register_stat(cache_id, 'miss_count')
+        return out
+
+    @api.model
+    def _register_stat(self, cache_id, column):
+        """
+        Hits and misses are collected during the transaction and flushed after the commit in a short one
+        so concurrent readers never lock each other on the cache rows
+        """
+        cr = self.env.cr
+        stats = cr.postcommit.data.get(CACHE_STATS_KEY)
+        if stats is None:
+            stats = cr.postcommit.data[CACHE_STATS_KEY] = {}
+            registry = self.env.registry
+
+            def _flush_stats():
+                try:
+                    with registry.cursor() as stat_cr:
+                        for (stat_cache_id, stat_column), count in stats.items():
+                            last_hit = ", last_hit_date = (now() at time zone 'UTC')" if stat_column == 'hit_count' else ''
+                            stat_cr.execute("""
+                                UPDATE plm_bom_explode_cache
+                                SET {column} = {column} + %s {last_hit}
+                                WHERE id = %s
+                            """.format(column=stat_column, last_hit=last_hit), (count, stat_cache_id))
+                except Exception as ex:
+                    _logger.warning("Unable to store BoM explosion cache statistics: %s" % ex)
+            cr.postcommit.add(_flush_stats)
+        stats[(cache_id, column)] = stats.get((cache_id, column), 0) + 1
+
+    @api.model
+    def run_clean_bom_explode_cache_scheduler(self):
+        """
+        Remove the explosions of a changed structure
+        """
+        logging.info('Start BoM explode cache Clean Scheduler')
+        self.env.cr.execute("DELETE FROM plm_bom_explode_cache c WHERE NOT " + VALID_ENTRY_FILTER)
+        self.env.cr.execute("""
+            DELETE FROM plm_bom_structure_version v
+            WHERE NOT EXISTS (SELECT 1 FROM product_template t WHERE t.id = v.product_tmpl_id)
+        """)
+        logging.info('End BoM explode cache Clean Scheduler')
+
+
+class PlmBomExplodeCacheStats(models.Model):
+    _name = "plm.bom.explode.cache.stats"
+    _description = "BoM Explosion Cache Statistics"
+    _auto = False
+
+    bom_type = fields.Char(_('BoM Type'), readonly=True)
+    explode_mode = fields.Char(_('Explode Mode'), readonly=True)
+    entry_count = fields.Integer(_('Entries'), readonly=True)
+    live_count = fields.Integer(_('Current Version Entries'), readonly=True)
+    hit_count = fields.Integer(_('Hits'), readonly=True)
+    miss_count = fields.Integer(_('Misses'), readonly=True)
+    hit_rate = fields.Float(_('Hit Rate (%)'), readonly=True, digits=(16, 2))
+
+    @api.model
+    def init(self):
+        cr = self.env.cr
+        tools.drop_view_if_exists(cr, self._table)
+        cr.execute("""
+            CREATE OR REPLACE VIEW plm_bom_explode_cache_stats AS (
+                SELECT
+                    row_number() OVER (ORDER BY c.bom_type, c.explode_mode) AS id,
+                    c.bom_type AS bom_type,
+                    c.explode_mode AS explode_mode,
+                    count(*) AS entry_count,
+                    count(*) FILTER (WHERE """ + VALID_ENTRY_FILTER + """) AS live_count,
+                    coalesce(sum(c.hit_count), 0) AS hit_count,
+                    coalesce(sum(c.miss_count), 0) AS miss_count,
+                    round(100.0 * coalesce(sum(c.hit_count), 0)
+                          / nullif(coalesce(sum(c.hit_count), 0) + coalesce(sum(c.miss_count), 0), 0), 2) AS hit_rate
+                FROM plm_bom_explode_cache c
+                GROUP BY c.bom_type, c.explode_mode
+            )
+        """)
@@ -23,11 +23,13 @@ Created on Sep 7, 2019
 
 @author: dsmerghetto
 '''
+import time
 import logging
 from odoo import models
 from odoo import fields
 from odoo import api
 from odoo import _
+from odoo.addons.plm.models.utils import init_plm_indexes
 
 
 class PlmCadOpen(models.Model):
@@ -44,6 +46,10 @@ class PlmCadOpen(models.Model):
     operation_type = fields.Char(_('Operation Type'), index=True)
     dbThread = fields.Char("Related Db Thread", index=True)
 
+    def init(self):
+        super(PlmCadOpen, self).init()
+        init_plm_indexes(self.env.cr, self._table)
+
     @api.model
     def getLastCadOpenByUser(self, doc_id, user_id):
         for plm_cad_open in self.search([
@@ -62,29 +68,92 @@ class PlmCadOpen(models.Model):
             return plm_cad_open
         return self
     
+    @api.model
+    def _move_old_cad_open_to_bck(self, from_document_id, to_document_id):
+        """
+        Move to plm.cad.open.bck all the opens of the documents in the range but the
+        latest one of each document and operation type
+        :from_document_id excluded lower bound, None for the opens without document
+        :to_document_id included upper bound, None for no bound
+        :return: number of moved opens
+        """
+        if from_document_id is None:
+            where = "document_id IS NULL"
+        elif to_document_id is None:
+            where = "document_id > %(from_document_id)s"
+        else:
+            where = "document_id > %(from_document_id)s AND document_id <= %(to_document_id)s"
+        self.env.cr.execute("""
+            WITH ranked AS (
+                SELECT id, row_number() OVER (PARTITION BY document_id, operation_type
+                                              ORDER BY create_date DESC, id DESC) AS position
+                FROM plm_cad_open
+                WHERE """ + where + """
+            ), moved AS (
+                DELETE FROM plm_cad_open
+                USING ranked
+                WHERE plm_cad_open.id = ranked.id AND ranked.position > 1
+                RETURNING plm_cad_open.plm_backup_doc_id, plm_cad_open.userid, plm_cad_open.document_id,
+                          plm_cad_open.rel_doc_rev, plm_cad_open.pws_path, plm_cad_open.hostname,
+                          plm_cad_open.operation_type
+            )
+            INSERT INTO plm_cad_open_bck (plm_backup_doc_id, userid, document_id, rel_doc_rev, pws_path, hostname,
+                                          operation_type, create_uid, write_uid, create_date, write_date)
+            SELECT plm_backup_doc_id, userid, document_id, rel_doc_rev, pws_path, hostname, operation_type,
+                   %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM moved
+        """, {'from_document_id': from_document_id,
+              'to_document_id': to_document_id,
+              'uid': self.env.uid})
+        return self.env.cr.rowcount
+
     @api.model
     def run_clean_cad_open_bck_scheduler(self):
+        """
+        Keep only the latest open of each document and operation type, the older ones go to plm.cad.open.bck.
+        The documents are processed in chunks of PLM_CAD_OPEN_CLEAN_CHUNK opens, every chunk is committed.
+        After PLM_CAD_OPEN_CLEAN_MAX_RUNTIME seconds the run stops and the next one goes on from the last document
+        """
         logging.info('Start Cad open Clean Scheduler')
-        rel_dict = {}
-        cad_open_ids = self.search(args=[], order='create_date desc')
-        for index, cad_open_id in enumerate(cad_open_ids):
-            if index % 1000 == 0:
-                self.env.cr.commit()
-            doc_id = cad_open_id.document_id.id
-            if doc_id not in rel_dict:
-                rel_dict[doc_id] = []
-            if cad_open_id.operation_type not in rel_dict[doc_id]:
-                rel_dict[doc_id].append(cad_open_id.operation_type)
-            else:
-                self.env['plm.cad.open.bck'].create({
-                    'plm_backup_doc_id': cad_open_id.plm_backup_doc_id.id,
-                    'userid': cad_open_id.userid.id,
-                    'document_id': cad_open_id.document_id.id,
-                    'pws_path': cad_open_id.pws_path,
-                    'hostname': cad_open_id.hostname,
-                    'operation_type': cad_open_id.operation_type,
-                    })
-                cad_open_id.unlink()
+        param_obj = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(param_obj.get_param('PLM_CAD_OPEN_CLEAN_CHUNK', '50000'))
+        max_runtime = int(param_obj.get_param('PLM_CAD_OPEN_CLEAN_MAX_RUNTIME', '3600'))
+        log_interval = int(param_obj.get_param('PLM_CAD_OPEN_CLEAN_LOG_INTERVAL', '60'))
+        last_document_id = int(param_obj.get_param('PLM_CAD_OPEN_CLEAN_LAST_DOCUMENT', '0'))
+        self.flush_model()
+        cr = self.env.cr
+        start = last_log = time.time()
+        moved = chunks = 0
+        if not last_document_id:
+            moved += self._move_old_cad_open_to_bck(None, None)
+            cr.commit()
+        while True:
+            cr.execute("""
+                SELECT document_id FROM plm_cad_open
+                WHERE document_id > %s
+                ORDER BY document_id
+                OFFSET %s LIMIT 1
+            """, (last_document_id, chunk_size))
+            row = cr.fetchone()
+            to_document_id = row[0] if row else None
+            moved += self._move_old_cad_open_to_bck(last_document_id, to_document_id)
+            chunks += 1
+            last_document_id = to_document_id or 0
+            cr.commit()
+            now = time.time()
+            if now - last_log >= log_interval or not to_document_id:
+                logging.info('Cad open Clean Scheduler: %s chunks, %s opens moved, last document %s, %.1f opens/s'
+                             % (chunks, moved, last_document_id, moved / max(now - start, 0.001)))
+                last_log = now
+            if not to_document_id:
+                break
+            if now - start > max_runtime:
+                logging.info('Cad open Clean Scheduler stops after %s seconds, next run goes on from document %s'
+                             % (max_runtime, last_document_id))
+                break
+        param_obj.set_param('PLM_CAD_OPEN_CLEAN_LAST_DOCUMENT', str(last_document_id))
+        self.invalidate_model()
+        self.env['plm.cad.open.bck'].invalidate_model()
         logging.info('End Cad open Clean Scheduler')
         
     def name_get(self):
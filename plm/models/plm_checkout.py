@@ -32,6 +32,8 @@ from odoo import _
 import logging
 import time
 
+CHECKOUT_MAP_KEY = 'plm.checkout.map'
+
 
 class PlmCheckout(models.Model):
     _name = 'plm.checkout'
@@ -73,8 +75,41 @@ class PlmCheckout(models.Model):
             result.append((r.id, name))
         return result
 
+    @api.model
+    def _get_checkout_map(self, document_ids):
+        """
+        Checkout state of the documents, kept until the end of the transaction.
+        The documents not yet in the map are loaded with one query
+        :return: {document id: (checkout id, user id, hostname) or False}
+        """
+        checkoutMap = self.env.cr.precommit.data.setdefault(CHECKOUT_MAP_KEY, {})
+        missing = [doc_id for doc_id in set(document_ids) if isinstance(doc_id, int) and doc_id not in checkoutMap]
+        if missing:
+            checkoutMap.update(dict.fromkeys(missing, False))
+            for checkout_dict in self.search_read([('documentid', 'in', missing)],
+                                                  ['documentid', 'userid', 'hostname'],
+                                                  load=None):
+                checkoutMap[checkout_dict['documentid']] = (checkout_dict['id'],
+                                                            checkout_dict['userid'],
+                                                            checkout_dict['hostname'])
+        return checkoutMap
+
+    def _update_checkout_map(self, checked_in=False):
+        checkoutMap = self.env.cr.precommit.data.get(CHECKOUT_MAP_KEY)
+        if checkoutMap is None:
+            return
+        for checkoutBrws in self:
+            if checked_in:
+                checkoutMap[checkoutBrws.documentid.id] = False
+            else:
+                checkoutMap[checkoutBrws.documentid.id] = (checkoutBrws.id,
+                                                           checkoutBrws.userid.id,
+                                                           checkoutBrws.hostname)
+
     @api.model
     def _adjustRelations(self, childDocIds, userid=False):
+        if not childDocIds:
+            return
         docRelType = self.env['ir.attachment.relation']
         if userid:
             docRelBrwsList = docRelType.search([('child_id', 'in', childDocIds), ('userid', '=', False)])
@@ -86,36 +121,48 @@ class PlmCheckout(models.Model):
 
     @api.model_create_multi
     def create(self, vals):
-        for vals_dict in vals:
-            docBrws = self.env['ir.attachment'].browse(vals_dict['documentid'])
-            values = {'engineering_writable': True}
-            if not docBrws.sudo(True).write(values):
-                logging.warning("create : Unable to check-out the required document (" + str(docBrws.engineering_code) + "-" + str(docBrws.engineering_revision) + ").")
-                raise UserError(_("Unable to check-out the required document (" + str(docBrws.engineering_code) + "-" + str(docBrws.engineering_revision) + ")."))
-            self._adjustRelations([docBrws.id])
+        docBrwsList = self.env['ir.attachment'].browse([vals_dict['documentid'] for vals_dict in vals])
+        values = {'engineering_writable': True}
+        if not docBrwsList.sudo(True).write(values):
+            codes = ', '.join(["%s-%s" % (docBrws.engineering_code, docBrws.engineering_revision) for docBrws in docBrwsList])
+            logging.warning("create : Unable to check-out the required documents (" + codes + ").")
+            raise UserError(_("Unable to check-out the required documents (" + codes + ")."))
+        self._adjustRelations(docBrwsList.ids)
         newCheckoutBrws = super().create(vals)
-        docBrws.message_post(body=_('Checked-Out ID %r' % (newCheckoutBrws.id)))
+        newCheckoutBrws._update_checkout_map()
+        if not self.env.context.get('plm_checkout_no_message'):
+            for checkoutBrws in newCheckoutBrws:
+                checkoutBrws.documentid.message_post(body=_('Checked-Out ID %r' % (checkoutBrws.id)))
         return newCheckoutBrws
 
-    
+    def write(self, vals):
+        if {'documentid', 'userid', 'hostname'}.intersection(vals):
+            self._update_checkout_map(checked_in=True)
+            ret = super(PlmCheckout, self).write(vals)
+            self._update_checkout_map()
+            return ret
+        return super(PlmCheckout, self).write(vals)
+
     def unlink(self):
-        documentType = self.env['ir.attachment']
-        docids = []
-        for checkObj in self:
-            if not checkObj.documentid:
-                continue
-            if checkObj.documentid.has_error:
-                raise UserError(f"Unable to check-in due to an error on saving document [{checkObj.documentid.engineering_code} rev {checkObj.documentid.engineering_revision}]")
-            checkObj.documentid.engineering_writable = False
-            values = {'engineering_writable': False}
-            docids.append(checkObj.documentid.id)
-            if not documentType.browse([checkObj.documentid.id]).write(values):
-                logging.warning("unlink : Unable to check-in the document (" + str(checkObj.documentid.engineering_code) + "-" + str(checkObj.documentid.engineering_revision) + ").\n You can't change writable flag.")
-                raise UserError(_("Unable to Check-In the document (" + str(checkObj.documentid.engineering_code) + "-" + str(checkObj.documentid.engineering_revision) + ").\n You can't change writable flag."))
-        self._adjustRelations(docids, False)
+        docBrwsList = self.mapped('documentid')
+        for docBrws in docBrwsList.filtered('has_error'):
+            raise UserError(f"Unable to check-in due to an error on saving document [{docBrws.engineering_code} rev {docBrws.engineering_revision}]")
+        docBrwsList.check_access_rights('write')
+        deniedBrwsList = docBrwsList - docBrwsList._filter_access_rules('write')
+        if deniedBrwsList:
+            codes = ', '.join(["%s-%s" % (docBrws.engineering_code, docBrws.engineering_revision) for docBrws in deniedBrwsList])
+            logging.warning("unlink : Unable to check-in the documents (" + codes + ").\n You can't change writable flag.")
+            raise UserError(_("Unable to Check-In the documents (" + codes + ").\n You can't change writable flag."))
+        values = {'engineering_writable': False}
+        if docBrwsList and not docBrwsList.write(values):
+            codes = ', '.join(["%s-%s" % (docBrws.engineering_code, docBrws.engineering_revision) for docBrws in docBrwsList])
+            logging.warning("unlink : Unable to check-in the documents (" + codes + ").\n You can't change writable flag.")
+            raise UserError(_("Unable to Check-In the documents (" + codes + ").\n You can't change writable flag."))
+        self._adjustRelations(docBrwsList.ids, False)
+        self._update_checkout_map(checked_in=True)
         dummy = super(PlmCheckout, self).unlink()
-        if dummy:
-            for doc_id in documentType.browse(docids):
+        if dummy and not self.env.context.get('plm_checkout_no_message'):
+            for doc_id in docBrwsList:
                 doc_id.message_post(body=_('Checked-In'))
         return dummy
 
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+
+Resolver of (model, engineering code, engineering revision) to record id.
+All the keys are resolved by one indexed query on the current transaction,
+no state is kept in the workers so there is nothing to invalidate:
+the (engineering_code, engineering_revision) index serves the revision keys
+and the partial index on engineering_code WHERE engineering_is_latest serves
+the latest revision keys.
+'''
+from odoo import models
+from odoo import api
+
+
+class PlmCodeResolver(models.AbstractModel):
+    _name = "plm.code.resolver"
+    _description = "Engineering Code Resolver"
+
+    @api.model
+    def _normalize_key(self, engineering_code, engineering_revision):
+        if engineering_revision is None or engineering_revision is False:
+            return engineering_code, None
+        return engineering_code, int(engineering_revision)
+
+    @api.model
+    def resolve(self, model_name, keys):
+        """
+        Resolve many engineering codes at once
+        :model_name model of the records, product.product product.template or ir.attachment
+        :keys list of (engineering_code, engineering_revision), a None or False revision means the latest one
+        :return: {(engineering_code, engineering_revision or None): id}
+        """
+        model_obj = self.env[model_name]
+        model_obj.check_access_rights('read')
+        keys = set(self._normalize_key(code, revision) for code, revision in keys if code)
+        if not keys:
+            return {}
+        return self._filter_readable(model_name, self._read_ids(model_name, keys))
+
+    @api.model
+    def resolve_one(self, model_name, engineering_code, engineering_revision):
+        """
+        :return: browse record of the resolved id, empty if not found
+        """
+        key = self._normalize_key(engineering_code, engineering_revision)
+        return self.env[model_name].browse(self.resolve(model_name, [key]).get(key, []))
+
+    @api.model
+    def _get_code_tables(self, model_name):
+        """
+        :return: (FROM clause, alias of the table holding the engineering code, alias of the active flag or None)
+        """
+        model_obj = self.env[model_name]
+        code_field = model_obj._fields['engineering_code']
+        code_model = model_obj
+        from_clause = '"%s" r' % model_obj._table
+        code_alias = 'r'
+        if code_field.inherited:
+            # product.product reads the engineering code of its template
+            code_model = self.env[code_field.related_field.model_name]
+            from_clause += ' JOIN "%s" c ON c.id = r."%s"' % (code_model._table, model_obj._inherits[code_model._name])
+            code_alias = 'c'
+        code_model.flush_model(['engineering_code', 'engineering_revision', 'engineering_is_latest'])
+        active_alias = None
+        active_field = model_obj._fields.get('active')
+        if active_field and active_field.store and self.env.context.get('active_test', True):
+            active_alias = code_alias if active_field.inherited else 'r'
+            model_obj.flush_model(['active'])
+        return from_clause, code_alias, active_alias
+
+    @api.model
+    def _read_ids(self, model_name, keys):
+        from_clause, code_alias, active_alias = self._get_code_tables(model_name)
+        active_filter = "AND %s.active" % active_alias if active_alias else ""
+        revision_keys = sorted(key for key in keys if key[1] is not None)
+        latest_codes = sorted(code for code, revision in keys if revision is None)
+        out = {}
+        if revision_keys:
+            self.env.cr.execute("""
+                SELECT DISTINCT ON ({c}.engineering_code, {c}.engineering_revision)
+                       {c}.engineering_code, {c}.engineering_revision, r.id
+                FROM unnest(%s::varchar[], %s::integer[]) AS k(code, revision)
+                JOIN {from_clause} ON {c}.engineering_code = k.code AND {c}.engineering_revision = k.revision
+                WHERE TRUE {active_filter}
+                ORDER BY {c}.engineering_code, {c}.engineering_revision, r.id
+            """.format(c=code_alias, from_clause=from_clause, active_filter=active_filter),
+                [[code for code, _revision in revision_keys], [revision for _code, revision in revision_keys]])
+            for code, revision, res_id in self.env.cr.fetchall():
+                out[(code, revision)] = res_id
+        if latest_codes:
+            self.env.cr.execute("""
+                SELECT DISTINCT ON ({c}.engineering_code) {c}.engineering_code, r.id
+                FROM {from_clause}
+                WHERE {c}.engineering_is_latest AND {c}.engineering_code = ANY(%s) {active_filter}
+                ORDER BY {c}.engineering_code, r.id
+            """.format(c=code_alias, from_clause=from_clause, active_filter=active_filter), [latest_codes])
+            for code, res_id in self.env.cr.fetchall():
+                out[(code, None)] = res_id
+        return out
+
+    @api.model
+    def _filter_readable(self, model_name, resolved):
+        """
+        The ids are read with SQL, the record rules are applied on the resolved ids
+        """
+        model_obj = self.env[model_name]
+        if not resolved or self.env.su:
+            return resolved
+        if type(model_obj)._search is models.Model._search and not self.env['ir.rule']._compute_domain(model_name, 'read'):
+            return resolved
+        allowed_ids = set(model_obj.search([('id', 'in', list(set(resolved.values())))]).ids)
+        return {key: res_id for key, res_id in resolved.items() if res_id in allowed_ids}
@@ -111,6 +111,10 @@ class RevisionBaseMixin(models.AbstractModel):
     engineering_branch_parent_id = fields.Integer('Parent branch')
     engineering_sub_revision_letter = fields.Char("Sub revision path")
     engineering_revision_count = fields.Integer(compute='_engineering_revision_count')
+    engineering_is_latest = fields.Boolean(string="Is Latest Revision",
+                                           readonly=True,
+                                           copy=False,
+                                           help="Maintained on create, write and unlink, it marks the latest revision of each engineering code")
     
     # _sql_constraints = [
     #     ('engineering_uniq', 
@@ -131,16 +135,77 @@ class RevisionBaseMixin(models.AbstractModel):
             """.format(unique_name="unique_index_%s"% self._table,
                        table_name=self._table)
             self.env.cr.execute(sql)
+            self._init_latest_revision()
+
+    def _init_latest_revision(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS {index_name}
+            ON {table_name} (engineering_code)
+            WHERE engineering_is_latest
+        """.format(index_name="%s_engineering_latest_index" % self._table,
+                   table_name=self._table))
+        self._update_latest_revision()
+
+    def _update_latest_revision(self, engineering_codes=None):
+        """
+        Maintain the engineering_is_latest flag with a single statement
+        :engineering_codes codes to update, None for all the table
+        """
+        has_active = 'active' in self._fields
+        params = []
+        code_filter = "engineering_code IS NOT NULL"
+        if engineering_codes is not None:
+            engineering_codes = tuple(set(code for code in engineering_codes if code))
+            if not engineering_codes:
+                return
+            code_filter = "engineering_code IN %s"
+            params = [engineering_codes]
+        self.flush_model(['engineering_code', 'engineering_revision'] + (['active'] if has_active else []))
+        self.env.cr.execute("""
+            UPDATE {table_name} t
+            SET engineering_is_latest = (t.id = l.id)
+            FROM (SELECT DISTINCT ON (engineering_code) id, engineering_code
+                  FROM {table_name}
+                  WHERE {code_filter} {active_filter}
+                  ORDER BY engineering_code, engineering_revision DESC, id DESC) l
+            WHERE t.engineering_code = l.engineering_code
+            AND t.engineering_is_latest IS DISTINCT FROM (t.id = l.id)
+        """.format(table_name=self._table,
+                   code_filter=code_filter,
+                   active_filter="AND active" if has_active else ""), params)
+        self.env.cr.execute("""
+            UPDATE {table_name}
+            SET engineering_is_latest = false
+            WHERE engineering_is_latest
+            AND (engineering_code IS NULL {inactive_filter})
+        """.format(table_name=self._table,
+                   inactive_filter="OR active IS NOT TRUE" if has_active else ""))
+        self.invalidate_model(['engineering_is_latest'])
+
+    @api.model
+    def get_latest_ids_by_code(self, engineering_codes):
+        """
+        Bulk resolver of the latest revisions
+        :engineering_codes list of engineering codes
+        :return: {engineering_code: id of the latest revision}
+        """
+        resolved = self.env['plm.code.resolver'].resolve(self._name, [(code, None) for code in engineering_codes])
+        return {code: res_id for (code, _revision), res_id in resolved.items()}
     
     def _engineering_revision_count(self):
         """
         get All version product_tempate based on this one
         """
+        codes = list(set(code for code in self.mapped('engineering_code') if code))
+        revision_counts = {}
+        if codes:
+            for group in self.read_group([('engineering_code', 'in', codes)],
+                                         ['engineering_code'],
+                                         ['engineering_code'],
+                                         lazy=False):
+                revision_counts[group['engineering_code']] = group['__count']
         for obj in self:
-            if obj.engineering_code:
-                obj.engineering_revision_count = self.search_count([('engineering_code', '=', obj.engineering_code)])
-            else:
-                obj.engineering_revision_count = 0
+            obj.engineering_revision_count = revision_counts.get(obj.engineering_code, 0) if obj.engineering_code else 0
                 
     def _mark_workflow_release_now(self):
         """
@@ -373,8 +438,9 @@ class RevisionBaseMixin(models.AbstractModel):
                 return children
         return []
         
-    def copy(self, default=None):
-        default = default or {}
+    def copy_data(self, default=None):
+        # copy_data also serves the bulk revisions that create the copies at once
+        default = dict(default or {})
         if 'engineering_state' not in default:
             default['engineering_state']=START_STATUS
         if 'engineering_code' not in default:
@@ -382,13 +448,16 @@ class RevisionBaseMixin(models.AbstractModel):
         if 'engineering_revision' not in default:
             default['engineering_revision']=0
             default['engineering_revision_letter']=self.get_revision_letter(0)             
-        return super(RevisionBaseMixin, self).copy(default)
+        return super(RevisionBaseMixin, self).copy_data(default)
         
     def get_latest_version(self):
         """
         get the latest version of this object
         """
         self.ensure_one()
+        if self.engineering_code:
+            return self.search([('engineering_code','=', self.engineering_code),
+                                ('engineering_is_latest', '=', True)], limit=1)
         return self.search([('engineering_code','=', self.engineering_code)], order='engineering_revision DESC', limit=1)
     
     def get_previus_version(self):
@@ -413,13 +482,28 @@ class RevisionBaseMixin(models.AbstractModel):
     def write(self, vals):
         if 'engineering_code' in vals and vals['engineering_code'] not in [False, '-','']:
             vals['engineering_code_editable']=False
-        return super(RevisionBaseMixin, self).write(vals)
+        old_codes = []
+        revision_changed = {'engineering_code', 'engineering_revision', 'active'}.intersection(vals)
+        if revision_changed:
+            old_codes = self.mapped('engineering_code')
+        ret = super(RevisionBaseMixin, self).write(vals)
+        if revision_changed:
+            self._update_latest_revision(old_codes + self.mapped('engineering_code'))
+        return ret
 
     def create(self, vals):
         for record_val in vals:
             if 'engineering_code' in record_val and record_val['engineering_code'] not in [False, '-','']:
                 record_val['engineering_code_editable']=False
-        return super(RevisionBaseMixin, self).create(vals)
+        ret = super(RevisionBaseMixin, self).create(vals)
+        ret._update_latest_revision(ret.mapped('engineering_code'))
+        return ret
+
+    def unlink(self):
+        old_codes = self.mapped('engineering_code')
+        ret = super(RevisionBaseMixin, self).unlink()
+        self._update_latest_revision(old_codes)
+        return ret
         
     def get_display_notification(self, message):
         return {'type': 'ir.actions.client',
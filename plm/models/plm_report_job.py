@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+
+Background rendering of the heavy PLM prints.
+Every cron slot claims the jobs with SKIP LOCKED, Odoo never runs a cron twice
+at the same time so PLM_REPORT_JOB_WORKERS slots render at most as many jobs
+in parallel. A job interrupted PLM_REPORT_JOB_ATTEMPTS times is marked as failed.
+'''
+import os
+import json
+import hashlib
+import logging
+import traceback
+from datetime import timedelta
+from odoo import models
+from odoo import fields
+from odoo import api
+from odoo import _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# one cron per slot, PLM_REPORT_JOB_WORKERS is bounded by their number
+REPORT_JOB_CRONS = ['plm.ir_cron_scheduler_report_job',
+                    'plm.ir_cron_scheduler_report_job_2',
+                    'plm.ir_cron_scheduler_report_job_3',
+                    'plm.ir_cron_scheduler_report_job_4']
+
+
+class PlmReportJob(models.Model):
+    _name = "plm.report.job"
+    _description = "PLM Report Job"
+    _inherit = ['mail.thread']
+    _order = 'id DESC'
+
+    name = fields.Char(_('Name'),
+                       readonly=True)
+    report_name = fields.Char(_('Report'),
+                              readonly=True,
+                              required=True)
+    res_model = fields.Char(_('Model'),
+                            readonly=True,
+                            required=True)
+    res_ids = fields.Char(_('Record Ids'),
+                          readonly=True,
+                          required=True)
+    job_key = fields.Char(_('Job Key'),
+                          readonly=True,
+                          index=True)
+    user_id = fields.Many2one('res.users',
+                              string=_('Requested By'),
+                              readonly=True,
+                              default=lambda self: self.env.user)
+    state = fields.Selection([('pending', _('Pending')),
+                              ('running', _('Running')),
+                              ('done', _('Done')),
+                              ('failed', _('Failed'))],
+                             string=_('Status'),
+                             readonly=True,
+                             default='pending',
+                             index=True)
+    date_start = fields.Datetime(_('Started'),
+                                 readonly=True)
+    date_done = fields.Datetime(_('Done'),
+                                readonly=True)
+    attachment_id = fields.Many2one('ir.attachment',
+                                    string=_('Result'),
+                                    readonly=True,
+                                    ondelete='set null')
+    error_message = fields.Text(_('Error'),
+                                readonly=True)
+    attempts = fields.Integer(_('Attempts'),
+                              readonly=True,
+                              default=0)
+
+    @api.model
+    def _get_job_key(self, report_name, res_ids):
+        # the printed books carry the user name so the same print of two users is not shared
+        key = json.dumps([report_name, sorted(res_ids), self.env.uid])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @api.model
+    def submit(self, report_name, res_ids):
+        """
+        Queue a print, an identical print still pending or running is reused
+        :report_name report_name of the ir.actions.report
+        :res_ids ids of the records to print
+        :return: plm.report.job
+        """
+        report = self.env['ir.actions.report']._get_report_from_name(report_name)
+        if not report:
+            raise UserError(_("Report %r not found") % report_name)
+        self.env[report.model].browse(res_ids).check_access_rule('read')
+        job_key = self._get_job_key(report_name, res_ids)
+        for job in self.search([('job_key', '=', job_key),
+                                ('state', 'in', ['pending', 'running'])], limit=1):
+            return job
+        job = self.create({'name': '%s (%s)' % (report.name, len(res_ids)),
+                           'report_name': report_name,
+                           'res_model': report.model,
+                           'res_ids': ','.join(map(str, res_ids)),
+                           'job_key': job_key})
+        for cron_xmlid in REPORT_JOB_CRONS[:self._get_workers()]:
+            cron = self.env.ref(cron_xmlid, raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+        return job
+
+    @api.model
+    def action_submit(self, report_name, res_ids):
+        job = self.submit(report_name, res_ids)
+        return {'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {'title': _('Print queued'),
+                           'message': _('%s: you will be notified when it is ready') % job.name,
+                           'type': 'info',
+                           'sticky': False}}
+
+    def _get_res_ids(self):
+        return [int(res_id) for res_id in self.res_ids.split(',') if res_id]
+
+    def _render(self):
+        """
+        Render the job as the requesting user
+        :return: (content, file extension)
+        """
+        self.ensure_one()
+        env = self.env(user=self.user_id.id)
+        records = env[self.res_model].browse(self._get_res_ids()).exists()
+        report_model = 'report.%s' % self.report_name
+        if report_model in env and hasattr(env[report_model], '_render_book_file'):
+            book_path = env[report_model]._render_book_file(records)
+            if not book_path:
+                raise UserError(_("No pdf found to print"))
+            try:
+                with open(book_path, 'rb') as f:
+                    return f.read(), 'pdf'
+            finally:
+                os.remove(book_path)
+        content, content_type = env['ir.actions.report']._render_qweb_pdf(self.report_name, records.ids)
+        return content, content_type
+
+    def _run(self):
+        self.ensure_one()
+        try:
+            content, extension = self._render()
+            attachment = self.env['ir.attachment'].create({'name': '%s.%s' % (self.name, extension),
+                                                           'raw': content,
+                                                           'res_model': self._name,
+                                                           'res_id': self.id})
+            self.write({'state': 'done',
+                        'date_done': fields.Datetime.now(),
+                        'attachment_id': attachment.id})
+            self._notify_user(_('%s is ready') % self.name,
+                              '<a href="/web/content/%s?download=true">%s</a>' % (attachment.id, attachment.name))
+        except Exception as ex:
+            _logger.error(traceback.format_exc())
+            self.env.cr.rollback()
+            self.write({'state': 'failed',
+                        'date_done': fields.Datetime.now(),
+                        'error_message': str(ex)})
+            self._notify_user(_('%s failed') % self.name, str(ex))
+
+    def _notify_user(self, title, body):
+        self.message_post(body=body,
+                          subject=title,
+                          partner_ids=self.user_id.partner_id.ids,
+                          subtype_xmlid='mail.mt_comment')
+        self.env['bus.bus']._sendone(self.user_id.partner_id,
+                                     'simple_notification',
+                                     {'title': title,
+                                      'message': self.name,
+                                      'sticky': False})
+
+    @api.model
+    def _claim_job(self):
+        """
+        Take the first pending job, a job claimed by another transaction is skipped
+        """
+        cr = self.env.cr
+        cr.execute("""
+            UPDATE plm_report_job
+            SET state = 'running', date_start = (now() at time zone 'UTC'), attempts = attempts + 1
+            WHERE id = (SELECT id FROM plm_report_job
+                        WHERE state = 'pending'
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1)
+            RETURNING id
+        """)
+        row = cr.fetchone()
+        cr.commit()
+        self.invalidate_model(['state', 'date_start', 'attempts'])
+        return self.browse(row[0] if row else [])
+
+    @api.model
+    def _requeue_stale_jobs(self, timeout, max_attempts):
+        """
+        The jobs running since more than timeout seconds belong to a killed worker,
+        they go back in the queue until they reach max_attempts
+        """
+        for job in self.search([('state', '=', 'running'),
+                                ('date_start', '<', fields.Datetime.now() - timedelta(seconds=timeout))]):
+            if job.attempts >= max_attempts:
+                message = _('Interrupted %s times, the print is too big or breaks the worker') % job.attempts
+                job.write({'state': 'failed',
+                           'date_done': fields.Datetime.now(),
+                           'error_message': message})
+                job._notify_user(_('%s failed') % job.name, message)
+            else:
+                job.write({'state': 'pending'})
+
+    @api.model
+    def _get_workers(self):
+        """
+        Number of cron slots rendering the jobs at the same time
+        """
+        workers = int(self.env['ir.config_parameter'].sudo().get_param('PLM_REPORT_JOB_WORKERS', '2'))
+        return max(1, min(workers, len(REPORT_JOB_CRONS)))
+
+    @api.model
+    def run_report_job_scheduler(self, max_jobs=50, slot=1):
+        """
+        Render the pending jobs, every job is committed on its own.
+        Each slot is a cron of its own, the slots above PLM_REPORT_JOB_WORKERS stay idle
+        :slot cron slot running the scheduler, starting from 1
+        """
+        if slot > self._get_workers():
+            return
+        if slot == 1:
+            param_obj = self.env['ir.config_parameter'].sudo()
+            timeout = int(param_obj.get_param('PLM_REPORT_JOB_TIMEOUT', '7200'))
+            max_attempts = int(param_obj.get_param('PLM_REPORT_JOB_ATTEMPTS', '3'))
+            self._requeue_stale_jobs(timeout, max_attempts)
+            self.env.cr.commit()
+        for _count in range(max_jobs):
+            job = self._claim_job()
+            if not job:
+                break
+            job._run()
+            self.env.cr.commit()
+
+    @api.model
+    def run_clean_report_job_scheduler(self, days=7):
+        """
+        Remove the jobs done before the given days with their results
+        """
+        jobs = self.search([('state', 'in', ['done', 'failed']),
+                            ('date_done', '<', fields.Datetime.now() - timedelta(days=days))])
+        jobs.mapped('attachment_id').unlink()
+        jobs.unlink()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+
+Version counter of the records saved by the CAD clients.
+The client sends back the version it has read, the saves of records changed
+in the meantime are refused before any write.
+The versions are bumped once per record when the transaction commits, so a
+save changing many lines of a BoM writes the BoM row once.
+The record is locked at its first change, so the bump at commit never waits
+and never fails with a serialization error after the save is done.
+'''
+from psycopg2.errors import SerializationFailure
+from odoo import models
+from odoo import fields
+from odoo import api
+from odoo import _
+from odoo.exceptions import UserError
+
+
+PLM_VERSION_KEY = 'plm.version.pending'
+
+
+class PlmVersionMixin(models.AbstractModel):
+    _name = "plm.version.mixin"
+    _description = "PLM Save Version"
+
+    # no default, the column is added without rewriting the existing rows
+    plm_version = fields.Integer(_('Save Version'),
+                                 readonly=True,
+                                 copy=False)
+
+    def _bump_plm_version(self):
+        """
+        Bump the version of the records when the transaction commits, once per record.
+        The records are locked now, a record saved by someone else is refused here
+        """
+        ids = [record_id for record_id in self.ids if isinstance(record_id, int)]
+        if not ids:
+            return
+        data = self.env.cr.precommit.data
+        pending = data.get(PLM_VERSION_KEY)
+        if pending is None:
+            pending = data[PLM_VERSION_KEY] = {}
+            self.env.cr.precommit.add(self._flush_plm_versions)
+        to_lock = set(ids) - pending.get(self._name, set())
+        if to_lock:
+            _versions, errors = self.browse(sorted(to_lock))._lock_plm_versions()
+            if errors:
+                raise UserError("\n".join(errors.values()))
+        pending.setdefault(self._name, set()).update(ids)
+
+    @api.model
+    def _flush_plm_versions(self):
+        """
+        Write the pending version bumps now, the save gives back the new versions to the client
+        the rows are already locked by _bump_plm_version
+        """
+        pending = self.env.cr.precommit.data.pop(PLM_VERSION_KEY, None) or {}
+        for model_name, ids in pending.items():
+            model_obj = self.env[model_name]
+            self.env.cr.execute('UPDATE "%s" SET plm_version = COALESCE(plm_version, 0) + 1 WHERE id IN %%s' % model_obj._table,
+                                (tuple(sorted(ids)),))
+            model_obj.browse(ids).invalidate_recordset(['plm_version'])
+
+    def _get_plm_version_label(self):
+        return self.display_name
+
+    def _lock_plm_versions(self):
+        """
+        Lock the records that are going to be saved, in id order and without waiting,
+        so two saves of the same records fail at once with a clear message
+        instead of a serialization failure and a replay of the whole save
+        :return: ({id: version} of the locked records, {id: error message} of the records saved by someone else now)
+        """
+        ids = sorted(set(self.ids))
+        if not ids:
+            return {}, {}
+        versions = {}
+        errors = {}
+        try:
+            versions = self._lock_plm_version_rows(ids)
+        except SerializationFailure:
+            # a row saved by someone else after this transaction started,
+            # lock the rows one by one to tell which ones
+            for record_id in ids:
+                try:
+                    versions.update(self._lock_plm_version_rows([record_id]))
+                except SerializationFailure:
+                    errors[record_id] = _("%s was saved by another user, reload it before saving") % self.browse(record_id)._get_plm_version_label()
+        for record in self.browse(ids).exists():
+            if record.id not in versions and record.id not in errors:
+                errors[record.id] = _("%s is being saved by another user") % record._get_plm_version_label()
+        return versions, errors
+
+    def _lock_plm_version_rows(self, ids):
+        with self.env.cr.savepoint(flush=False):
+            self.env.cr.execute('SELECT id, plm_version FROM "%s" WHERE id IN %%s ORDER BY id FOR NO KEY UPDATE SKIP LOCKED' % self._table,
+                                (tuple(ids),), log_exceptions=False)
+            return {record_id: version or 0 for record_id, version in self.env.cr.fetchall()}
+
+    def _get_plm_version_error(self, version, expected_version):
+        return _("%s was saved by another user (version %s, yours %s), reload it before saving") % (
+            self._get_plm_version_label(), version, expected_version)
@@ -89,15 +89,19 @@ class ProductProduct(models.Model):
         @param context: A standard dictionary for contextual values
         @return:  Dictionary of values
         """
-        bom_line_objType = self.env['mrp.bom.line']
-        prod_objs = self.browse(self.ids)
-        for prod_obj in prod_objs:
+        # one query for each step line -> bom -> template -> variants, whatever the recordset size
+        bom_line_objs = self.env['mrp.bom.line'].search([('product_id', 'in', self._origin.ids)])
+        tmpl_ids_by_product = {}
+        for bom_line_obj in bom_line_objs:
+            tmpl_ids_by_product.setdefault(bom_line_obj.product_id.id, set()).add(bom_line_obj.bom_id.product_tmpl_id.id)
+        variant_ids_by_tmpl = {}
+        for variant_obj in self.search([('product_tmpl_id', 'in', bom_line_objs.bom_id.product_tmpl_id.ids)]):
+            variant_ids_by_tmpl.setdefault(variant_obj.product_tmpl_id.id, []).append(variant_obj.id)
+        for prod_obj in self:
             prod_ids = []
-            bom_line_objs = bom_line_objType.search([('product_id', '=', prod_obj.id)])
-            for bom_line_obj in bom_line_objs:
-                for objPrd in self.search([('product_tmpl_id', '=', bom_line_obj.bom_id.product_tmpl_id.id)]):
-                    prod_ids.append(objPrd.id)
-            prod_obj.father_part_ids = prod_ids
+            for tmpl_id in tmpl_ids_by_product.get(prod_obj._origin.id, ()):
+                prod_ids.extend(variant_ids_by_tmpl.get(tmpl_id, []))
+            prod_obj.father_part_ids = [(6, 0, prod_ids)]
 
     tmp_material = fields.Many2one('plm.material',
                                    _('Raw Material'),
@@ -519,6 +523,16 @@ class ProductProduct(models.Model):
         ids = self.GetLatestIds(partData, forceCADProperties=forceCADProperties)
         return self.browse(list(set(ids))).read(attribNames)
 
+    @api.model
+    def get_latest_ids_by_code(self, engineering_codes):
+        """
+        Bulk resolver of the latest revisions using the template flag
+        :engineering_codes list of engineering codes
+        :return: {engineering_code: id of the latest revision variant}
+        """
+        resolved = self.env['plm.code.resolver'].resolve(self._name, [(code, None) for code in engineering_codes])
+        return {code: res_id for (code, _revision), res_id in resolved.items()}
+
     @api.model
     def GetLatestIds(self, vals, forceCADProperties=False):
         """
@@ -526,16 +540,13 @@ class ProductProduct(models.Model):
         """
         ids = []
         plmDocObj = self.env['ir.attachment']
+        resolver = self.env['plm.code.resolver']
+        resolved = resolver.resolve(self._name, [(partName, partRev) for partName, partRev, _docIdToOpen in vals])
 
         def getCompIds(partName, partRev):
-            if docRev is None or docRev is False:
-                partIds = self.search([('engineering_code', '=', partName)],
-                                      order='engineering_revision').ids
-                if len(partIds) > 0:
-                    ids.append(partIds[-1])
-            else:
-                ids.extend(self.search([('engineering_code', '=', partName),
-                                        ('engineering_revision', '=', partRev)]).ids)
+            res_id = resolved.get(resolver._normalize_key(partName, partRev))
+            if res_id:
+                ids.append(res_id)
 
         for docName, docRev, docIdToOpen in vals:
             docBrw = plmDocObj.browse(docIdToOpen)
@@ -822,6 +833,7 @@ class ProductProduct(models.Model):
             checkObj.linkeddocuments.unlinkCheckDocumentRelations()
             checkObj.product_tmpl_id.unlinkCheckBomRelations()
             checkObj.unlinkRestorePreviousComponent()
+        self.env['plm.bom.explode.cache'].mark_structure_changed(self.product_tmpl_id.ids)
         return super(ProductProduct, self).unlink()
 
 
@@ -1039,7 +1051,20 @@ class ProductProduct(models.Model):
             vals = product.plm_sanitize(vals)
             if not product.description or ('description' in vals and not vals['description']):
                 vals['description'] = '.'
+        old_weights = {}
+        if 'weight' in vals and not self.env.context.get('plm_weight_propagation'):
+            old_weights = {product.id: product.weight for product in self}
         res =  super(ProductProduct, self).write(vals)
+        if 'active' in vals:
+            self.env['plm.bom.explode.cache'].mark_structure_changed(self.product_tmpl_id.ids)
+        if old_weights:
+            weight_deltas = {}
+            for product in self:
+                delta = product.weight - old_weights.get(product.id, 0.0)
+                if delta:
+                    weight_deltas[product.id] = delta
+            if weight_deltas:
+                self.env['mrp.bom'].push_weight_change(product_deltas=weight_deltas)
         ctx = self.env.context.copy()
         skip = ctx.get('skip_write_overload', False)
         if not skip:
@@ -1262,6 +1287,63 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
             break
         return (newComponentId, engineering_revision)
 
+    def _bulk_new_revision(self):
+        """
+            Same as NewRevision for many components, the templates are copied with one create,
+            the copy defaults of the plm models are applied by their copy_data
+            :return: {component id: new revision component}
+        """
+        out = {}
+        if not self:
+            return out
+        latestIds = self.env['plm.code.resolver'].resolve(self._name, [(compBrws.engineering_code, None) for compBrws in self])
+        toRevise = {compBrws.id: latestIds.get((compBrws.engineering_code, None), compBrws.id) for compBrws in self}
+        oldCompBrwsList = self.browse(list(dict.fromkeys(toRevise.values()))).sudo()
+        newCompBrwsList = {}
+        ctx = self.env.context.copy()
+        ctx['new_revision'] = True
+        values = {'engineering_state': 'undermodify',
+                  'engineering_writable': False}
+        oldCompBrwsList.write(values)
+        oldCompBrwsList.product_tmpl_id.write(values)
+        available_status = self._fields.get('engineering_state')._description_selection(self.env)
+        status_lable = dict(available_status).get('undermodify', '')
+        # one version bump for all the templates, copy_data finds them already marked
+        self.env['plm.bom.explode.cache'].mark_structure_changed(oldCompBrwsList.product_tmpl_id.ids)
+        tmplVals = []
+        tmplDefaults = []
+        for oldCompBrws in oldCompBrwsList:
+            oldCompBrws.message_post(body=_('Status moved to: %s by %s.' % (status_lable, self.env.user.name)))
+            defaults = {}
+            defaults['name'] = oldCompBrws.name          # copy function needs an explicit name value
+            defaults['engineering_code'] = oldCompBrws.engineering_code
+            defaults['engineering_revision'] = int(oldCompBrws.engineering_revision) + 1
+            defaults['engineering_writable'] = True
+            defaults['engineering_state'] = START_STATUS
+            defaults['linkeddocuments'] = []                  # Clean attached documents for new revision object
+            tmplDefaults.append(defaults)
+            tmplVals.append(oldCompBrws.product_tmpl_id.with_context(ctx, active_test=False).copy_data(defaults)[0])
+        newTmplBrwsList = self.env['product.template'].with_context(ctx).create(tmplVals)
+        newTmplBrwsList._create_variant_ids()
+        newCompIds = []
+        for oldCompBrws, newTmplBrws, defaults in zip(oldCompBrwsList, newTmplBrwsList, tmplDefaults):
+            oldCompBrws.product_tmpl_id.with_context(from_copy_translation=True).copy_translations(newTmplBrws, excluded=defaults)
+            newCompIds.append(newTmplBrws.product_variant_id.id)
+            newCompBrwsList[oldCompBrws.id] = self.browse(newTmplBrws.product_variant_id.id)
+        self.browse(newCompIds).sudo().write({'engineering_writable': True,
+                                              'engineering_state': START_STATUS,
+                                              'engineering_revision_user': self.env.uid,
+                                              'engineering_revision_date': datetime.now(),
+                                              'engineering_release_user': False,
+                                              'engineering_release_date': False,
+                                              'engineering_workflow_user': False,
+                                              'engineering_workflow_date': False})
+        for oldCompBrws in oldCompBrwsList:
+            oldCompBrws.message_post(body=_('Created : New Revision.'))
+        for compId, latestId in toRevise.items():
+            out[compId] = newCompBrwsList[latestId]
+        return out
+
     @api.model
     def wf_message_post_client(self, args):
         """
@@ -1411,137 +1493,142 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
 
     @api.model
     def reviseCompAndDoc(self, elementsToClone):
+        """
+            The whole structure is planned first, then the new revisions, the relations
+            and the check-outs are made in batch
+        """
         docEnv = self.env['ir.attachment']
+        resolver = self.env['plm.code.resolver']
         updatedJsonNode = elementsToClone[0]
         updatedNode = json.loads(updatedJsonNode)
         hostName, hostPws = elementsToClone[1], elementsToClone[2]
         _oldRootCompVals, _oldRootDocVals = elementsToClone[3]
+        plan = []
 
-        def updateDocAttrs(node, datasName):
-            node['DOCUMENT_ATTRIBUTES']['OLD_FILE_NAME'] = datasName
-            node['DOCUMENT_ATTRIBUTES']['CHECK_OUT_BY_ME'] = True
-
-        def cleanRootUnCheckedComponent(compBrws, node):
-            # User made and edit parts in the client but he unchecked the component in the interface
-            # So I need to delete it, restore previous revision and revise only the document
-            compBrws.unlink()
-            return restorePreviousComponentRevision(node)
-
-        def cleanRootUnCheckedDocument(docBrws, node):
-            # User made and edit document in the client but he unchecked the component in the interface
-            # So I need to delete it and restore previous revision
-            docBrws.unlink()
-            return restorePreviousDocumentRevision(node)
-
-        def restorePreviousDocumentRevision(node):
-            node['DOCUMENT_ATTRIBUTES']['engineering_revision'] = node['DOCUMENT_ATTRIBUTES']['engineering_revision'] - 1
-            return docEnv.getDocumentBrws(node['DOCUMENT_ATTRIBUTES'])  # Try to restore previous revision (case of only document revision)
-
-        def restorePreviousComponentRevision(node):
-            node['PRODUCT_ATTRIBUTES']['engineering_revision'] = node['PRODUCT_ATTRIBUTES']['engineering_revision'] - 1
-            return self.getCompBrws(node['PRODUCT_ATTRIBUTES'])  # Try to restore previous revision (case of only document revision)
-
-        def updateCompDescModify(newCompBrwse, node):
-            newCompBrwse.desc_modify = node['PRODUCT_ATTRIBUTES'].get('desc_modify', '')
-
-        def updateDocDescModify(newDocBrws, node):
-            newDocBrws.desc_modify = node['DOCUMENT_ATTRIBUTES'].get('desc_modify', '')
-
-        def updateDocNodeByBrws(node, newDocBrws):
-            node['DOCUMENT_ATTRIBUTES'].update(newDocBrws.getDocumentInfos())
-
-        def updateCompNodeByBrws(node, newCompBrwse):
-            node['PRODUCT_ATTRIBUTES'].update(newCompBrwse.getComponentInfos())
-
-        def updateRootDocument(docBrws, node):
-            if docBrws:
-                newDocBrws = docBrws
-                updateDocAttrs(node, docBrws.name)
-                docBrws.checkout(hostName, hostPws)
-                newDocBrws.desc_modify = node['DOCUMENT_ATTRIBUTES'].get('desc_modify', '')
-                return newDocBrws
-            return False
-
-        def reviseCompObj(compBrws, node):
-            # Raw component because BOM is not managed
-            newCompId, _newCompRev = compBrws.NewRevision()
-            newCompBrwse = self.browse(newCompId)
-            updateCompDescModify(newCompBrwse, node)
-            updateCompNodeByBrws(node, newCompBrwse)
-            return newCompBrwse
-
-        def reviseDocObj(docBrws, node):
-            newDocId, _newDocIndex = docBrws.NewRevision()
-            newDocBrws = docEnv.browse(newDocId)
-            updateDocDescModify(newDocBrws, node)
-            updateDocNodeByBrws(node, newDocBrws)
-            updateDocAttrs(node, docBrws.name)
-            newDocBrws.checkout(hostName, hostPws)
-            return newDocBrws
-
-        def reviseComp(node, isRoot, compBrws, docBrws, reviseDocument, reviseComponent):
-            newCompBrwse = False
-            newDocBrws = False
-            deleted = False
-            if not reviseComponent:
-                if compBrws and isRoot:
-                    compBrws = cleanRootUnCheckedComponent(compBrws, node)
-                else:
-                    compBrws = restorePreviousComponentRevision(node)
-                deleted = True
-            if not deleted:
-                if isRoot:
-                    newCompBrwse = compBrws
-                    updateCompDescModify(newCompBrwse, node)
-                else:
-                    newCompBrwse = reviseCompObj(compBrws, node)
-            if reviseDocument:
-                newDocBrws = reviseDocObj(docBrws, node)
-            return newCompBrwse, newDocBrws
-
-        def reviseDoc(node, reviseDocument, docBrws, isRoot):
-            newDocBrws = False
-            if not reviseDocument:
-                if docBrws and isRoot:
-                    cleanRootUnCheckedDocument(docBrws, node)
-                else:
-                    restorePreviousDocumentRevision(node)
+        def getCompKey(compProps):
+            compId = compProps.get('_id', None)
+            if compId:
+                return compId
+            engCode = compProps.get('engineering_code', '')
+            engRev = compProps.get('engineering_revision', None)
+            if not engCode or engRev is None:
                 return False
-            if isRoot:
-                newDocBrws = updateRootDocument(docBrws, node)
-            else:
-                newDocBrws = reviseDocObj(docBrws, node)
-            return newDocBrws
+            return (engCode, int(engRev))
 
-        def setupRelations(newDocBrws, newCompBrwse):
-            if newDocBrws:
-                newDocBrws.write({'linkedcomponents': [(5, 0, 0)]})  # Clean copied links
-                if newCompBrwse:
-                    newCompBrwse.write({'linkeddocuments': [(4, newDocBrws.id, False)]})  # Add link to component
+        def getDocKey(docProps):
+            docId = docProps.get('_id', None)
+            if docId:
+                return docId
+            docCode = docProps.get('engineering_code', '')
+            docRev = docProps.get('engineering_revision', None)
+            if not docCode or docRev is None or docRev is False:
+                return False
+            return resolver._normalize_key(docCode, docRev)
 
-        def nodeResursionUpdate(node, isRoot=False):
-            newDocBrws = False
-            newCompBrwse = False
-            reviseComponent = node.get('COMPONENT_CHECKED', False)
-            reviseDocument = node.get('DOCUMENT_CHECKED', False)
+        def planNode(node, isRoot=False):
             compProps = node.get('PRODUCT_ATTRIBUTES', {})
             docProps = node.get('DOCUMENT_ATTRIBUTES', {})
-            engCode = compProps.get('engineering_code', '')
-            docName = docProps.get('name', '')
-            docId = docProps.get('_id', None)
-            docBrws = self.getDocBrws(docId, docProps)
-            compBrws = self.getCompBrws(compProps)
-            if engCode:
-                newCompBrwse, newDocBrws = reviseComp(node, isRoot, compBrws, docBrws, reviseDocument, reviseComponent)
-            elif docName:
-                newDocBrws = reviseDoc(node, reviseDocument, docBrws, isRoot)
-            setupRelations(newDocBrws, newCompBrwse)
+            plan.append({'node': node,
+                         'isRoot': isRoot,
+                         'engCode': compProps.get('engineering_code', ''),
+                         'docName': docProps.get('name', ''),
+                         'reviseComponent': node.get('COMPONENT_CHECKED', False),
+                         'reviseDocument': node.get('DOCUMENT_CHECKED', False),
+                         'compKey': getCompKey(compProps),
+                         'docKey': getDocKey(docProps)})
             for childNode in node.get('RELATIONS', []):
                 if childNode.get('DOCUMENT_ATTRIBUTES', {}).get('DOC_TYPE').upper() == '2D':
                     childNode['PRODUCT_ATTRIBUTES'] = {'engineering_code': ''}    # Setup the correct parent component
-                nodeResursionUpdate(childNode)
-
-        nodeResursionUpdate(updatedNode, True)
+                planNode(childNode)
+
+        def getBrwsMap(model, keys):
+            out = {key: key for key in keys if isinstance(key, int)}
+            out.update(resolver.resolve(model._name, [key for key in keys if isinstance(key, tuple)]))
+            return {key: model.browse(out.get(key, [])) for key in keys}
+
+        planNode(updatedNode, True)
+        compMap = getBrwsMap(self, set(step['compKey'] for step in plan if step['engCode'] and step['compKey']))
+        docMap = getBrwsMap(docEnv, set(step['docKey'] for step in plan if step['docKey']))
+        for step in plan:
+            step['compBrws'] = compMap.get(step['compKey'], self.browse())
+            step['docBrws'] = docMap.get(step['docKey'], docEnv.browse())
+            step['newCompBrws'] = False
+            step['newDocBrws'] = False
+
+        # User made and edit parts or documents in the client but he unchecked them in the interface
+        # So I need to delete the root ones, restore previous revision and revise only the others
+        toUnlinkComps = self.browse()
+        toUnlinkDocs = docEnv.browse()
+        toReviseComps = self.browse()
+        toReviseDocs = docEnv.browse()
+        for step in plan:
+            node = step['node']
+            if step['engCode']:
+                if not step['reviseComponent']:
+                    if step['isRoot']:
+                        toUnlinkComps |= step['compBrws']
+                    node['PRODUCT_ATTRIBUTES']['engineering_revision'] = node['PRODUCT_ATTRIBUTES']['engineering_revision'] - 1
+                elif not step['isRoot']:
+                    toReviseComps |= step['compBrws']
+                if step['reviseDocument']:
+                    toReviseDocs |= step['docBrws']
+            elif step['docName']:
+                if not step['reviseDocument']:
+                    if step['isRoot']:
+                        toUnlinkDocs |= step['docBrws']
+                    node['DOCUMENT_ATTRIBUTES']['engineering_revision'] = node['DOCUMENT_ATTRIBUTES']['engineering_revision'] - 1
+                elif not step['isRoot']:
+                    toReviseDocs |= step['docBrws']
+        toUnlinkComps.unlink()
+        toUnlinkDocs.unlink()
+        newComps = toReviseComps._bulk_new_revision()
+        newDocs = toReviseDocs._bulk_new_revision()
+
+        descModify = {}
+        toCheckOut = docEnv.browse()
+        for step in plan:
+            node = step['node']
+            if step['engCode']:
+                if step['reviseComponent']:
+                    if step['isRoot']:
+                        step['newCompBrws'] = step['compBrws']
+                    else:
+                        step['newCompBrws'] = newComps.get(step['compBrws'].id, self.browse())
+                    descModify.setdefault((self._name, node['PRODUCT_ATTRIBUTES'].get('desc_modify', '')), []).extend(step['newCompBrws'].ids)
+                if step['reviseDocument']:
+                    step['newDocBrws'] = newDocs.get(step['docBrws'].id, docEnv.browse())
+            elif step['docName'] and step['reviseDocument']:
+                if not step['isRoot']:
+                    step['newDocBrws'] = newDocs.get(step['docBrws'].id, docEnv.browse())
+                elif step['docBrws']:
+                    step['newDocBrws'] = step['docBrws']
+            if step['newDocBrws'] is not False:
+                descModify.setdefault((docEnv._name, node['DOCUMENT_ATTRIBUTES'].get('desc_modify', '')), []).extend(step['newDocBrws'].ids)
+                toCheckOut |= step['newDocBrws']
+        for (modelName, descModifyValue), objIds in descModify.items():
+            self.env[modelName].browse(objIds).write({'desc_modify': descModifyValue})
+
+        linkedDocuments = {}
+        for step in plan:
+            node = step['node']
+            newCompBrws, newDocBrws = step['newCompBrws'], step['newDocBrws']
+            if newCompBrws is not False and not step['isRoot']:
+                node['PRODUCT_ATTRIBUTES'].update(newCompBrws.getComponentInfos())
+            if newDocBrws is not False:
+                if not (step['isRoot'] and not step['engCode']):
+                    node['DOCUMENT_ATTRIBUTES'].update(newDocBrws.getDocumentInfos())
+                node['DOCUMENT_ATTRIBUTES']['OLD_FILE_NAME'] = step['docBrws'].name
+                node['DOCUMENT_ATTRIBUTES']['CHECK_OUT_BY_ME'] = True
+                if newCompBrws:
+                    linkedDocuments.setdefault(newCompBrws, []).extend(newDocBrws.ids)
+        toCheckOut.write({'linkedcomponents': [(5, 0, 0)]})  # Clean copied links
+        for newCompBrws, docIds in linkedDocuments.items():
+            newCompBrws.write({'linkeddocuments': [(4, docId, False) for docId in docIds]})  # Add link to component
+
+        rootStep = plan[0]
+        _checkedOut, errors = toCheckOut._bulk_check_out(hostName, hostPws, rootStep['newDocBrws'] or False)
+        if errors:
+            raise UserError('\n'.join(errors.values()))
         return json.dumps(updatedNode)
 
     def getDocBrws(self, docId, docProps):
@@ -1571,6 +1658,9 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
         _oldRootCompVals, oldRootDocVals = elementsToClone[3]
         newRootCompProps = updatedNode.get('PRODUCT_ATTRIBUTES')
         newRootDocProps = updatedNode.get('DOCUMENT_ATTRIBUTES')
+        toCheckOut = []
+        newDocIds = []
+        linkedDocuments = {}
 
         def cleanRootDocument(oldDocBrws, node):
             oldDocBrws.unlink()
@@ -1602,7 +1692,7 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
             if oldDocBrws.id:
                 _filename, file_extension = os.path.splitext(oldDocBrws.name)
                 newDocBrws = self.getNewDoc(oldDocBrws, engCode, file_extension)
-                newDocBrws.checkout(hostName, hostPws)
+                toCheckOut.append(newDocBrws.id)
                 node['DOCUMENT_ATTRIBUTES'] = newDocBrws.getDocumentInfos()
                 node['DOCUMENT_ATTRIBUTES']['OLD_FILE_NAME'] = oldDocBrws.name
                 node['DOCUMENT_ATTRIBUTES']['CHECK_OUT_BY_ME'] = oldDocBrws._is_checkedout_for_me()
@@ -1617,7 +1707,7 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
             node['DOCUMENT_ATTRIBUTES']['name'] = clonedDocBrws.name
             node['DOCUMENT_ATTRIBUTES']['CHECK_OUT_BY_ME'] = True
             node['DOCUMENT_ATTRIBUTES']['OLD_FILE_NAME'] = rootOldDocBrws.name
-            clonedDocBrws.checkout(hostName, hostPws)
+            toCheckOut.append(clonedDocBrws.id)
             return clonedDocBrws
 
         def cloneWithComp(cloneComponent, cloneDocument, rootEngCode, oldDocBrws, compBrws, node, isRoot=False):
@@ -1653,9 +1743,9 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
 
         def cleanAndSetupRelations(newDocBrws, compBrws):
             if newDocBrws:
-                newDocBrws.write({'linkedcomponents': [(5, 0, 0)]})  # Clean copied links
+                newDocIds.append(newDocBrws.id)
                 if compBrws:
-                    compBrws.write({'linkeddocuments': [(4, newDocBrws.id, False)]})  # Add link to component
+                    linkedDocuments.setdefault(compBrws, []).append(newDocBrws.id)
 
         def nodeResursionUpdate(node, isRoot=False):
             cloneDocument = node.get('DOCUMENT_CHECKED', False)
@@ -1693,6 +1783,13 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
                 nodeResursionUpdate(childNode)
 
         nodeResursionUpdate(updatedNode, True)
+        docEnv.browse(newDocIds).write({'linkedcomponents': [(5, 0, 0)]})  # Clean copied links
+        for compBrws, docIds in linkedDocuments.items():
+            compBrws.write({'linkeddocuments': [(4, docId, False) for docId in docIds]})  # Add link to component
+        toCheckOutBrws = docEnv.browse(list(dict.fromkeys(toCheckOut)))
+        _checkedOut, errors = toCheckOutBrws._bulk_check_out(hostName, hostPws, toCheckOutBrws[:1])
+        if errors:
+            raise UserError('\n'.join(errors.values()))
         return json.dumps(updatedNode)
 
     def getNewDoc(self, oldDocBrws, startingComputeName, file_extension):
@@ -1807,9 +1904,13 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
     def _name_search(self, name, args=None, operator='ilike', limit=100, name_get_uid=None):
         if not args:
             args = []
+        # engineering code matches first, the standard name search fills up to the limit
         product_ids = list(self._search([('engineering_code', operator, name)] + args, limit=limit, access_rights_uid=name_get_uid))
-        product_ids += list(super(ProductProduct, self)._name_search(name, args, operator, limit, name_get_uid))
-        return list(set(product_ids))
+        if not limit or len(product_ids) < limit:
+            other_args = args + [('id', 'not in', product_ids)] if product_ids else args
+            other_limit = limit - len(product_ids) if limit else limit
+            product_ids += list(super(ProductProduct, self)._name_search(name, other_args, operator, other_limit, name_get_uid))
+        return product_ids
     
     @api.model
     def getExpodedBom(self, ids):
@@ -1847,20 +1948,54 @@ Please try to contact OmniaSolutions to solve this error, or install Plm Sale Fi
         #
         # ({},[({}, []),]
         #
-        product_computed = []
-        def computeChildLevel(product_tmpl_id):
+        # the cache keeps only the ids of the structure of each root,
+        # the names are read at every call
+        def computeChildIds(product_tmpl_id, mrp_bom_id, product_computed):
             children = []
             if product_tmpl_id.id not in product_computed:
-                product_computed.append(product_tmpl_id.id)
-                mrp_bom_id = mrp_bom._get_bom(product_tmpl_id.id)
+                product_computed.add(product_tmpl_id.id)
+                if mrp_bom_id is None:
+                    mrp_bom_id = mrp_bom._get_bom(product_tmpl_id.id)
                 for mrp_bom_line_id in mrp_bom_id.bom_line_ids:
-                    children.append((getDictData(mrp_bom_line_id),
-                                     computeChildLevel(mrp_bom_line_id.product_id.product_tmpl_id)))
-            return children 
-        #   
+                    child_tmpl_id = mrp_bom_line_id.product_id.product_tmpl_id
+                    children.append((mrp_bom_line_id.id,
+                                     child_tmpl_id.id,
+                                     computeChildIds(child_tmpl_id, None, product_computed)))
+            return children
+        #
+        product_computed = set()
+        def computeChildLevel(product_tmpl_id, children_ids):
+            # a product already exploded by a previous root or branch is not exploded again
+            children = []
+            if product_tmpl_id not in product_computed:
+                product_computed.add(product_tmpl_id)
+                for line_id, child_tmpl_id, child_ids in children_ids:
+                    children.append((getDictData(bom_lines[line_id]),
+                                     computeChildLevel(child_tmpl_id, child_ids)))
+            return children
+        #
+        def collectLineIds(children_ids, line_ids):
+            for line_id, _child_tmpl_id, child_ids in children_ids:
+                line_ids.append(line_id)
+                collectLineIds(child_ids, line_ids)
+            return line_ids
+        #
+        explode_cache = self.env['plm.bom.explode.cache']
+        roots = []
         for product_id in self.browse(ids):
             product_tmpl_id = product_id.product_tmpl_id
-            out.append((getProductData(product_tmpl_id), computeChildLevel(product_tmpl_id)))
+            mrp_bom_id = mrp_bom._get_bom(product_tmpl_id.id)
+            children_ids = explode_cache.get_explosion(mrp_bom_id,
+                                                       'client_ids',
+                                                       False,
+                                                       lambda: computeChildIds(product_tmpl_id, mrp_bom_id, set()))
+            roots.append((product_tmpl_id, children_ids))
+        all_line_ids = []
+        for _product_tmpl_id, children_ids in roots:
+            collectLineIds(children_ids, all_line_ids)
+        bom_lines = {line_id.id: line_id for line_id in self.env['mrp.bom.line'].browse(all_line_ids)}
+        for product_tmpl_id, children_ids in roots:
+            out.append((getProductData(product_tmpl_id), computeChildLevel(product_tmpl_id.id, children_ids)))
         #
         return (header, out)
     
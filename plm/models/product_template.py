@@ -31,6 +31,8 @@ from odoo import fields
 from odoo import api
 from odoo import _
 from odoo.exceptions import UserError
+from odoo.addons.plm.models.utils import init_plm_indexes
+from odoo.addons.plm.models.utils import init_plm_trigram_indexes
 
 class ProductTemplate(models.Model):
     _name='product.template'
@@ -111,12 +113,12 @@ class ProductTemplate(models.Model):
         
     def _getlastrev(self):
         result = []
+        latest_ids = self.get_latest_ids_by_code(self.mapped('engineering_code'))
         for product_template_id in self:
-            product_template_ids = self.search([('engineering_code', '=', product_template_id.engineering_code)], order='engineering_revision DESC')
-            for prod in product_template_ids:
-                result.append(prod.id)
-                break
-            if not product_template_ids:
+            latest_id = latest_ids.get(product_template_id.engineering_code)
+            if latest_id:
+                result.append(latest_id)
+            else:
                 logging.warning('[_getlastrev] No Product are found for object with engineering_code: "%s"' % (product_template_id.engineering_code))
         return list(set(result))  
         
@@ -183,27 +185,27 @@ class ProductTemplate(models.Model):
         vals = self.plm_sanitize(vals)
         return super(ProductTemplate, self).write(vals)
 
+    def copy_data(self, default=None):
+        if default and 'engineering_revision' in default:
+            self.env['plm.bom.explode.cache'].mark_structure_changed(self.ids)
+        return super(ProductTemplate, self).copy_data(default)
+
     @api.model
     def init(self):
-        cr = self.env.cr
-        cr.execute("""
-        -- Index: product_template_engcode_index
-        -- Index: product_template_engcode_index
-        DROP INDEX IF EXISTS product_template_engcode_index;
-        CREATE INDEX product_template_engcode_index
-          ON product_template
-          USING btree
-          (engineering_code);
-        """)
-
-        cr.execute("""
-        -- Index: product_template_engcoderev_index
-        DROP INDEX IF EXISTS product_template_engcoderev_index;
-        CREATE INDEX product_template_engcoderev_index
-          ON product_template
-          USING btree
-          (engineering_code, engineering_revision);
-        """)
+        # the (engineering_code, engineering_revision) index already serves the code lookups
+        self.env.cr.execute("DROP INDEX IF EXISTS product_template_engcode_index")
+        init_plm_indexes(self.env.cr, self._table)
+        init_plm_trigram_indexes(self.env.cr, self._table)
+        self._init_latest_revision()
+
+    def _update_latest_revision(self, engineering_codes=None):
+        super(ProductTemplate, self)._update_latest_revision(engineering_codes)
+        if engineering_codes:
+            # the latest revision explosions follow the new latest flags
+            self.env.cr.execute("SELECT id FROM product_template WHERE engineering_code IN %s",
+                                (tuple(set(engineering_codes)),))
+            self.env['plm.bom.explode.cache'].mark_structure_changed([row[0] for row in self.env.cr.fetchall()])
+        self.env['product.product'].invalidate_model(['engineering_is_latest'])
 
     def getSequenceFrom(self, prefix, digit, start_number= 0):
         plm_prefix = "PLM_SEQUENCE_%s" % prefix
@@ -24,6 +24,12 @@ Created on 30 Mar 2023
 @author: mboscolo
 '''
 import base64
+import logging
+import psycopg2
+from odoo.tools.sql import create_index
+from odoo.modules.db import has_trigram
+
+_logger = logging.getLogger(__name__)
 
 CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 L_CHARS =len(CHARS)
@@ -210,3 +216,56 @@ NSAwMDAwMCBuIAowMDAwMDA4NTAyIDAwMDAwIG4gCnRyYWlsZXIKPDwvU2l6ZSAxNC9Sb290IDEy
 IDAgUgovSW5mbyAxMyAwIFIKL0lEIFsgPEMzRDZBMzFBMTcxNkU1QjAyMjkxN0Y4QzkxQUM1MDk3
 Pgo8QzNENkEzMUExNzE2RTVCMDIyOTE3RjhDOTFBQzUwOTc+IF0KL0RvY0NoZWNrc3VtIC8wQjMy
 RjYxNzJGNDFCNzYwNjRBM0NDQjFEMTgxOTFCQgo+PgpzdGFydHhyZWYKODc0NwolJUVPRgo=""")
+
+
+#
+# composite indexes of the PLM hot queries, created by the init of each model
+# {table: [(index name, [expressions])]}
+#
+PLM_INDEXES = {
+    'ir_attachment_relation': [('ir_attachment_relation_parent_kind_index', ['parent_id', 'link_kind']),
+                               ('ir_attachment_relation_child_kind_index', ['child_id', 'link_kind'])],
+    'plm_cad_open': [('plm_cad_open_document_user_index', ['document_id', 'userid', 'create_date DESC']),
+                     ('plm_cad_open_document_operation_index', ['document_id', 'operation_type', 'create_date DESC'])],
+    'mrp_bom': [('mrp_bom_product_source_type_index', ['product_tmpl_id', 'source_id', 'type'])],
+    'mrp_bom_line': [('mrp_bom_line_product_source_index', ['product_id', 'source_id'])],
+    'product_template': [('product_template_engcoderev_index', ['engineering_code', 'engineering_revision'])],
+}
+
+
+def init_plm_indexes(cr, table_name):
+    """
+    Create the missing PLM indexes of the table, the existing ones are kept
+    """
+    for index_name, expressions in PLM_INDEXES.get(table_name, []):
+        create_index(cr, index_name, table_name, expressions)
+
+
+#
+# GIN trigram indexes serving the ilike searches of the CAD client autocomplete
+# {table: [(index name, indexed expression)]}
+#
+PLM_TRIGRAM_INDEXES = {
+    'product_template': [('product_template_engcode_trgm_index', 'engineering_code'),
+                         ('product_template_name_trgm_index', "(jsonb_path_query_array(name, '$.*')::text)")],
+    'ir_attachment': [('ir_attachment_engcode_trgm_index', 'engineering_code'),
+                      ('ir_attachment_name_trgm_index', 'name')],
+}
+
+
+def init_plm_trigram_indexes(cr, table_name):
+    """
+    Create the missing trigram indexes of the table, pg_trgm is installed when possible
+    :return: True if the indexes are available
+    """
+    if not has_trigram(cr):
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error as ex:
+            _logger.warning("Unable to install pg_trgm, ilike searches on %s stay sequential: %s", table_name, ex)
+            return False
+    for index_name, expression in PLM_TRIGRAM_INDEXES.get(table_name, []):
+        create_index(cr, index_name, table_name, ['%s gin_trgm_ops' % expression], method='gin')
+    return True
+
@@ -1,11 +1,25 @@
 import os
+import sys
+import time
 import base64
+import shutil
+import hashlib
+import tempfile
+import subprocess
 from io import BytesIO
 import logging
 from reportlab.pdfgen import canvas
 from PyPDF2 import PdfFileWriter, PdfFileReader
+from PyPDF2.generic import ArrayObject
+from PyPDF2.generic import DictionaryObject
+from PyPDF2.generic import IndirectObject
+from PyPDF2.generic import NameObject
+from PyPDF2.generic import NumberObject
 from datetime import datetime
 from dateutil import tz
+from odoo.tools import config
+from .pdf_classifier import paperFormat
+from .pdf_classifier import classifyPdfFile
 
 
 def isPdf(fileName):
@@ -26,6 +40,14 @@ def getBottomMessage(user, context):
     return "Printed by %r : %r " % (user.name, localDT.ctime())
 
 
+SPOOL_CHUNK_SIZE = 64 * 1024
+SPOOL_BATCH_PAGES = 500
+SPOOL_MAX_OPEN_FILES = 200
+STAMP_CACHE_VERSION = 2
+PARALLEL_CLASSIFY_MIN_FILES = 20
+CLASSIFIER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf_classifier.py')
+
+
 def getDocumentStream(docRepository, objDoc):
     """
         Gets the stream of a file
@@ -35,26 +57,171 @@ def getDocumentStream(docRepository, objDoc):
         if (not objDoc.store_fname) and (objDoc.db_datas):
             content = base64.b64decode(objDoc.db_datas)
         else:
-            content = file(os.path.join(docRepository, objDoc.store_fname), 'rb').read()
+            with open(os.path.join(docRepository, objDoc.store_fname), 'rb') as f:
+                content = f.read()
     except Exception as ex:
         logging.error("getFileStream : Exception (%s)reading  stream on file : %s." % (str(ex), objDoc.name))
     return content
 
 
+def spoolDocument(docRepository, objDoc, spoolDir):
+    """
+        Copy the printout (or the pdf file) of the document in the spool directory without loading it in memory
+        return the spooled file path or False
+    """
+    filePath = os.path.join(spoolDir, '%s.pdf' % objDoc.id)
+    try:
+        for printoutBrws in objDoc.env['ir.attachment'].sudo().search([('res_model', '=', objDoc._name),
+                                                                        ('res_field', '=', 'printout'),
+                                                                        ('res_id', '=', objDoc.id)], limit=1):
+            if printoutBrws.store_fname:
+                shutil.copyfile(printoutBrws._full_path(printoutBrws.store_fname), filePath)
+                return filePath
+            if printoutBrws.db_datas:
+                with open(filePath, 'wb') as f:
+                    f.write(printoutBrws.db_datas)
+                return filePath
+        if isPdf(objDoc.name):
+            if objDoc.store_fname:
+                shutil.copyfile(os.path.join(docRepository, objDoc.store_fname), filePath)
+                return filePath
+            value = getDocumentStream(docRepository, objDoc)
+            if value:
+                with open(filePath, 'wb') as f:
+                    f.write(value)
+                return filePath
+    except Exception as ex:
+        logging.error("spoolDocument : Exception (%s) spooling file : %s." % (str(ex), objDoc.name))
+    return False
+
+
+def getPrintoutChecksum(objDoc):
+    """
+        Checksum of the printout (or of the pdf file) of the document
+    """
+    for printoutData in objDoc.env['ir.attachment'].sudo().search_read([('res_model', '=', objDoc._name),
+                                                                         ('res_field', '=', 'printout'),
+                                                                         ('res_id', '=', objDoc.id)],
+                                                                        ['checksum'], limit=1):
+        return printoutData['checksum']
+    if isPdf(objDoc.name):
+        return objDoc.checksum
+    return False
+
+
+def getStampCacheDir(env):
+    return os.path.join(config['data_dir'], 'plm_stamp_cache', env.cr.dbname)
+
+
+def cleanStampCache(cacheDir, maxAgeDays=30):
+    """
+        Remove the stamped printouts not used in the last maxAgeDays
+    """
+    if not os.path.isdir(cacheDir):
+        return 0
+    removed = 0
+    limit = time.time() - maxAgeDays * 86400
+    for fileName in os.listdir(cacheDir):
+        filePath = os.path.join(cacheDir, fileName)
+        try:
+            if os.path.getmtime(filePath) < limit:
+                os.remove(filePath)
+                removed += 1
+        except OSError as ex:
+            logging.warning("cleanStampCache : unable to remove %s: %s" % (filePath, ex))
+    return removed
+
+
+def classifyPdfFilesInProcess(filePaths, processes):
+    """
+        Classify the pdf files in a bounded set of fresh python interpreters running pdf_classifier,
+        the odoo worker is not forked, every interpreter reads its own share of the spooled file paths
+        return {filePath: paper}
+    """
+    spoolDir = tempfile.mkdtemp(prefix='plm_classify_')
+    try:
+        running = []
+        chunkSize = -(-len(filePaths) // processes)
+        for index in range(0, len(filePaths), chunkSize):
+            listPath = os.path.join(spoolDir, 'files_%s.txt' % index)
+            with open(listPath, 'w', encoding='utf-8') as listFile:
+                listFile.write(''.join('%s\n' % filePath for filePath in filePaths[index:index + chunkSize]))
+            running.append(subprocess.Popen([sys.executable, CLASSIFIER_SCRIPT, listPath],
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL,
+                                            env=dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))))
+        papers = {}
+        failed = False
+        for process in running:
+            output, _err = process.communicate()
+            if process.returncode:
+                failed = True
+                continue
+            for line in output.decode('utf-8').splitlines():
+                paper, filePath = line.split('\t', 1)
+                papers[filePath] = None if paper == 'None' else int(paper)
+        if failed:
+            logging.warning('Pdf classification process failed, going on in the odoo worker')
+        return papers
+    finally:
+        shutil.rmtree(spoolDir, ignore_errors=True)
+
+
+def classifyPdfFiles(filePaths, processes=None):
+    """
+        Classify the pdf files by paper format, only the first page of every file is parsed
+        big books are classified by up to processes pdf_classifier interpreters
+        return {filePath: paper}
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(filePaths) // PARALLEL_CLASSIFY_MIN_FILES)
+    papers = {}
+    if processes > 1:
+        try:
+            papers = classifyPdfFilesInProcess(filePaths, processes)
+        except Exception as ex:
+            logging.warning('Parallel pdf classification failed, going on sequentially: %r' % ex)
+    for filePath in filePaths:
+        if filePath not in papers:
+            papers[filePath] = classifyPdfFile(filePath)[1]
+    return papers
+
+
+def streamFile(filePath, remove=True):
+    """
+        Yield the file content in chunks, the file is removed at the end
+    """
+    try:
+        with open(filePath, 'rb') as f:
+            chunk = f.read(SPOOL_CHUNK_SIZE)
+            while chunk:
+                yield chunk
+                chunk = f.read(SPOOL_CHUNK_SIZE)
+    finally:
+        if remove and os.path.exists(filePath):
+            os.remove(filePath)
+
+
 class BookCollector(object):
-    def __init__(self, jumpFirst=True, customText=False, bottomHeight=20, poolObj=None):
+    def __init__(self, jumpFirst=True, customText=False, bottomHeight=20, poolObj=None, staticText=False):
         """
             jumpFirst = (True/False)
                 jump to add number at the first page
             customText=(True/False,message) / False
                 Add page number -> True/False, Custom Message)
+            staticText=(message, message values) / False
+                document dependent message printed above the custom text,
+                the pages stamped with it are cached and reused by the next prints of the same printout
         """
         self.jumpFirst = jumpFirst
         self.collector = PdfFileWriter()
         self.customText = customText
+        self.staticText = staticText
         self.pageCount = 1
         self.bottomHeight = bottomHeight
         self.poolObj = poolObj
+        self.openedFiles = []
 
     def evalDictVals(self, dict_vals, doc_obj, page_count, user_id):
         out = {}
@@ -70,46 +237,159 @@ class BookCollector(object):
                 logging.error('Cannot eval attribute %r for report due to error %r' % (val, ex))
             out[key] = val or ''
         return out
-            
-    def getNextPageNumber(self, mediaBox, docObject):
 
-        def computeFont(x1, y1):
-            computedX1 = float(x1)/2.834
-            if y1 > x1:
-                doc_orientation = 'vertical'
-                #vertical
-                if computedX1 <= 298:
-                    self.bottomHeight = 6
-                    return 6, doc_orientation
-                return 10, doc_orientation
-            else:
-                doc_orientation = 'horizontal'
-                #horizontal
-                if computedX1 <= 421:
-                    self.bottomHeight = 6
-                    return 6, doc_orientation
-                return 10, doc_orientation
+    def getFooterLayout(self, mediaBox):
+        """
+            (font size, bottom height, orientation) of the footer of the page
+        """
+        _x, _y, x1, y1 = mediaBox
+        computedX1 = float(x1)/2.834
+        if y1 > x1:
+            doc_orientation = 'vertical'
+            small = computedX1 <= 298
+        else:
+            doc_orientation = 'horizontal'
+            small = computedX1 <= 421
+        if small:
+            return 6, 6, doc_orientation
+        return 10, self.bottomHeight, doc_orientation
 
+    def getNextPageNumber(self, mediaBox, docObject):
         pagetNumberBuffer = BytesIO()
         c = canvas.Canvas(pagetNumberBuffer)
-        x, _y, x1, y1 = mediaBox
-        fontSize, doc_orientation = computeFont(x1, y1)
+        x, _y, x1, _y1 = mediaBox
+        fontSize, bottomHeight, doc_orientation = self.getFooterLayout(mediaBox)
         c.setFont("Helvetica", fontSize)
         if isinstance(self.customText, tuple):
             msg, msg_vals = self.customText
             msg_vals = self.evalDictVals(msg_vals, docObject, self.pageCount, self.poolObj.user)
             end_msg = msg % msg_vals
             cha = len(end_msg)
-            c.drawRightString(float(x1) - cha, self.bottomHeight, " Page: %r" % self.pageCount)
-            c.drawString(float(x) + 20, self.bottomHeight, end_msg)
+            c.drawRightString(float(x1) - cha, bottomHeight, " Page: %r" % self.pageCount)
+            c.drawString(float(x) + 20, bottomHeight, end_msg)
         else:
-            c.drawRightString(float(x1) - 50, self.bottomHeight, "Page: %r" % self.pageCount)
+            c.drawRightString(float(x1) - 50, bottomHeight, "Page: %r" % self.pageCount)
         self.pageCount += 1
         return pagetNumberBuffer, c, doc_orientation
 
+    def hasStaticStamp(self):
+        return self.poolObj is not None and hasattr(self.poolObj['ir.attachment'], 'advancedPlmReportEngine')
+
+    def getStaticText(self, docObject):
+        if not isinstance(self.staticText, tuple):
+            return ''
+        msg, msg_vals = self.staticText
+        return msg % self.evalDictVals(msg_vals, docObject, self.pageCount, self.poolObj.user)
+
+    def getStampKey(self, docObject, staticText):
+        """
+            key of the statically stamped printout (printout checksum, stamp template, stamped text)
+        """
+        checksum = getPrintoutChecksum(docObject)
+        if not checksum:
+            return False
+        template = self.staticText[0] if isinstance(self.staticText, tuple) else ''
+        keyVals = (STAMP_CACHE_VERSION, checksum, template, staticText, self.bottomHeight, self.hasStaticStamp())
+        return hashlib.sha1(repr(keyVals).encode('utf-8')).hexdigest()
+
+    def stampStaticPage(self, page, docObject, staticText):
+        """
+            merge in the page the document dependent stamp, the static text and the advancedPlmReportEngine overlay
+            return False if the report engine failed on the page
+        """
+        staticBuffer = BytesIO()
+        x, _y, x1, y1 = page.mediaBox
+        c = canvas.Canvas(staticBuffer, pagesize=(float(x1), float(y1)))
+        fontSize, bottomHeight, doc_orientation = self.getFooterLayout(page.mediaBox)
+        if staticText:
+            c.setFont("Helvetica", fontSize)
+            c.drawString(float(x) + 20, bottomHeight + fontSize + 2, staticText)
+        engineDone = True
+        if self.hasStaticStamp():
+            try:
+                _orientation, paper = paperFormat(page.mediaBox)
+                self.poolObj['ir.attachment'].advancedPlmReportEngine(document=docObject,
+                                                                      canvas=c,
+                                                                      page_orientation=doc_orientation,
+                                                                      paper=paper,
+                                                                      page_obj=page)
+            except Exception as ex:
+                logging.warning(ex)
+                logging.warning('advancedPlmReportEngine failed on document %r' % docObject.name)
+                engineDone = False
+        c.showPage()
+        c.save()
+        page.mergePage(PdfFileReader(staticBuffer, strict=False).getPage(0))
+        return engineDone
+
+    def openCachedStamp(self, cachePath):
+        if not os.path.exists(cachePath):
+            return False
+        try:
+            cachedFile = open(cachePath, 'rb')
+        except OSError as ex:
+            logging.warning('Unable to open the stamp cache %r: %r' % (cachePath, ex))
+            return False
+        self.openedFiles.append(cachedFile)
+        try:
+            cachedReader = PdfFileReader(cachedFile, strict=False)
+            cachedReader.getNumPages()
+            os.utime(cachePath)
+            return cachedReader
+        except Exception as ex:
+            logging.warning('Unable to use the stamp cache %r: %r' % (cachePath, ex))
+            return False
+
+    def writeCachedStamp(self, cachePath, stampedReader):
+        tmpPath = '%s.%s.tmp' % (cachePath, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+            stampedWriter = PdfFileWriter()
+            for i in range(0, stampedReader.getNumPages()):
+                stampedWriter.addPage(stampedReader.getPage(i))
+            with open(tmpPath, 'wb') as outputStream:
+                stampedWriter.write(outputStream)
+            os.replace(tmpPath, cachePath)
+        except Exception as ex:
+            logging.warning('Unable to write the stamp cache %r: %r' % (cachePath, ex))
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def getStampedReader(self, streamBuffer, docObject):
+        """
+            get the reader of the document pages with the static stamp,
+            the stamped pages are reused from the cache when the same printout is printed again with the same stamp
+            only the pages of a completely stamped document are cached, if the stamp fails the pages are left clean
+        """
+        if self.poolObj is None or not (isinstance(self.staticText, tuple) or self.hasStaticStamp()):
+            return PdfFileReader(streamBuffer, strict=False)
+        staticText = self.getStaticText(docObject)
+        # the first page jumped by the page number is left clean, so the document is not cached
+        firstPage = 1 if self.jumpFirst else 0
+        cachePath = False
+        if not firstPage:
+            key = self.getStampKey(docObject, staticText)
+            if key:
+                cachePath = os.path.join(getStampCacheDir(self.poolObj), '%s.pdf' % key)
+                cachedReader = self.openCachedStamp(cachePath)
+                if cachedReader:
+                    return cachedReader
+        mainPage = PdfFileReader(streamBuffer, strict=False)
+        complete = True
+        try:
+            for i in range(firstPage, mainPage.getNumPages()):
+                complete = self.stampStaticPage(mainPage.getPage(i), docObject, staticText) and complete
+        except Exception as ex:
+            logging.warning('Unable to stamp document %r: %r' % (docObject.name, ex))
+            streamBuffer.seek(0)
+            return PdfFileReader(streamBuffer, strict=False)
+        if cachePath and complete:
+            self.writeCachedStamp(cachePath, mainPage)
+        return mainPage
+
     def addPage(self, pageRes):
         streamBuffer, docObject = pageRes
-        mainPage = PdfFileReader(streamBuffer,strict=False)
+        mainPage = self.getStampedReader(streamBuffer, docObject)
         for i in range(0, mainPage.getNumPages()):
             try:
                 if self.jumpFirst:
@@ -117,121 +397,194 @@ class BookCollector(object):
                     self.jumpFirst = False
                 else:
                     page = mainPage.getPage(i)
-                    numberPagerBuffer, canvas, doc_orientation = self.getNextPageNumber(page.mediaBox, docObject)
-                    try:
-                        _orientation, paper = paperFormat(page.mediaBox)
-                        self.poolObj.get('ir.attachment').advancedPlmReportEngine(document=docObject,
-                                                                                  canvas=canvas,
-                                                                                  page_orientation=doc_orientation,
-                                                                                  paper=paper,
-                                                                                  page_obj=page)
-                    except Exception as ex:
-                        logging.warning(ex)
-                        logging.warning('advancedPlmReportEngine function not implemented in plm.document object')
+                    numberPagerBuffer, canvas, _doc_orientation = self.getNextPageNumber(page.mediaBox, docObject)
                     canvas.showPage()
                     canvas.save()
-                    numberPageReader=PdfFileReader(numberPagerBuffer,strict=False)  
-                    mainPage.getPage(i).mergePage(numberPageReader.getPage(0))
-                    self.collector.addPage(mainPage.getPage(i))
+                    numberPageReader = PdfFileReader(numberPagerBuffer, strict=False)
+                    page.mergePage(numberPageReader.getPage(0))
+                    self.collector.addPage(page)
             except Exception as ex:
                 logging.error(ex)
                 logging.error('Something went wrong during pdf generation')
 
+    def closeOpenedFiles(self):
+        for openedFile in self.openedFiles:
+            openedFile.close()
+        self.openedFiles = []
+
     def printToFile(self, fileName):
         outputStream = open(fileName, "wb")
         self.collector.write(outputStream)
         outputStream.close()
+        self.closeOpenedFiles()
+
+    def flushToFile(self, fileName):
+        """
+            Write the collected pages and restart with an empty collector keeping the page count
+        """
+        self.printToFile(fileName)
+        self.collector = PdfFileWriter()
 
 
-def packDocuments(docRepository, documents, bookCollector):
+def remapPdfObject(obj, mapping, toWrite, nextNumber):
     """
-        pack the documenta for paper size
+        Replace in place the indirect references of obj with the numbers of the output file,
+        the objects met for the first time are numbered and queued in toWrite
+        return the next free object number
+    """
+    if isinstance(obj, DictionaryObject):
+        items = obj.items()
+    elif isinstance(obj, ArrayObject):
+        items = enumerate(obj)
+    else:
+        return nextNumber
+    for key, value in list(items):
+        if isinstance(value, IndirectObject):
+            refKey = (value.idnum, value.generation)
+            if refKey not in mapping:
+                mapping[refKey] = nextNumber
+                toWrite.append(refKey)
+                nextNumber += 1
+            obj[key] = IndirectObject(mapping[refKey], 0, None)
+        else:
+            nextNumber = remapPdfObject(value, mapping, toWrite, nextNumber)
+    return nextNumber
+
+
+def concatenatePdfFiles(filePaths, outputPath):
+    """
+        Concatenate the pages of the pdf files in outputPath writing the objects of one file at a time,
+        the memory depends on the biggest file, not on the number of files
+        object 1 is the catalog and object 2 the page tree, they are written at the end with the xref table
+    """
+    offsets = {}
+    kids = []
+    nextNumber = 3
+    with open(outputPath, 'wb') as outputStream:
+        outputStream.write(b'%PDF-1.3\n%\xe2\xe3\xcf\xd3\n')
+        pagesRef = IndirectObject(2, 0, None)
+        for filePath in filePaths:
+            with open(filePath, 'rb') as inputStream:
+                reader = PdfFileReader(inputStream, strict=False)
+                mapping = {}
+                toWrite = []
+                pageObjects = {}
+                for i in range(reader.getNumPages()):
+                    # the pages from getPage have the inherited resources and media box
+                    page = reader.getPage(i)
+                    refKey = (page.indirectRef.idnum, page.indirectRef.generation)
+                    if refKey in mapping:
+                        continue
+                    page[NameObject('/Parent')] = pagesRef
+                    pageObjects[refKey] = page
+                    mapping[refKey] = nextNumber
+                    toWrite.append(refKey)
+                    kids.append(IndirectObject(nextNumber, 0, None))
+                    nextNumber += 1
+                while toWrite:
+                    refKey = toWrite.pop(0)
+                    obj = pageObjects.pop(refKey, None)
+                    if obj is None:
+                        obj = reader.getObject(IndirectObject(refKey[0], refKey[1], reader))
+                    nextNumber = remapPdfObject(obj, mapping, toWrite, nextNumber)
+                    offsets[mapping[refKey]] = outputStream.tell()
+                    outputStream.write(b'%d 0 obj\n' % mapping[refKey])
+                    obj.writeToStream(outputStream, None)
+                    outputStream.write(b'\nendobj\n')
+        pagesObj = DictionaryObject({NameObject('/Type'): NameObject('/Pages'),
+                                     NameObject('/Kids'): ArrayObject(kids),
+                                     NameObject('/Count'): NumberObject(len(kids))})
+        catalogObj = DictionaryObject({NameObject('/Type'): NameObject('/Catalog'),
+                                       NameObject('/Pages'): pagesRef})
+        for number, obj in ((1, catalogObj), (2, pagesObj)):
+            offsets[number] = outputStream.tell()
+            outputStream.write(b'%d 0 obj\n' % number)
+            obj.writeToStream(outputStream, None)
+            outputStream.write(b'\nendobj\n')
+        xrefOffset = outputStream.tell()
+        outputStream.write(b'xref\n0 %d\n0000000000 65535 f \n' % nextNumber)
+        for number in range(1, nextNumber):
+            # numbers of objects never written (none expected) are free entries
+            if number in offsets:
+                outputStream.write(b'%010d 00000 n \n' % offsets[number])
+            else:
+                outputStream.write(b'0000000000 65535 f \n')
+        outputStream.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (nextNumber, xrefOffset))
+    return len(kids)
+
+
+def packDocumentsToFile(docRepository, documents, bookCollector, outputPath, processes=None):
+    """
+        pack the documents for paper size in the outputPath pdf file
+        every document is spooled to disk and classified from the mediaBox of its first page,
+        the classification of big books runs in up to processes pdf_classifier interpreters,
+        the pages are collected in partial files of about SPOOL_BATCH_PAGES pages, the partials are
+        concatenated by streaming their objects one file at a time, so the memory depends on the batch size
+        and not on the book size
+        return the number of packed documents
     """
-    packed = []
-    output0 = []
-    output1 = []
-    output2 = []
-    output3 = []
-    output4 = []
     if not bookCollector:
         bookCollector = BookCollector()
-    for document in documents:
-        if document.id not in packed:
-            appendPage = False
-            if document.printout and document.printout != 'None':
-                byteIoStream = BytesIO(base64.b64decode(document.printout))
-                appendPage = True
-            elif isPdf(document.name):
-                value = getDocumentStream(docRepository, document)
-                if value:
-                    byteIoStream = BytesIO(value)
-                    appendPage = True
-            if appendPage:
-                page = PdfFileReader(byteIoStream,strict=False)
-                _orientation, paper = paperFormat(page.getPage(0).mediaBox)
-                if(paper == 0):
-                    output0.append((byteIoStream, document))
-                elif(paper == 1):
-                    output1.append((byteIoStream, document))
-                elif(paper == 2):
-                    output2.append((byteIoStream, document))
-                elif(paper == 3):
-                    output3.append((byteIoStream, document))
-                elif(paper == 4):
-                    output4.append((byteIoStream, document))
-                else:
-                    output0.append((byteIoStream, document))
-                packed.append(document.id)
-    for pag in output0 + output1 + output2 + output3 + output4:
-        bookCollector.addPage(pag)
-    if bookCollector is not None:
-        pdf_string = BytesIO()
-        bookCollector.collector.write(pdf_string)
-        out = pdf_string.getvalue()
-        pdf_string.close()
-        return (out, 'pdf')
-    return (False, '')
-
-
-def paperFormat(_boundingBox):
-        """
-            Get Paper dimensions from drawing
-        """
-        orientation = 1                                 # 0 - Portrait, 1 - LandScape
-        paper = 4
-        clearance = 5
-        defaultUSpace = 25.4 / 72.0
-        minX, minY = _boundingBox.lowerLeft
-        maxX, maxY = _boundingBox.upperRight
-        deltaX = maxX - minX
-        deltaY = maxY - minY
-        if deltaX > deltaY:
-            measureX = float(deltaX)
-            measureY = float(deltaY)
-            orientation = 1                             # Landscape
-        else:
-            measureX = float(deltaY)
-            measureY = float(deltaX)
-            orientation = 0                             # Portrait
-
-        minX = (measureX * defaultUSpace) - clearance
-        maxX = (measureX * defaultUSpace) + clearance
-        minY = (measureY * defaultUSpace) - clearance
-        maxY = (measureY * defaultUSpace) + clearance
-
-        if minX >= 1180 and minX <= 1196:
-            paper = 0                                     # Format A0
-            return (orientation, paper)
-        elif minX >= 834 and minX <= 848:
-            paper = 1                                     # Format A1
-            return (orientation, paper)
-        elif minX >= 587 and minX <= 601:
-            paper = 2                                     # Format A2
-            return (orientation, paper)
-        elif minX >= 413 and minX <= 427:
-            paper = 3                                     # Format A3
-            return (orientation, paper)
-        elif minX >= 290 and minX <= 304:
-            paper = 4                                     # Format A4
-            return (orientation, paper)
-        return (orientation, paper)
+    spoolDir = tempfile.mkdtemp(prefix='plm_book_')
+    try:
+        packed = set()
+        spooled = []
+        outputs = {0: [], 1: [], 2: [], 3: [], 4: []}
+        for document in documents:
+            if document.id in packed:
+                continue
+            packed.add(document.id)
+            filePath = spoolDocument(docRepository, document, spoolDir)
+            if filePath:
+                spooled.append((filePath, document))
+        papers = classifyPdfFiles([filePath for filePath, _document in spooled], processes)
+        for filePath, document in spooled:
+            paper = papers.get(filePath)
+            if paper is None:
+                logging.error('Unable to read pdf of document %r' % document.name)
+                continue
+            outputs.get(paper, outputs[0]).append((filePath, document))
+        partials = []
+        openedFiles = []
+        for paper in range(5):
+            for filePath, document in outputs[paper]:
+                streamBuffer = open(filePath, 'rb')
+                openedFiles.append(streamBuffer)
+                bookCollector.addPage((streamBuffer, document))
+                # the open files are bounded too, a book of one page drawings would keep a file per page
+                if bookCollector.collector.getNumPages() >= SPOOL_BATCH_PAGES or len(openedFiles) >= SPOOL_MAX_OPEN_FILES:
+                    partials.append(os.path.join(spoolDir, 'partial_%s.pdf' % len(partials)))
+                    bookCollector.flushToFile(partials[-1])
+                    for openedFile in openedFiles:
+                        openedFile.close()
+                    openedFiles = []
+        if openedFiles:
+            partials.append(os.path.join(spoolDir, 'partial_%s.pdf' % len(partials)))
+            bookCollector.flushToFile(partials[-1])
+            for openedFile in openedFiles:
+                openedFile.close()
+        packedCount = sum(len(paperOutputs) for paperOutputs in outputs.values())
+        if not partials:
+            bookCollector.printToFile(outputPath)
+            return packedCount
+        if len(partials) == 1:
+            shutil.move(partials[0], outputPath)
+            return packedCount
+        concatenatePdfFiles(partials, outputPath)
+        return packedCount
+    finally:
+        shutil.rmtree(spoolDir, ignore_errors=True)
+
+
+def packDocuments(docRepository, documents, bookCollector):
+    """
+        pack the documenta for paper size
+    """
+    fd, outputPath = tempfile.mkstemp(suffix='.pdf', prefix='plm_book_')
+    os.close(fd)
+    try:
+        packDocumentsToFile(docRepository, documents, bookCollector, outputPath)
+        with open(outputPath, 'rb') as f:
+            return (f.read(), 'pdf')
+    finally:
+        os.remove(outputPath)
@@ -19,10 +19,12 @@
 #
 ##############################################################################
 from .book_collector import BookCollector
-from .book_collector import packDocuments
+from .book_collector import packDocumentsToFile
 from datetime import datetime
 from dateutil import tz
+import os
 import base64
+import tempfile
 from odoo import _
 from odoo import api
 from odoo import models
@@ -198,6 +200,9 @@ RjYxNzJGNDFCNzYwNjRBM0NDQjFEMTgxOTFCQgo+PgpzdGFydHhyZWYKODc0NwolJUVPRgo=""")
 class ReportProductPdf(models.AbstractModel):
     _name = 'report.plm.product_pdf'
     _description = 'Report for producing pdf'
+    # the bom level and the state check printed by the report template
+    _book_level = -1
+    _book_check_state = False
 
 
     def commonInfos(self):
@@ -208,14 +213,14 @@ class ReportProductPdf(models.AbstractModel):
         dt = dt.replace(tzinfo=from_zone)
         localDT = dt.astimezone(to_zone)
         localDT = localDT.replace(microsecond=0)
-        msg = "Printed by '%(print_user)s' : %(date_now)s State: %(state)s"
+        msg = "Printed by '%(print_user)s' : %(date_now)s"
         msg_vals = {
             'print_user': 'user_id.name',
             'date_now': localDT.ctime(),
-            'state': 'doc_obj.engineering_state',
                 }
         mainBookCollector = BookCollector(jumpFirst=False,
                                           customText=(msg, msg_vals),
+                                          staticText=("State: %(state)s", {'state': 'doc_obj.engineering_state'}),
                                           bottomHeight=10,
                                           poolObj=self.env)
         return docRepository, mainBookCollector
@@ -230,30 +235,75 @@ class ReportProductPdf(models.AbstractModel):
             out.append(doc)
         return out
 
+    def _get_book_documents(self, products, level=0, checkState=False):
+        """
+        Products and documents shared by more bom levels are listed once, before any file is read
+        """
+        productIds = []
+        for product in products:
+            productIds.append(product.id)
+            if level > -1:
+                productIds.extend(product._getChildrenBom(product, level))
+        documents = []
+        packed = set()
+        for product in self.env['product.product'].browse(list(dict.fromkeys(productIds))):
+            for doc in self.getDocument(product, checkState):
+                if doc.id not in packed:
+                    packed.add(doc.id)
+                    documents.append(doc)
+        return documents
+
+    def _get_book_processes(self):
+        processes = self.env['ir.config_parameter'].sudo().get_param('PLM_BOOK_PROCESSES', '')
+        if processes:
+            return int(processes)
+        return None
+
     @api.model
-    def _render_qweb_pdf(self, products=None, level=0, checkState=False):
+    def _render_book_file(self, products=None, level=None, checkState=None):
+        """
+        Write the book in a temporary file and return its path, the caller must remove it
+        """
+        if level is None:
+            level = self._book_level
+        if checkState is None:
+            checkState = self._book_check_state
         docRepository, mainBookCollector = self.commonInfos()
-        documents = []
+        documents = self._get_book_documents(products, level, checkState)
+        fd, outputPath = tempfile.mkstemp(suffix='.pdf', prefix='plm_book_')
+        try:
+            if len(documents) == 0:
+                os.write(fd, getEmptyDocument())
+                os.close(fd)
+            else:
+                os.close(fd)
+                packDocumentsToFile(docRepository,
+                                    documents,
+                                    mainBookCollector,
+                                    outputPath,
+                                    processes=self._get_book_processes())
+        except Exception:
+            os.remove(outputPath)
+            raise
+        return outputPath
 
-        for product in products:
-            documents.extend(self.getDocument(product, checkState))
-            if level > -1:
-                for childProduct in product._getChildrenBom(product, level):
-                    childProduct = self.env['product.product'].browse(childProduct)
-                    documents.extend(self.getDocument(childProduct, checkState))
-        if len(documents) == 0:
-            content = getEmptyDocument()
-        else:
-            documentContent = packDocuments(docRepository,
-                                            documents,
-                                            mainBookCollector)
-            content = documentContent[0]
-        return content
-    
-    def render_qweb_pdf(self, products=None, level=0, checkState=False):
-        content = self._render_qweb_pdf(products, level, checkState)
-        byteString = b"data:application/pdf;base64," + base64.b64encode(content)
-        return byteString.decode('UTF-8')
+    @api.model
+    def _render_qweb_pdf(self, products=None, level=0, checkState=False):
+        outputPath = self._render_book_file(products, level, checkState)
+        try:
+            with open(outputPath, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(outputPath)
+
+    def render_qweb_pdf(self, products=None, level=0, checkState=False, *args):
+        """
+        The book is served by /plm/product_book so it is streamed from disk instead of embedded as data uri
+        """
+        return '/plm/product_book/%s/%s?level=%s&check_state=%s' % (self._name[len('report.'):],
+                                                                    ','.join(map(str, products.ids)),
+                                                                    level,
+                                                                    int(bool(checkState)))
 
     @api.model
     def _get_report_values(self, docids, data=None):
@@ -265,23 +315,33 @@ class ReportProductPdf(models.AbstractModel):
 class ReportOneLevelProductPdf(ReportProductPdf):
     _name = 'report.plm.one_product_pdf'
     _description = 'Report pdf'
+    _book_level = 0
+    _book_check_state = False
 
 
 class ReportAllLevelProductPdf(ReportProductPdf):
     _name = 'report.plm.all_product_pdf'
     _description = 'Report pdf'
+    _book_level = 1
+    _book_check_state = False
 
 
 class ReportProductionProductPdf(ReportProductPdf):
     _name = 'report.plm.product_production_pdf_latest'
     _description = 'Report pdf'
+    _book_level = -1
+    _book_check_state = True
 
 
 class ReportProductionOneProductPdf(ReportProductPdf):
     _name = 'report.plm.product_production_one_pdf_latest'
     _description = 'Report pdf'
+    _book_level = 0
+    _book_check_state = True
 
 
 class ReportProductionAllProductPdf(ReportProductPdf):
     _name = 'report.plm.product_production_all_pdf_latest'
     _description = 'Report pdf'
+    _book_level = 1
+    _book_check_state = True
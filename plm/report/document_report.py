@@ -21,9 +21,11 @@
 
 from .book_collector import BookCollector
 from .book_collector import packDocuments
+from .book_collector import packDocumentsToFile
 from datetime import datetime
 from dateutil import tz
-import base64
+import os
+import tempfile
 from odoo import api
 from odoo import models
 
@@ -39,29 +41,55 @@ class ReportDocumentPdf(models.AbstractModel):
         dt = dt.replace(tzinfo=from_zone)
         localDT = dt.astimezone(to_zone)
         localDT = localDT.replace(microsecond=0)
-        msg = "Printed by '%(print_user)s' : %(date_now)s State: %(state)s"
+        msg = "Printed by '%(print_user)s' : %(date_now)s"
         msg_vals = {
             'print_user': 'user_id.name',
             'date_now': localDT.ctime(),
-            'state': 'doc_obj.engineering_state',
                 }
         return (msg, msg_vals)
-    
+
+    def get_static_text(self):
+        """
+        Document dependent text, the pages stamped with it are cached
+        """
+        return ("State: %(state)s", {'state': 'doc_obj.engineering_state'})
+
+    def _get_book_collector(self):
+        return BookCollector(jumpFirst=False,
+                             customText=self.get_custom_text(),
+                             staticText=self.get_static_text(),
+                             bottomHeight=10,
+                             poolObj=self.env)
+
     @api.model
     def _render_qweb_pdf(self, documents=None, data=None):
-        docType = self.env['ir.attachment']
-        docRepository = docType._get_filestore()
-        output = BookCollector(jumpFirst=False,
-                               customText=self.get_custom_text(),
-                               bottomHeight=10,
-                               poolObj=self.env)
-        return packDocuments(docRepository, documents, output)
-        
+        docRepository = self.env['ir.attachment']._get_filestore()
+        return packDocuments(docRepository, documents, self._get_book_collector())
+
+    @api.model
+    def _render_book_file(self, documents=None, data=None):
+        """
+        Write the book in a temporary file and return its path (False if no page is found), the caller must remove it
+        """
+        docRepository = self.env['ir.attachment']._get_filestore()
+        fd, outputPath = tempfile.mkstemp(suffix='.pdf', prefix='plm_book_')
+        os.close(fd)
+        try:
+            packedCount = packDocumentsToFile(docRepository, documents, self._get_book_collector(), outputPath)
+        except Exception:
+            os.remove(outputPath)
+            raise
+        if not packedCount:
+            os.remove(outputPath)
+            return False
+        return outputPath
+
     @api.model
     def render_qweb_pdf(self, documents=None, data=None):
-        documentContent = self._render_qweb_pdf(documents, data)
-        byteString = b"data:application/pdf;base64," + base64.b64encode(documentContent[0])
-        return byteString.decode('UTF-8')
+        """
+        The book is served by /plm/document_book so it is streamed from disk instead of embedded as data uri
+        """
+        return '/plm/document_book/%s' % ','.join(map(str, documents.ids))
 
     @api.model
     def _get_report_values(self, docids, data=None):
@@ -0,0 +1,106 @@
+##############################################################################
+#
+#    OmniaSolutions, Your own solutions
+#    Copyright (C) 2010 OmniaSolutions (<https://www.omniasolutions.website>). All Rights Reserved
+#    $Id$
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+'''
+Created on 19 Oct 2026
+
+Paper format classification of the spooled pdf files of a book.
+This module imports only PyPDF2 so it can be run as a script by the book
+printing in fresh interpreters, without forking the odoo worker:
+
+    python pdf_classifier.py <file with a pdf path per line>
+
+prints a "paper<TAB>path" line for every pdf, paper is "None" if the file cannot be read
+'''
+import sys
+import logging
+from PyPDF2 import PdfFileReader
+
+
+def paperFormat(_boundingBox):
+        """
+            Get Paper dimensions from drawing
+        """
+        orientation = 1                                 # 0 - Portrait, 1 - LandScape
+        paper = 4
+        clearance = 5
+        defaultUSpace = 25.4 / 72.0
+        minX, minY = _boundingBox.lowerLeft
+        maxX, maxY = _boundingBox.upperRight
+        deltaX = maxX - minX
+        deltaY = maxY - minY
+        if deltaX > deltaY:
+            measureX = float(deltaX)
+            measureY = float(deltaY)
+            orientation = 1                             # Landscape
+        else:
+            measureX = float(deltaY)
+            measureY = float(deltaX)
+            orientation = 0                             # Portrait
+
+        minX = (measureX * defaultUSpace) - clearance
+        maxX = (measureX * defaultUSpace) + clearance
+        minY = (measureY * defaultUSpace) - clearance
+        maxY = (measureY * defaultUSpace) + clearance
+
+        if minX >= 1180 and minX <= 1196:
+            paper = 0                                     # Format A0
+            return (orientation, paper)
+        elif minX >= 834 and minX <= 848:
+            paper = 1                                     # Format A1
+            return (orientation, paper)
+        elif minX >= 587 and minX <= 601:
+            paper = 2                                     # Format A2
+            return (orientation, paper)
+        elif minX >= 413 and minX <= 427:
+            paper = 3                                     # Format A3
+            return (orientation, paper)
+        elif minX >= 290 and minX <= 304:
+            paper = 4                                     # Format A4
+            return (orientation, paper)
+        return (orientation, paper)
+
+
+def classifyPdfFile(filePath):
+    """
+        Paper format of the first page of the pdf file
+        return (filePath, paper) paper is None if the file cannot be read
+    """
+    try:
+        with open(filePath, 'rb') as f:
+            _orientation, paper = paperFormat(PdfFileReader(f, strict=False).getPage(0).mediaBox)
+        return filePath, paper
+    except Exception as ex:
+        logging.error('Unable to read pdf %r: %r' % (filePath, ex))
+        return filePath, None
+
+
+def main(listPath):
+    with open(listPath, 'r', encoding='utf-8') as listFile:
+        for line in listFile:
+            filePath = line.rstrip('\n')
+            if filePath:
+                filePath, paper = classifyPdfFile(filePath)
+                sys.stdout.write('%s\t%s\n' % (paper, filePath))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -4,7 +4,6 @@ import json
 
 from odoo import api, models, _
 from odoo.tools import float_round
-import copy
 
 
 class ReportProdStructure(models.AbstractModel):
@@ -16,47 +15,131 @@ class ReportProdStructure(models.AbstractModel):
         docs = []
         items_to_show = {}
         product_ids = self.env['product.product'].browse(docids)
+        root_docs = product_ids.mapped('linkeddocuments').filtered(lambda doc: (doc.document_type or '').upper() == '3D')
+        graph = self._get_document_graph(root_docs.ids)
         for product_id in product_ids:
             for attachment_id in product_id.linkeddocuments:
-                if attachment_id.document_type.upper() == '3D':
-                    items_to_show.setdefault(attachment_id.id)
-                    visible_attachments = self.checkVisibleItems(attachment_id, [])
-                    items_to_show[attachment_id.id] = visible_attachments
-                    vals = self.singleItem(attachment_id, 0, True, items_to_show, attachment_id)
+                if (attachment_id.document_type or '').upper() == '3D':
+                    items_to_show[attachment_id.id] = self.checkVisibleItems(attachment_id, graph)
+                    vals = self.singleItem(attachment_id, 0, items_to_show, attachment_id, graph)
                     docs.append(vals)
         return {'doc_ids': docids, 'doc_model': 'product.product', 'docs': docs, 'items_to_show': items_to_show,}
-    
+
     @api.model
-    def get_doc_prod(self, attachment, level=False, items_to_show={}, root_doc=False):
-        data = self.singleItem(attachment, level, True, items_to_show, root_doc)
-        return self.env['ir.ui.view']._render_template('plm.report_prod_bom_line',{'data': data}) 
-    
-    def checkVisibleItems(self, parent_doc, parents=[]):
-        out = []
-        if not parent_doc.linkedcomponents:
-            out.append(parent_doc.id)
-            out.extend(parents)
-        children = parent_doc.getRelatedOneLevelLinks(parent_doc.id, ['RfTree', 'HiTree'])
-        for child_id in children:
-            attachment_child = self.env['ir.attachment'].browse(child_id)
-            new_parents = copy.deepcopy(parents)
-            new_parents.append(parent_doc.id)
-            children_out = self.checkVisibleItems(attachment_child, new_parents)
-            out.extend(children_out)
-        out = list(set(out))
-        return out
-    
-    def singleItem(self, attachment, level=0, recursion=True, items_to_show={}, root_doc=False):
-        children_list = []
-        visible = False
-        visible_items = items_to_show.get(root_doc.id, [])
-        if attachment.id in visible_items:
-            visible = True
-        if recursion and attachment.document_type.upper() == '3D':
-            children = attachment.getRelatedOneLevelLinks(attachment.id, ['RfTree', 'LyTree', 'HiTree'])
-            for child_id in children:
-                attachment_child = self.env['ir.attachment'].browse(child_id)
-                child_dict = self.singleItem(attachment_child, level + 1, False, items_to_show, root_doc)
-                children_list.append(child_dict)
-        vals = {'id': attachment, 'level': level, 'report_obj': self, 'children': children_list, 'visible': visible, 'items_to_show': items_to_show}
-        return vals
+    def _get_document_graph(self, root_ids):
+        """
+        Fetch the whole document structure under the root documents at once
+        :return: dict with
+            hierarchy: {doc_id: [RfTree and HiTree children ids]}
+            layout: {doc_id: [LyTree related ids]}
+            document_type: {doc_id: upper case document type}
+            missing: set of the document ids without linked components
+        """
+        graph = {'hierarchy': {},
+                 'layout': {},
+                 'document_type': {},
+                 'missing': set()}
+        if not root_ids:
+            return graph
+        self.env['ir.attachment.relation'].flush_model(['parent_id', 'child_id', 'link_kind'])
+        self.env.cr.execute("""
+            WITH RECURSIVE document_tree(parent_id, child_id) AS (
+                SELECT parent_id, child_id
+                FROM ir_attachment_relation
+                WHERE link_kind IN ('RfTree', 'HiTree') AND parent_id IN %(root_ids)s
+              UNION
+                SELECT rel.parent_id, rel.child_id
+                FROM ir_attachment_relation rel
+                JOIN document_tree ON rel.parent_id = document_tree.child_id
+                WHERE rel.link_kind IN ('RfTree', 'HiTree')
+            )
+            SELECT parent_id, child_id FROM document_tree
+        """, {'root_ids': tuple(root_ids)})
+        doc_ids = set(root_ids)
+        for parent_id, child_id in self.env.cr.fetchall():
+            if not child_id or child_id == parent_id:
+                continue
+            graph['hierarchy'].setdefault(parent_id, set()).add(child_id)
+            doc_ids.add(child_id)
+        self.env.cr.execute("""
+            SELECT parent_id, child_id
+            FROM ir_attachment_relation
+            WHERE link_kind = 'LyTree' AND (parent_id IN %(doc_ids)s OR child_id IN %(doc_ids)s)
+        """, {'doc_ids': tuple(doc_ids)})
+        layout_links = self.env.cr.fetchall()
+        for parent_id, child_id in layout_links:
+            doc_ids.update((parent_id, child_id))
+        doc_ids.discard(None)
+        for doc_dict in self.env['ir.attachment'].browse(doc_ids).read(['document_type', 'linkedcomponents']):
+            graph['document_type'][doc_dict['id']] = (doc_dict['document_type'] or '').upper()
+            if not doc_dict['linkedcomponents']:
+                graph['missing'].add(doc_dict['id'])
+        document_type = graph['document_type']
+        for parent_id, child_id in layout_links:
+            # a 3D document shows its drawings in both directions of the link
+            if document_type.get(parent_id) == '3D' and document_type.get(child_id) == '2D':
+                graph['layout'].setdefault(parent_id, set()).add(child_id)
+            elif document_type.get(child_id) == '3D' and document_type.get(parent_id) == '2D':
+                graph['layout'].setdefault(child_id, set()).add(parent_id)
+        graph['hierarchy'] = {doc_id: sorted(children) for doc_id, children in graph['hierarchy'].items()}
+        graph['layout'] = {doc_id: sorted(children) for doc_id, children in graph['layout'].items()}
+        return graph
+
+    def checkVisibleItems(self, parent_doc, graph=None):
+        """
+        A document is visible when it, or a document under it, has no linked component.
+        The missing documents are propagated back to their parents so every node is evaluated once.
+        """
+        if graph is None:
+            graph = self._get_document_graph(parent_doc.ids)
+        hierarchy = graph['hierarchy']
+        reachable = {parent_doc.id}
+        parents = {}
+        stack = [parent_doc.id]
+        while stack:
+            doc_id = stack.pop()
+            for child_id in hierarchy.get(doc_id, []):
+                parents.setdefault(child_id, []).append(doc_id)
+                if child_id not in reachable:
+                    reachable.add(child_id)
+                    stack.append(child_id)
+        visible = reachable & graph['missing']
+        stack = list(visible)
+        while stack:
+            doc_id = stack.pop()
+            for parent_id in parents.get(doc_id, []):
+                if parent_id not in visible:
+                    visible.add(parent_id)
+                    stack.append(parent_id)
+        return list(visible)
+
+    def singleItem(self, attachment, level=0, items_to_show={}, root_doc=False, graph=None):
+        """
+        Build the report tree of the document, only the visible children are expanded
+        """
+        root_doc = root_doc or attachment
+        if graph is None:
+            graph = self._get_document_graph(attachment.ids)
+        visible_items = set(items_to_show.get(root_doc.id, []))
+        prefetch_ids = list(graph['document_type'])
+        attachment_obj = self.env['ir.attachment']
+
+        def _item(doc_id, level, path):
+            children_list = []
+            if graph['document_type'].get(doc_id) == '3D':
+                children = set(graph['hierarchy'].get(doc_id, [])) | set(graph['layout'].get(doc_id, []))
+                for child_id in sorted(children):
+                    if child_id in visible_items and child_id not in path:
+                        child_dict = _item(child_id, level + 1, path | {child_id})
+                    else:
+                        child_dict = {'id': attachment_obj.browse(child_id).with_prefetch(prefetch_ids),
+                                      'level': level + 1,
+                                      'children': [],
+                                      'visible': False}
+                    children_list.append(child_dict)
+            return {'id': attachment_obj.browse(doc_id).with_prefetch(prefetch_ids),
+                    'level': level,
+                    'children': children_list,
+                    'visible': doc_id in visible_items}
+
+        return _item(attachment.id, level, {attachment.id})
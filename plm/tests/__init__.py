@@ -21,4 +21,12 @@
 ##############################################################################
 from . import test_plm
 from . import test_check_in
+from . import test_bom_export
+from . import test_bom_father
+from . import test_latest_revision
+from . import test_attachment_search
+from . import test_query_plans
+from . import test_save_version
+from . import test_bulk_revision
+from . import test_bom_weight
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
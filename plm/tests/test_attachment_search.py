@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+import os
+import time
+import logging
+from collections import defaultdict
+from odoo import models
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+#
+#
+# --test-tags=odoo_plm_performance
+# PLM_BENCHMARK_ATTACHMENTS=1000000 sets the vault size
+#
+
+_logger = logging.getLogger(__name__)
+
+
+def legacy_search(attachment_obj, domain):
+    """
+    Attachment search filtered in python after the query, as it was done before the acl domain
+    """
+    ids = list(models.BaseModel._search(attachment_obj, [('res_field', '=', False)] + domain))
+    if not ids:
+        return []
+    model_attachments = defaultdict(lambda: defaultdict(set))
+    attachment_obj._cr.execute("""SELECT id, res_model, res_id, public FROM ir_attachment WHERE id IN %s""", [tuple(ids)])
+    for row in attachment_obj._cr.dictfetchall():
+        if not row['res_model'] or row['public']:
+            continue
+        model_attachments[row['res_model']][row['res_id']].add(row['id'])
+    allowed_ids = set(ids)
+    for res_model, targets in model_attachments.items():
+        if res_model not in attachment_obj.env:
+            continue
+        allowed = attachment_obj.env[res_model].with_context(active_test=False).search([('id', 'in', list(targets))])
+        for res_id in set(targets).difference(allowed.ids):
+            allowed_ids.difference_update(targets[res_id])
+    return [attachment_id for attachment_id in ids if attachment_id in allowed_ids]
+
+
+@tagged('-standard', 'odoo_plm_performance', 'post_install', '-at_install')
+class PlmAttachmentSearch(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = cls.env['res.users'].create({'name': 'PLM Vault Reader',
+                                                'login': 'plm_vault_reader',
+                                                'groups_id': [(6, 0, [cls.env.ref('base.group_user').id,
+                                                                      cls.env.ref('plm.group_plm_view_user').id])]})
+        other_company = cls.env['res.company'].create({'name': 'PLM Other Company'})
+        cls.partners = cls.env['res.partner'].create([{'name': 'PLM Vault Partner %s' % index} for index in range(10)])
+        cls.hidden_partner = cls.env['res.partner'].create({'name': 'PLM Hidden Partner',
+                                                            'company_id': other_company.id})
+        partner_ids = cls.partners.ids + cls.hidden_partner.ids
+        size = int(os.environ.get('PLM_BENCHMARK_ATTACHMENTS', '20000'))
+        cls.env.flush_all()
+        cls.env.cr.execute("""
+            INSERT INTO ir_attachment (name, type, is_plm, public, res_model, res_id, create_uid, write_uid, create_date, write_date)
+            SELECT 'plm_vault_' || n, 'binary', true, false,
+                   CASE WHEN n %% 2 = 0 THEN NULL ELSE 'res.partner' END,
+                   CASE WHEN n %% 2 = 0 THEN NULL ELSE (%s::int[])[1 + n %% %s] END,
+                   %s, %s, now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM generate_series(1, %s) n
+        """, (partner_ids, len(partner_ids), cls.env.uid, cls.env.uid, size))
+        cls.env.cr.execute("ANALYZE ir_attachment")
+        cls.env['ir.attachment'].invalidate_model()
+
+    def _timed(self, function, *args):
+        start = time.time()
+        result = function(*args)
+        return result, time.time() - start
+
+    def test_acl_search_benchmark(self):
+        attachment_obj = self.env['ir.attachment'].with_user(self.user)
+        domain = [('name', '=like', 'plm_vault_%')]
+        legacy_ids, legacy_time = self._timed(legacy_search, attachment_obj, domain)
+        new_ids, new_time = self._timed(lambda: attachment_obj.search(domain).ids)
+        new_count, count_time = self._timed(attachment_obj.search_count, domain)
+        _logger.info("Attachment acl search on %s rows: legacy %.3fs, sql acl %.3fs, count %.3fs",
+                     len(legacy_ids), legacy_time, new_time, count_time)
+        assert set(new_ids) == set(legacy_ids)
+        assert new_count == len(legacy_ids)
+        hidden_ids = attachment_obj.sudo().search([('res_model', '=', 'res.partner'),
+                                                   ('res_id', '=', self.hidden_partner.id)]).ids
+        assert hidden_ids and not set(hidden_ids) & set(new_ids)
+        page = attachment_obj.search(domain, limit=80)
+        assert len(page) == min(80, new_count)
+
+    def test_orphan_attachments_hidden(self):
+        country = self.env.ref('base.it')
+        orphan, linked = self.env['ir.attachment'].create([{'name': 'plm_vault_orphan',
+                                                            'res_model': 'res.country',
+                                                            'res_id': False},
+                                                           {'name': 'plm_vault_country',
+                                                            'res_model': 'res.country',
+                                                            'res_id': country.id}])
+        found = self.env['ir.attachment'].with_user(self.user).search([('id', 'in', (orphan + linked).ids)])
+        assert found == linked
+
+    def test_res_models_from_domain(self):
+        attachment_obj = self.env['ir.attachment']
+        assert attachment_obj._get_attachment_res_models([('res_model', '=', 'res.partner'),
+                                                          ('name', '=like', 'plm_vault_%')]) == ['res.partner']
+        assert attachment_obj._get_attachment_res_models(['&', ('res_model', 'in', ['res.partner', 'res.country']),
+                                                          '|', ('res_model', '=', 'res.country'),
+                                                          ('name', '=', 'x')]) == ['res.country', 'res.partner']
+        # a res_model under an OR does not restrict the search, all the linked models are read from the index
+        scanned = attachment_obj._get_attachment_res_models(['|', ('res_model', '=', 'res.country'), ('name', '=', 'x')])
+        assert 'res.partner' in scanned and None not in scanned
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+import io
+import csv
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.tests.common import HttpCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+from odoo.addons.plm.models.mrp_bom import BOM_EXPORT_COLUMNS
+#
+#
+# --test-tags=odoo_plm_bom_export
+#
+#
+
+
+class BomExportStructure(PlmEntityCreator):
+
+    def _create_structure(self):
+        """
+        parent -> 2 sub assembly -> 3 screw
+               -> 1 screw
+        """
+        parent = self.create_product_product("export_parent")
+        sub_assembly = self.create_product_product("export_sub")
+        screw = self.create_product_product("export_screw")
+        main_bom = self.create_bom(parent, sub_assembly, qty=2)
+        self.create_bom(parent, screw, qty=1)
+        self.create_bom(sub_assembly, screw, qty=3)
+        return main_bom, screw
+
+
+@tagged('-standard', 'odoo_plm_bom_export', 'post_install', '-at_install')
+class PlmBomExportRows(TransactionCase, BomExportStructure):
+
+    def test_export_rows(self):
+        main_bom, screw = self._create_structure()
+        rows = list(main_bom.iter_export_rows())
+        assert [row['level'] for row in rows].count(2) == 1
+        assert len(rows) == 3
+        summarized = list(main_bom.iter_export_rows(summarize=True))
+        screw_rows = [row for row in summarized if row['engineering_code'] == screw.engineering_code]
+        assert len(summarized) == 2
+        assert screw_rows[0]['total_qty'] == 7
+
+
+@tagged('-standard', 'odoo_plm_bom_export', 'post_install', '-at_install')
+class PlmBomExportController(HttpCase, BomExportStructure):
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+
+    def _export(self, bom, **params):
+        return self.url_open('/plm/bom_export/%s?%s' % (bom.id, '&'.join('%s=%s' % item for item in params.items())))
+
+    def test_csv_stream(self):
+        main_bom, screw = self._create_structure()
+        response = self._export(main_bom, file_format='csv')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/csv')
+        rows = list(csv.reader(io.StringIO(response.content.decode('utf-8'))))
+        assert rows[0] == [str(label) for _field, label in BOM_EXPORT_COLUMNS]
+        assert len(rows) == 4
+        response = self._export(main_bom, file_format='csv', summarize='1')
+        rows = list(csv.DictReader(io.StringIO(response.content.decode('utf-8'))))
+        assert len(rows) == 2
+        screw_rows = [row for row in rows if row[str(BOM_EXPORT_COLUMNS[2][1])] == screw.engineering_code]
+        assert float(screw_rows[0][str(BOM_EXPORT_COLUMNS[7][1])]) == 7
+
+    def test_xlsx_stream(self):
+        main_bom, _screw = self._create_structure()
+        response = self._export(main_bom, file_format='xlsx')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        assert response.content[:2] == b'PK'
+
+    def test_unsupported_format(self):
+        main_bom, _screw = self._create_structure()
+        assert self._export(main_bom, file_format='pdf').status_code == 400
+        assert self.url_open('/plm/bom_export/0').status_code == 404
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+#
+#
+# --test-tags=odoo_plm_bom_father
+#
+#
+
+
+@tagged('-standard', 'odoo_plm_bom_father', 'post_install', '-at_install')
+class PlmBomFatherQueries(TransactionCase, PlmEntityCreator):
+
+    def _create_assemblies(self, name, count):
+        children = self.env['product.product']
+        boms = self.env['mrp.bom']
+        for index in range(count):
+            parent = self.create_product_product(f"{name}_parent_{index}")
+            child = self.create_product_product(f"{name}_child_{index}")
+            boms |= self.create_bom(parent, child)
+            children |= child
+        return children, boms
+
+    def _count_queries(self, records, field_name):
+        records.invalidate_recordset()
+        self.env.invalidate_all()
+        start = self.env.cr.sql_log_count
+        for record in records:
+            record[field_name]
+        return self.env.cr.sql_log_count - start
+
+    def test_father_part_ids_query_count(self):
+        small_children, _small_boms = self._create_assemblies("father_part_small", 2)
+        big_children, _big_boms = self._create_assemblies("father_part_big", 20)
+        small_count = self._count_queries(small_children, 'father_part_ids')
+        big_count = self._count_queries(big_children, 'father_part_ids')
+        assert big_count == small_count, "father_part_ids: %s queries for 2 products, %s for 20" % (small_count, big_count)
+        for child in big_children:
+            assert len(child.father_part_ids) == 1
+
+    def test_father_complete_ids_query_count(self):
+        _small_children, small_boms = self._create_assemblies("father_complete_small", 2)
+        _big_children, big_boms = self._create_assemblies("father_complete_big", 20)
+        self.create_bom(small_boms[0].product_id, small_boms[1].product_id)
+        self.create_bom(big_boms[0].product_id, big_boms[1].product_id)
+        small_count = self._count_queries(small_boms, 'father_complete_ids')
+        big_count = self._count_queries(big_boms, 'father_complete_ids')
+        assert big_count == small_count, "father_complete_ids: %s queries for 2 boms, %s for 20" % (small_count, big_count)
+        assert big_boms[1].father_complete_ids == big_boms[0]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+#
+#
+# --test-tags=odoo_plm_bom_weight
+#
+#
+
+
+@tagged('-standard', 'odoo_plm_bom_weight')
+class PlmBomWeight(TransactionCase, PlmEntityCreator):
+
+    def _check_rebuild(self, boms, products):
+        """
+        the incremental propagation must give the same weights of the full rebuild
+        """
+        self.env['mrp.bom'].flush_weight_propagation()
+        ids = set([('mrp.bom', bom_id) for bom_id in boms.ids] + [('product.product', product_id) for product_id in products.ids])
+        differences = [diff for diff in self.env['mrp.bom'].rebuild_bom_weight() if (diff[0], diff[1]) in ids]
+        assert not differences, differences
+
+    def test_propagate_weight_shared_child(self):
+        leaf = self.create_product_product('weight_leaf')
+        part = self.create_product_product('weight_part')
+        leaf.weight = 1.0
+        part.weight = 0.5
+        shared = self.create_product_product('weight_shared')
+        sub_assembly = self.create_product_product('weight_sub_assembly')
+        assembly = self.create_product_product('weight_assembly')
+        shared_bom = self.create_bom(shared, leaf, 2)
+        sub_assembly_bom = self.create_bom(sub_assembly, shared, 1)
+        self.create_bom(sub_assembly, leaf, 4)
+        # the shared child is used by the assembly and by its sub assembly
+        assembly_bom = self.create_bom(assembly, sub_assembly, 2)
+        self.create_bom(assembly, shared, 3)
+        self.create_bom(assembly, part, 1)
+        boms = shared_bom | sub_assembly_bom | assembly_bom
+        products = shared | sub_assembly | assembly
+        self._check_rebuild(boms, products)
+        assert (shared.weight, sub_assembly.weight, assembly.weight) == (2.0, 6.0, 18.5)
+        # weight changed on a leaf
+        leaf.weight = 2.0
+        self._check_rebuild(boms, products)
+        assert (shared.weight, sub_assembly.weight, assembly.weight) == (4.0, 12.0, 36.5)
+        # quantity changed on a line of the shared child
+        shared_bom.bom_line_ids.product_qty = 3
+        self._check_rebuild(boms, products)
+        assert (shared.weight, sub_assembly.weight, assembly.weight) == (6.0, 14.0, 46.5)
+        # line removed from the sub assembly
+        sub_assembly_bom.bom_line_ids.filtered(lambda line: line.product_id == leaf).unlink()
+        self._check_rebuild(boms, products)
+        assert (shared.weight, sub_assembly.weight, assembly.weight) == (6.0, 6.0, 30.5)
+
+    def test_weight_propagation_deferred(self):
+        leaf = self.create_product_product('weight_deferred_leaf')
+        leaf.weight = 1.0
+        assembly = self.create_product_product('weight_deferred_assembly')
+        assembly_bom = self.create_bom(assembly, leaf, 2)
+        self.env['mrp.bom'].flush_weight_propagation()
+        assert (assembly_bom.weight_net, assembly.weight) == (2.0, 2.0)
+        # the save only queues the change, the ancestors are written by the scheduler
+        assembly_bom.bom_line_ids.product_qty = 3
+        self.env.flush_all()
+        self.env['mrp.bom']._queue_weight_propagation()
+        assembly_bom.invalidate_recordset(['weight_net'])
+        assert assembly_bom.weight_net == 2.0
+        self.env.cr.execute("SELECT count(*) FROM plm_bom_weight_queue WHERE bom_id = %s", (assembly_bom.id,))
+        assert self.env.cr.fetchone()[0] == 1
+        self.env['mrp.bom'].run_weight_propagation_scheduler()
+        assert (assembly_bom.weight_net, assembly.weight) == (3.0, 3.0)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+#
+#
+# --test-tags=odoo_plm_bulk_revision
+#
+#
+
+# fields that differ between two revisions of the same record made at different times
+UNCOMPARED_FIELDS = {'id', 'create_date', 'write_date', 'engineering_revision_date',
+                     'product_tmpl_id', 'product_variant_id', 'product_variant_ids'}
+
+
+class RevisionRollback(Exception):
+    pass
+
+
+@tagged('-standard', 'odoo_plm_bulk_revision')
+class PlmBulkRevision(TransactionCase, PlmEntityCreator):
+
+    def test_bulk_new_revision(self):
+        documents = self.env['ir.attachment']
+        for index in range(3):
+            documents += self.create_document('document_revision_3d_%s' % index, doc_type='3d')
+        new_documents = (documents + documents[:1])._bulk_new_revision()
+        assert set(new_documents) == set(documents.ids)
+        for document in documents:
+            new_document = new_documents[document.id]
+            assert new_document.engineering_code == document.engineering_code
+            assert new_document.engineering_revision == document.engineering_revision + 1
+            assert new_document.store_fname == document.store_fname
+            assert document.engineering_state == 'undermodify'
+        products = self.create_product_product('product_revision_1') + self.create_product_product('product_revision_2')
+        new_products = products._bulk_new_revision()
+        for product in products:
+            assert new_products[product.id].engineering_revision == product.engineering_revision + 1
+            assert new_products[product.id].product_tmpl_id != product.product_tmpl_id
+            assert not new_products[product.id].linkeddocuments
+
+    def _get_revision_values(self, record):
+        values = {}
+        for name, field in record._fields.items():
+            if not (field.store or field.inherited) or name in UNCOMPARED_FIELDS:
+                continue
+            if name.startswith(('message_', 'activity_', 'website_message_', 'rating_')):
+                continue
+            value = record[name]
+            if field.type in ('one2many', 'many2many'):
+                value = len(value)
+            elif field.type == 'many2one':
+                value = value.id
+            values[name] = value
+        return values
+
+    def _revise_in_savepoint(self, revise, source):
+        """
+        :return: values of the new revision and of the source, the revision is rolled back
+        """
+        out = {}
+        try:
+            with self.env.cr.savepoint():
+                new_record = revise()
+                out['new'] = self._get_revision_values(new_record)
+                out['source'] = self._get_revision_values(source)
+                raise RevisionRollback()
+        except RevisionRollback:
+            pass
+        return out
+
+    def test_bulk_matches_single_revision(self):
+        product = self.create_product_product('product_revision_compare')
+        single = self._revise_in_savepoint(lambda: product.browse(product.NewRevision()[0]), product)
+        bulk = self._revise_in_savepoint(lambda: product._bulk_new_revision()[product.id], product)
+        assert bulk == single, {name: (single['new'].get(name), value) for name, value in bulk['new'].items()
+                                if single['new'].get(name) != value}
+        document = self.create_document('document_revision_compare', doc_type='3d')
+        attachment_obj = self.env['ir.attachment']
+        single = self._revise_in_savepoint(lambda: attachment_obj.browse(attachment_obj.NewRevision(document.id)[0]), document)
+        bulk = self._revise_in_savepoint(lambda: document._bulk_new_revision()[document.id], document)
+        assert bulk == single, {name: (single['new'].get(name), value) for name, value in bulk['new'].items()
+                                if single['new'].get(name) != value}
@@ -105,6 +105,41 @@ class PlmDateBom(TransactionCase, PlmEntityCreator):
         assert len(res['to_check_2d'])==4
         assert len(res['to_check_3d'])==5
         assert len(res['info'])==1
-        
-        
-                
+
+    def test_bulk_check_out_in(self):
+        root_3d = self.create_document('document_bulk_root_3d', doc_type='3d')
+        children = self.env['ir.attachment']
+        for index in range(5):
+            child_3d = self.create_document('document_bulk_child_3d_%s' % index, doc_type='3d')
+            self.create_link_document(root_3d, child_3d, 'HiTree')
+            children += child_3d
+        other_child = children[0]
+        other_child.checkout('web', '-', True, user_id=self.env.ref('base.default_user').id)
+        documents = root_3d + children
+        root_messages = len(root_3d.message_ids)
+        checked_out, errors = documents._bulk_check_out('web', '-', root_3d)
+        assert checked_out == documents - other_child
+        assert list(errors) == [other_child.id]
+        assert len(root_3d.message_ids) == root_messages + 1
+        assert all(checked_out.mapped('engineering_writable'))
+        checked_in = documents._bulk_check_in(root_3d)
+        assert checked_in == checked_out
+        assert len(root_3d.message_ids) == root_messages + 2
+        assert not self.env['plm.checkout'].search_count([('documentid', 'in', checked_out.ids)])
+        assert other_child.get_checkout_user() == self.env.ref('base.default_user')
+
+    def test_checkout_map(self):
+        documents = self.env['ir.attachment']
+        for index in range(5):
+            documents += self.create_document('document_map_3d_%s' % index, doc_type='3d')
+        documents[:3].checkout('web', '-', True)
+        documents[:3]._bulk_check_out('web', '-')
+        documents._load_checkout_map()
+        self.env.flush_all()
+        documents.read(['engineering_code', 'engineering_revision'])
+        with self.assertQueryCount(0):
+            states = [document.ischecked_in() for document in documents]
+        assert states == [False, False, False, True, True]
+        documents[0]._check_in()
+        assert documents[0].ischecked_in()
+        assert not documents[1].ischecked_in()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+#
+#
+# --test-tags=odoo_plm_latest_revision
+#
+#
+
+
+@tagged('-standard', 'odoo_plm_latest_revision', 'post_install', '-at_install')
+class PlmLatestRevision(TransactionCase, PlmEntityCreator):
+
+    def test_latest_revision_resolver(self):
+        products = self.env['product.product']
+        for index in range(5):
+            products |= self.create_product_product(f"latest_rev_{index}")
+        first_tmpl = products[0].product_tmpl_id
+        first_tmpl.action_confirm()
+        first_tmpl.action_release()
+        first_tmpl.new_version()
+        new_revision = first_tmpl.get_latest_version()
+        assert new_revision.engineering_revision == 1
+        assert new_revision.engineering_is_latest
+        assert not first_tmpl.engineering_is_latest
+        codes = products.mapped('engineering_code')
+        start = self.env.cr.sql_log_count
+        latest_ids = self.env['product.template'].get_latest_ids_by_code(codes)
+        assert self.env.cr.sql_log_count - start == 1
+        assert latest_ids[first_tmpl.engineering_code] == new_revision.id
+        assert len(latest_ids) == len(codes)
+        new_revision.unlink()
+        assert first_tmpl.engineering_is_latest
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+from odoo.modules.db import has_trigram
+from odoo.addons.plm.models.utils import PLM_INDEXES
+#
+#
+# --test-tags=odoo_plm_performance
+#
+#
+
+SEED_SIZE = 5000
+
+
+def plan_nodes(plan):
+    yield plan
+    for sub_plan in plan.get('Plans', []):
+        yield from plan_nodes(sub_plan)
+
+
+@tagged('-standard', 'odoo_plm_performance', 'post_install', '-at_install')
+class PlmQueryPlans(TransactionCase, PlmEntityCreator):
+    """
+    The hot queries are explained with sequential scans disabled,
+    a sequential scan left in the plan means no index can serve the query.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cr = cls.env.cr
+        cls.env.flush_all()
+        cr.execute("""
+            INSERT INTO ir_attachment (name, type, is_plm, engineering_code, engineering_revision,
+                                       create_uid, write_uid, create_date, write_date)
+            SELECT 'plm_plan_' || n, 'binary', true, 'plm_plan_' || n, 0,
+                   %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM generate_series(1, %(size)s) n
+            RETURNING id
+        """, {'uid': cls.env.uid, 'size': SEED_SIZE})
+        document_ids = [row[0] for row in cr.fetchall()]
+        cr.execute("""
+            INSERT INTO ir_attachment_relation (parent_id, child_id, link_kind, create_uid, write_uid, create_date, write_date)
+            SELECT parent.id, child.id, kind.link_kind, %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM unnest(%(ids)s::int[]) WITH ORDINALITY AS parent(id, position)
+            JOIN unnest(%(ids)s::int[]) WITH ORDINALITY AS child(id, position) ON child.position = parent.position + 1
+            CROSS JOIN (VALUES ('HiTree'), ('RfTree'), ('LyTree')) AS kind(link_kind)
+        """, {'uid': cls.env.uid, 'ids': document_ids})
+        cr.execute("""
+            INSERT INTO plm_checkout (documentid, userid, hostname, create_uid, write_uid, create_date, write_date)
+            SELECT id, %(uid)s, 'plm_plan_host', %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM unnest(%(ids)s::int[]) AS document(id)
+        """, {'uid': cls.env.uid, 'ids': document_ids[::2]})
+        cr.execute("""
+            INSERT INTO plm_cad_open (document_id, userid, operation_type, create_uid, write_uid, create_date, write_date)
+            SELECT document.id, %(uid)s, operation.operation_type, %(uid)s, %(uid)s,
+                   now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM unnest(%(ids)s::int[]) AS document(id)
+            CROSS JOIN (VALUES ('open'), ('save'), ('check-out')) AS operation(operation_type)
+        """, {'uid': cls.env.uid, 'ids': document_ids})
+        cls.document_ids = document_ids
+        for table_name in PLM_INDEXES:
+            cr.execute('ANALYZE "%s"' % table_name)
+        cr.execute('ANALYZE ir_attachment')
+        cls.env.invalidate_all()
+
+    def _assert_index_scan(self, model_name, domain, index_name, order=None, limit=None):
+        model_obj = self.env[model_name].with_context(active_test=False)
+        query_str, params = model_obj._search(domain, order=order, limit=limit).select()
+        cr = self.env.cr
+        cr.execute("SET LOCAL enable_seqscan = off")
+        try:
+            cr.execute("EXPLAIN (FORMAT JSON) " + query_str, params)
+            plan = cr.fetchone()[0][0]['Plan']
+        finally:
+            cr.execute("SET LOCAL enable_seqscan = on")
+        nodes = list(plan_nodes(plan))
+        scans = [node['Node Type'] for node in nodes if node.get('Relation Name') == model_obj._table]
+        assert scans, "%s: no scan of %s in %s" % (domain, model_obj._table, plan)
+        assert 'Seq Scan' not in scans, "%s on %s falls back to a sequential scan" % (domain, model_obj._table)
+        index_names = [node['Index Name'] for node in nodes if 'Index Name' in node]
+        assert index_name in index_names, "%s on %s uses %s instead of %s" % (domain, model_obj._table,
+                                                                              index_names, index_name)
+
+    def test_managed_indexes(self):
+        for table_name, indexes in PLM_INDEXES.items():
+            for index_name, _expressions in indexes:
+                self.env.cr.execute("SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s",
+                                    (table_name, index_name))
+                assert self.env.cr.fetchone(), "index %s missing on %s" % (index_name, table_name)
+
+    def test_relation_plans(self):
+        document_id = self.document_ids[SEED_SIZE // 2]
+        self._assert_index_scan('ir.attachment.relation', [('parent_id', '=', document_id),
+                                                           ('link_kind', '=', 'HiTree')],
+                                'ir_attachment_relation_parent_kind_index')
+        self._assert_index_scan('ir.attachment.relation', [('child_id', '=', document_id),
+                                                           ('link_kind', 'in', ['RfTree', 'HiTree'])],
+                                'ir_attachment_relation_child_kind_index')
+
+    def test_checkout_plans(self):
+        document_id = self.document_ids[SEED_SIZE // 2]
+        # served by the index of the unique documentid constraint
+        self._assert_index_scan('plm.checkout', [('documentid', '=', document_id),
+                                                 ('userid', '=', self.env.uid)],
+                                'plm_checkout_documentid')
+        self._assert_index_scan('plm.cad.open', [('document_id', '=', document_id),
+                                                 ('userid', '=', self.env.uid)],
+                                'plm_cad_open_document_user_index',
+                                order='create_date DESC', limit=1)
+        self._assert_index_scan('plm.cad.open', [('document_id', '=', document_id),
+                                                 ('operation_type', '=', 'save')],
+                                'plm_cad_open_document_operation_index',
+                                order='create_date DESC', limit=1)
+
+    def test_bom_plans(self):
+        parent_product = self.create_product_product('plm_plan_parent')
+        child_product = self.create_product_product('plm_plan_child')
+        self.create_bom(parent_product, child_product)
+        source_id = self.document_ids[0]
+        self._assert_index_scan('mrp.bom', [('product_tmpl_id', '=', parent_product.product_tmpl_id.id),
+                                            ('source_id', '=', source_id),
+                                            ('type', '=', 'normal')],
+                                'mrp_bom_product_source_type_index')
+        self._assert_index_scan('mrp.bom.line', [('product_id', '=', child_product.id),
+                                                 ('source_id', '=', source_id),
+                                                 ('type', '=', 'normal')],
+                                'mrp_bom_line_product_source_index')
+
+    def test_engineering_code_plans(self):
+        product = self.create_product_product('plm_plan_code')
+        self._assert_index_scan('product.template', [('engineering_code', '=', product.engineering_code),
+                                                     ('engineering_revision', '=', 0)],
+                                'product_template_engcoderev_index')
+        self._assert_index_scan('ir.attachment', [('engineering_code', '=', 'plm_plan_%s' % (SEED_SIZE // 2)),
+                                                  ('engineering_revision', '=', 0)],
+                                'unique_index_ir_attachment')
+
+    def test_trigram_plans(self):
+        if not has_trigram(self.env.cr):
+            self.skipTest("pg_trgm is not available")
+        self._assert_index_scan('ir.attachment', [('name', 'ilike', 'plan_250')],
+                                'ir_attachment_name_trgm_index')
+        self._assert_index_scan('ir.attachment', [('engineering_code', 'ilike', 'plan_250')],
+                                'ir_attachment_engcode_trgm_index')
+        self._assert_index_scan('product.template', [('engineering_code', 'ilike', 'plan_250')],
+                                'product_template_engcode_trgm_index')
+
+    def test_checked_in_batch(self):
+        # the seeded checkouts are on the odd documents
+        file_names = ['plm_plan_1001', 'plm_plan_2002', 'plm_plan_3003', 'plm_plan_missing']
+        result = self.env['ir.attachment'].CheckedIn(file_names)
+        assert result == [['plm_plan_1001', False], ['plm_plan_2002', True], ['plm_plan_3003', False]]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    OmniaSolutions, ERP-PLM-CAD Open Source Solutions
+#    Copyright (C) 2011-2026 https://OmniaSolutions.website
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this prograIf not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+'''
+Created on 19 Oct 2026
+'''
+import json
+from odoo.tests import tagged
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+from odoo.addons.plm.tests.entity_creator import PlmEntityCreator
+#
+#
+# --test-tags=odoo_plm_save_version
+#
+#
+
+
+@tagged('-standard', 'odoo_plm_save_version')
+class PlmSaveVersion(TransactionCase, PlmEntityCreator):
+
+    def _flush_versions(self):
+        self.env['plm.version.mixin']._flush_plm_versions()
+
+    def test_save_version(self):
+        document = self.create_document('document_version_3d', doc_type='3d')
+        document.checkout('web', '-', True)
+        self._flush_versions()
+        version = document.plm_version
+        document.with_context(odooPLM=True).write({'description': 'changed'})
+        document.with_context(odooPLM=True).write({'description': 'changed again'})
+        self._flush_versions()
+        assert document.plm_version == version + 1
+        document._check_in()
+        self._flush_versions()
+        assert document.plm_version == version + 1
+        versions, errors = document._lock_plm_versions()
+        assert versions == {document.id: version + 1}
+        assert not errors
+
+    def test_bom_version_once(self):
+        parent_product = self.create_product_product('plm_version_parent')
+        bom = self.create_bom(parent_product, self.create_product_product('plm_version_child_1'))
+        self._flush_versions()
+        version = bom.plm_version
+        for index in range(2, 5):
+            self.create_bom(parent_product, self.create_product_product('plm_version_child_%s' % index))
+        bom.bom_line_ids.write({'product_qty': 3})
+        self._flush_versions()
+        assert bom.plm_version == version + 1
+
+    def test_save_stale_version(self):
+        document = self.create_document('document_stale_3d', doc_type='3d')
+        document.checkout('web', '-', True)
+        document.with_context(odooPLM=True).write({'description': 'saved by someone else'})
+        self._flush_versions()
+        stale_version = document.plm_version - 1
+        structure = {'FILE_PATH': 'document_stale_3d',
+                     'DOCUMENT_ATTRIBUTES': {'engineering_code': document.engineering_code,
+                                             'engineering_revision': document.engineering_revision,
+                                             'description': 'my save',
+                                             'plm_version': stale_version},
+                     'RELATIONS': []}
+        with self.assertRaises(UserError):
+            self.env['ir.attachment'].saveStructure([json.dumps(structure), 'web', '-'])
+        assert document.description == 'saved by someone else'
@@ -2,6 +2,7 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import json
 import difflib
+import hashlib
 from datetime import datetime
 
 
@@ -81,6 +82,7 @@ class PartVersionDiff(models.Model):
     bom_additions = fields.Integer(string='BOM Additions', compute='_compute_summary', store=True)
     bom_deletions = fields.Integer(string='BOM Deletions', compute='_compute_summary', store=True)
     bom_modifications = fields.Integer(string='BOM Modifications', compute='_compute_summary', store=True)
+    bom_moves = fields.Integer(string='BOM Moves', compute='_compute_summary', store=True)
 
     total_file_changes = fields.Integer(string='Total File Changes', compute='_compute_summary', store=True)
     file_additions = fields.Integer(string='Files Added', compute='_compute_summary', store=True)
@@ -140,16 +142,19 @@ class PartVersionDiff(models.Model):
                     record.bom_additions = sum(1 for item in bom_data if item.get('change_type') == 'added')
                     record.bom_deletions = sum(1 for item in bom_data if item.get('change_type') == 'deleted')
                     record.bom_modifications = sum(1 for item in bom_data if item.get('change_type') == 'modified')
+                    record.bom_moves = sum(1 for item in bom_data if item.get('change_type') == 'moved')
                 except:
                     record.total_bom_changes = 0
                     record.bom_additions = 0
                     record.bom_deletions = 0
                     record.bom_modifications = 0
+                    record.bom_moves = 0
             else:
                 record.total_bom_changes = 0
                 record.bom_additions = 0
                 record.bom_deletions = 0
                 record.bom_modifications = 0
+                record.bom_moves = 0
 
             # File Summary
             if record.file_differences:
@@ -304,72 +309,179 @@ class PartVersionDiff(models.Model):
         return differences
 
     def _compare_boms(self):
-        """Compare BOMs between two parts"""
-        differences = []
-
-        # Get BOMs for both parts
-        bom_a = self.env['mrp.bom'].search([('product_tmpl_id', '=', self.part_a_id.product_tmpl_id.id)], limit=1)
-        bom_b = self.env['mrp.bom'].search([('product_tmpl_id', '=', self.part_b_id.product_tmpl_id.id)], limit=1)
+        """Compare the full BOM structures of two parts, skipping identical subtrees"""
+        part_a = self.part_a_id.id
+        part_b = self.part_b_id.id
+        nodes = self._load_bom_structure([part_a, part_b])
 
-        if not bom_a and not bom_b:
+        if not nodes[part_a]['children'] and not nodes[part_b]['children']:
             return [{'message': 'No BOMs found for either part'}]
 
-        if not bom_a:
+        if not nodes[part_a]['children']:
             return [{'message': 'Part A has no BOM', 'part': self.part_a_name}]
 
-        if not bom_b:
+        if not nodes[part_b]['children']:
             return [{'message': 'Part B has no BOM', 'part': self.part_b_name}]
 
-        # Create dictionaries of BOM lines
-        lines_a = {line.product_id.id: {
-            'product': line.product_id.display_name,
-            'default_code': line.product_id.default_code or '',
-            'quantity': line.product_qty,
-            'uom': line.product_uom_id.name
-        } for line in bom_a.bom_line_ids}
-
-        lines_b = {line.product_id.id: {
-            'product': line.product_id.display_name,
-            'default_code': line.product_id.default_code or '',
-            'quantity': line.product_qty,
-            'uom': line.product_uom_id.name
-        } for line in bom_b.bom_line_ids}
-
-        # Find deleted components (in A but not in B)
-        for product_id, data in lines_a.items():
-            if product_id not in lines_b:
-                differences.append({
-                    'change_type': 'deleted',
-                    'product_name': data['product'],
-                    'product_code': data['default_code'],
-                    'quantity_a': data['quantity'],
-                    'uom': data['uom']
-                })
-
-        # Find added components (in B but not in A)
-        for product_id, data in lines_b.items():
-            if product_id not in lines_a:
-                differences.append({
-                    'change_type': 'added',
-                    'product_name': data['product'],
-                    'product_code': data['default_code'],
-                    'quantity_b': data['quantity'],
-                    'uom': data['uom']
-                })
-
-        # Find modified components (in both but with different quantities)
-        for product_id in set(lines_a.keys()) & set(lines_b.keys()):
-            if lines_a[product_id]['quantity'] != lines_b[product_id]['quantity']:
-                differences.append({
-                    'change_type': 'modified',
-                    'product_name': lines_a[product_id]['product'],
-                    'product_code': lines_a[product_id]['default_code'],
-                    'quantity_a': lines_a[product_id]['quantity'],
-                    'quantity_b': lines_b[product_id]['quantity'],
-                    'uom': lines_a[product_id]['uom']
-                })
-
-        return differences
+        hashes = self._compute_bom_hashes(nodes, [part_a, part_b])
+        differences = []
+        # Descend only where the subtree hashes differ
+        stack = [(part_a, part_b, [])]
+        visited = set()
+        while stack:
+            product_a, product_b, path = stack.pop()
+            if hashes[product_a] == hashes[product_b] or (product_a, product_b) in visited:
+                continue
+            visited.add((product_a, product_b))
+            children_a = nodes[product_a]['children']
+            children_b = nodes[product_b]['children']
+            for key in sorted(set(children_a) | set(children_b)):
+                line_a = children_a.get(key)
+                line_b = children_b.get(key)
+                line = line_a or line_b
+                node = nodes[line['product_id']]
+                item = {
+                    'product_name': node['name'],
+                    'product_code': node['code'],
+                    'path': ' / '.join(path + [node['name']]),
+                    'level': len(path) + 1,
+                    'uom': line['uom'],
+                }
+                if not line_b:
+                    item.update({'change_type': 'deleted', 'quantity_a': line_a['quantity']})
+                    differences.append(item)
+                elif not line_a:
+                    item.update({'change_type': 'added', 'quantity_b': line_b['quantity']})
+                    differences.append(item)
+                else:
+                    node_b = nodes[line_b['product_id']]
+                    if line_a['product_id'] != line_b['product_id'] \
+                            or line_a['quantity'] != line_b['quantity'] \
+                            or line_a['uom'] != line_b['uom']:
+                        # A component replaced by another revision is modified even with the same quantity
+                        item.update({'change_type': 'modified',
+                                     'product_name_b': node_b['name'],
+                                     'product_code_a': node['code'],
+                                     'product_code_b': node_b['code'],
+                                     'revision_a': node['revision'],
+                                     'revision_b': node_b['revision'],
+                                     'quantity_a': line_a['quantity'],
+                                     'quantity_b': line_b['quantity'],
+                                     'uom': line_b['uom']})
+                        differences.append(item)
+                    if hashes[line_a['product_id']] != hashes[line_b['product_id']]:
+                        stack.append((line_a['product_id'], line_b['product_id'], path + [node['name']]))
+        return self._detect_bom_moves(differences)
+
+    def _load_bom_structure(self, product_ids):
+        """Load the BOM structure below the given products, one level at a time"""
+        nodes = {}
+        to_load = set(product_ids)
+        while to_load:
+            self._load_bom_level(nodes, list(to_load))
+            to_load = set(child['product_id']
+                          for product_id in to_load
+                          for child in nodes[product_id]['children'].values()
+                          if 'children' not in nodes[child['product_id']])
+        return nodes
+
+    def _compute_bom_hashes(self, nodes, product_ids):
+        """Compute a Merkle hash of every subtree (code, product, quantity, uom and children hashes)
+        the child product is hashed so a component replaced by another revision is never pruned"""
+        hashes = {}
+        visiting = set()
+        stack = [(product_id, False) for product_id in product_ids]
+        while stack:
+            product_id, expanded = stack.pop()
+            if product_id in hashes:
+                continue
+            children = nodes[product_id]['children']
+            if expanded:
+                payload = [nodes[product_id]['key'], [
+                    [key, child['product_id'], child['quantity'], child['uom'], hashes.get(child['product_id'], '')]
+                    for key, child in sorted(children.items())
+                ]]
+                hashes[product_id] = hashlib.sha1(json.dumps(payload).encode('utf-8')).hexdigest()
+                visiting.discard(product_id)
+            elif product_id not in visiting:
+                visiting.add(product_id)
+                stack.append((product_id, True))
+                for child in children.values():
+                    if child['product_id'] not in hashes and child['product_id'] not in visiting:
+                        stack.append((child['product_id'], False))
+        return hashes
+
+    def _read_bom_nodes(self, nodes, product_ids):
+        """Read name, code and matching key of the products missing from nodes"""
+        product_obj = self.env['product.product'].with_context(active_test=False)
+        field_names = ['display_name', 'default_code', 'product_tmpl_id']
+        if 'engineering_code' in product_obj._fields:
+            field_names.extend(['engineering_code', 'engineering_revision'])
+        for data in product_obj.browse(list(set(product_ids) - set(nodes))).read(field_names):
+            # Lines are matched by engineering code so new revisions of a component are compared with the old ones
+            engineering_code = data.get('engineering_code')
+            if engineering_code in ('-', ''):
+                engineering_code = False
+            nodes[data['id']] = {
+                'name': data['display_name'],
+                'code': data['default_code'] or '',
+                'key': engineering_code or data['default_code'] or data['display_name'],
+                'revision': data.get('engineering_revision', False),
+                'tmpl_id': data['product_tmpl_id'][0],
+            }
+
+    def _load_bom_level(self, nodes, product_ids):
+        """Load the BOM lines of the given products, the lines of the loaded ones are kept"""
+        self._read_bom_nodes(nodes, product_ids)
+        to_load = [product_id for product_id in set(product_ids) if 'children' not in nodes[product_id]]
+        if not to_load:
+            return
+        tmpl_boms = {}
+        bom_data = self.env['mrp.bom'].search_read([
+            ('product_tmpl_id', 'in', list(set(nodes[product_id]['tmpl_id'] for product_id in to_load)))
+        ], ['product_tmpl_id'])
+        for bom in bom_data:
+            # Same BOM as a search with limit=1 on the template
+            tmpl_boms.setdefault(bom['product_tmpl_id'][0], bom['id'])
+        bom_lines = {}
+        line_data = self.env['mrp.bom.line'].search_read([
+            ('bom_id', 'in', list(tmpl_boms.values()))
+        ], ['bom_id', 'product_id', 'product_qty', 'product_uom_id'])
+        for line in line_data:
+            bom_lines.setdefault(line['bom_id'][0], []).append(line)
+        self._read_bom_nodes(nodes, [line['product_id'][0] for line in line_data])
+        for product_id in to_load:
+            children = {}
+            for line in bom_lines.get(tmpl_boms.get(nodes[product_id]['tmpl_id']), []):
+                child_id = line['product_id'][0]
+                key = nodes[child_id]['key']
+                uom = line['product_uom_id'][1] if line['product_uom_id'] else ''
+                if key in children:
+                    children[key]['quantity'] += line['product_qty']
+                else:
+                    children[key] = {'product_id': child_id, 'quantity': line['product_qty'], 'uom': uom}
+            nodes[product_id]['children'] = children
+
+    def _detect_bom_moves(self, differences):
+        """Merge a deleted and an added item of the same part into a single moved item"""
+        added = {}
+        for item in differences:
+            if item['change_type'] == 'added':
+                added.setdefault(item['product_code'] or item['product_name'], []).append(item)
+        out = []
+        moved = set()
+        for item in differences:
+            if item['change_type'] == 'deleted':
+                candidates = added.get(item['product_code'] or item['product_name'])
+                if candidates:
+                    target = candidates.pop(0)
+                    moved.add(id(target))
+                    item = dict(item,
+                                change_type='moved',
+                                path_b=target['path'],
+                                quantity_b=target['quantity_b'])
+            out.append(item)
+        return [item for item in out if id(item) not in moved]
 
     def _compare_documents(self):
         """Compare document control records"""
@@ -610,7 +722,7 @@ class PartVersionDiff(models.Model):
 
         html = '<div class="bom-diff">'
         html += '<table class="table table-bordered">'
-        html += '<thead><tr><th>Type</th><th>Product</th><th>Qty A</th><th>Qty B</th><th>UOM</th></tr></thead>'
+        html += '<thead><tr><th>Type</th><th>Product</th><th>Path</th><th>Qty A</th><th>Qty B</th><th>UOM</th></tr></thead>'
         html += '<tbody>'
 
         for item in data:
@@ -619,6 +731,7 @@ class PartVersionDiff(models.Model):
                 html += '<tr style="background-color: #d4edda;">'
                 html += '<td><span class="badge badge-success">Added</span></td>'
                 html += f'<td>{item.get("product_name", "")}</td>'
+                html += f'<td>{item.get("path", "")}</td>'
                 # html += f'<td>{item.get("product_code", "")}</td>'
                 html += '<td>-</td>'
                 html += f'<td>{item.get("quantity_b", 0)}</td>'
@@ -628,6 +741,7 @@ class PartVersionDiff(models.Model):
                 html += '<tr style="background-color: #f8d7da;">'
                 html += '<td><span class="badge badge-danger">Deleted</span></td>'
                 html += f'<td>{item.get("product_name", "")}</td>'
+                html += f'<td>{item.get("path", "")}</td>'
                 # html += f'<td>{item.get("product_code", "")}</td>'
                 html += f'<td>{item.get("quantity_a", 0)}</td>'
                 html += '<td>-</td>'
@@ -636,12 +750,25 @@ class PartVersionDiff(models.Model):
             elif change_type == 'modified':
                 html += '<tr style="background-color: #fff3cd;">'
                 html += '<td><span class="badge badge-warning">Modified</span></td>'
-                html += f'<td>{item.get("product_name", "")}</td>'
+                if item.get("product_name_b", item.get("product_name")) != item.get("product_name"):
+                    html += f'<td>{item.get("product_name", "")} &#8594; {item.get("product_name_b", "")}</td>'
+                else:
+                    html += f'<td>{item.get("product_name", "")}</td>'
+                html += f'<td>{item.get("path", "")}</td>'
                 # html += f'<td>{item.get("product_code", "")}</td>'
                 html += f'<td>{item.get("quantity_a", 0)}</td>'
                 html += f'<td>{item.get("quantity_b", 0)}</td>'
                 html += f'<td>{item.get("uom", "")}</td>'
                 html += '</tr>'
+            elif change_type == 'moved':
+                html += '<tr style="background-color: #d1ecf1;">'
+                html += '<td><span class="badge badge-info">Moved</span></td>'
+                html += f'<td>{item.get("product_name", "")}</td>'
+                html += f'<td>{item.get("path", "")} &#8594; {item.get("path_b", "")}</td>'
+                html += f'<td>{item.get("quantity_a", 0)}</td>'
+                html += f'<td>{item.get("quantity_b", 0)}</td>'
+                html += f'<td>{item.get("uom", "")}</td>'
+                html += '</tr>'
 
         html += '</tbody></table></div>'
         return html
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+#
+#
+# --test-tags=odoo_plm_version_diff
+#
+#
+
+
+@tagged('-standard', 'odoo_plm_version_diff')
+class PartVersionBomDiff(TransactionCase):
+
+    def _create_product(self, name, code, revision=0):
+        vals = {'name': name, 'default_code': name, 'type': 'product'}
+        if 'engineering_code' in self.env['product.product']._fields:
+            vals.update({'engineering_code': code, 'engineering_revision': revision})
+        else:
+            vals['default_code'] = code
+        return self.env['product.product'].create(vals)
+
+    def _create_bom(self, product, lines):
+        return self.env['mrp.bom'].create({
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1,
+            'bom_line_ids': [(0, 0, {'product_id': child.id, 'product_qty': qty}) for child, qty in lines],
+        })
+
+    def _compare(self, part_a, part_b):
+        diff = self.env['part.version.diff'].new({'part_a_id': part_a.id, 'part_b_id': part_b.id})
+        return {(item['change_type'], item['path']): item for item in diff._compare_boms()}
+
+    def test_multi_level_diff(self):
+        leaf = self._create_product('vd_leaf', 'VD_LEAF')
+        shared = self._create_product('vd_shared', 'VD_SHARED')
+        self._create_bom(shared, [(leaf, 1)])
+        screw = self._create_product('vd_screw', 'VD_SCREW')
+        washer = self._create_product('vd_washer', 'VD_WASHER')
+        # two revisions of the same component share the engineering code
+        frame_a = self._create_product('vd_frame_a', 'VD_FRAME')
+        frame_b = self._create_product('vd_frame_b', 'VD_FRAME', 1)
+        self._create_bom(frame_a, [(screw, 4)])
+        self._create_bom(frame_b, [(screw, 4), (washer, 4)])
+        removed = self._create_product('vd_removed', 'VD_REMOVED')
+        added = self._create_product('vd_added', 'VD_ADDED')
+        part_a = self._create_product('vd_part_a', 'VD_PART')
+        part_b = self._create_product('vd_part_b', 'VD_PART', 1)
+        self._create_bom(part_a, [(shared, 1), (frame_a, 1), (removed, 1)])
+        self._create_bom(part_b, [(shared, 1), (frame_b, 2), (added, 1)])
+        differences = self._compare(part_a, part_b)
+        assert set(differences) == {('modified', frame_a.display_name),
+                                    ('deleted', removed.display_name),
+                                    ('added', added.display_name),
+                                    ('added', '%s / %s' % (frame_a.display_name, washer.display_name))}, differences
+        modified = differences[('modified', frame_a.display_name)]
+        assert (modified['quantity_a'], modified['quantity_b']) == (1, 2)
+        assert differences[('added', '%s / %s' % (frame_a.display_name, washer.display_name))]['level'] == 2
+
+    def test_moved_component(self):
+        screw = self._create_product('vd_moved_screw', 'VD_MOVED_SCREW')
+        group_a = self._create_product('vd_group_a', 'VD_GROUP')
+        group_b = self._create_product('vd_group_b', 'VD_GROUP', 1)
+        self._create_bom(group_a, [(screw, 2)])
+        pin = self._create_product('vd_pin', 'VD_PIN')
+        self._create_bom(group_b, [(pin, 1)])
+        part_a = self._create_product('vd_moved_a', 'VD_MOVED')
+        part_b = self._create_product('vd_moved_b', 'VD_MOVED', 1)
+        self._create_bom(part_a, [(group_a, 1)])
+        self._create_bom(part_b, [(group_b, 1), (screw, 2)])
+        differences = self._compare(part_a, part_b)
+        moved = differences[('moved', '%s / %s' % (group_a.display_name, screw.display_name))]
+        assert moved['path_b'] == screw.display_name
+        assert set(differences) == {('modified', group_a.display_name),
+                                    ('moved', '%s / %s' % (group_a.display_name, screw.display_name)),
+                                    ('added', '%s / %s' % (group_a.display_name, pin.display_name))}, differences
+
+    def test_same_part(self):
+        part = self._create_product('vd_same', 'VD_SAME')
+        self._create_bom(part, [(self._create_product('vd_same_child', 'VD_SAME_CHILD'), 1)])
+        assert self._compare(part, part) == {}
+
+    def test_revised_leaf_same_quantity(self):
+        leaf_a = self._create_product('vd_rev_leaf_a', 'VD_REV_LEAF')
+        leaf_b = self._create_product('vd_rev_leaf_b', 'VD_REV_LEAF', 1)
+        group_a = self._create_product('vd_rev_group_a', 'VD_REV_GROUP')
+        group_b = self._create_product('vd_rev_group_b', 'VD_REV_GROUP', 1)
+        self._create_bom(group_a, [(leaf_a, 3)])
+        self._create_bom(group_b, [(leaf_b, 3)])
+        part_a = self._create_product('vd_rev_a', 'VD_REV')
+        part_b = self._create_product('vd_rev_b', 'VD_REV', 1)
+        self._create_bom(part_a, [(group_a, 1)])
+        self._create_bom(part_b, [(group_b, 1)])
+        differences = self._compare(part_a, part_b)
+        leaf_path = '%s / %s' % (group_a.display_name, leaf_a.display_name)
+        assert set(differences) == {('modified', group_a.display_name),
+                                    ('modified', leaf_path)}, differences
+        modified = differences[('modified', leaf_path)]
+        assert (modified['quantity_a'], modified['quantity_b']) == (3, 3)
+        assert modified['product_name_b'] == leaf_b.display_name
+        assert (modified['product_code_a'], modified['product_code_b']) == (leaf_a.default_code or '', leaf_b.default_code or '')
+        if 'engineering_revision' in self.env['product.product']._fields:
+            assert (modified['revision_a'], modified['revision_b']) == (0, 1)
+
+    def test_identical_subtree_pruned(self):
+        screw = self._create_product('vd_pruned_screw', 'VD_PRUNED_SCREW')
+        group_a = self._create_product('vd_pruned_group_a', 'VD_PRUNED_GROUP')
+        group_b = self._create_product('vd_pruned_group_b', 'VD_PRUNED_GROUP', 1)
+        self._create_bom(group_a, [(screw, 2)])
+        self._create_bom(group_b, [(screw, 2)])
+        part_a = self._create_product('vd_pruned_a', 'VD_PRUNED')
+        part_b = self._create_product('vd_pruned_b', 'VD_PRUNED', 1)
+        self._create_bom(part_a, [(group_a, 1)])
+        self._create_bom(part_b, [(group_b, 1)])
+        diff = self.env['part.version.diff'].new({'part_a_id': part_a.id, 'part_b_id': part_b.id})
+        nodes = diff._load_bom_structure([part_a.id, part_b.id])
+        hashes = diff._compute_bom_hashes(nodes, [part_a.id, part_b.id])
+        # the new revision of the group has the same children, its subtree is not visited
+        assert hashes[group_a.id] == hashes[group_b.id]
+        assert set(self._compare(part_a, part_b)) == {('modified', group_a.display_name)}